@@ -0,0 +1,147 @@
+import bisect
+import time
+from threading import Lock
+from typing import Callable, Dict, List, Tuple
+
+# Latency buckets in seconds, from cached lookups to computer opponent turns
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels: return ""
+    return "{" + ",".join(f'{name}="{value}"' for name, value in labels) + "}"
+
+
+class Histogram(object):
+    """Prometheus histogram with a fixed set of buckets, one series per label combination."""
+
+    def __init__(self, name: str, documentation: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.series: Dict[Labels, List] = {}  # Labels to [bucket counts, sum, count].
+        self.lock = Lock()
+
+    def observe(self, value: float, **labels: str):
+        key = tuple(sorted(labels.items()))
+        bucket_idx = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None: series = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bucket_idx] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = [(key, list(counts), total, count) for key, (counts, total, count) in self.series.items()]
+        for key, counts, total, count in sorted(series):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{format_labels(key + (('le', le),))} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(key)} {total}")
+            lines.append(f"{self.name}_count{format_labels(key)} {count}")
+        return lines
+
+
+class Counter(object):
+    """Prometheus counter, one series per label combination."""
+
+    def __init__(self, name: str, documentation: str):
+        self.name = name
+        self.documentation = documentation
+        self.series: Dict[Labels, int] = {}
+        self.lock = Lock()
+
+    def inc(self, amount: int = 1, **labels: str):
+        key = tuple(sorted(labels.items()))
+        with self.lock:
+            self.series[key] = self.series.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            series = sorted(self.series.items())
+        lines.extend(f"{self.name}{format_labels(key)} {value}" for key, value in series)
+        return lines
+
+
+class Collected(object):
+    """Counters or gauges read from elsewhere when the metrics are scraped, e.g. the deadwood cache counters."""
+
+    def __init__(self, name: str, documentation: str, metric_type: str, collect: Callable[[], float]):
+        self.name = name
+        self.documentation = documentation
+        self.metric_type = metric_type
+        self.collect = collect
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+            f"{self.name} {self.collect()}",
+        ]
+
+
+class MetricsRegistry(object):
+    def __init__(self):
+        self.metrics = []
+
+    def histogram(self, name: str, documentation: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        metric = Histogram(name=name, documentation=documentation, buckets=buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        metric = Counter(name=name, documentation=documentation)
+        self.metrics.append(metric)
+        return metric
+
+    def collected_counter(self, name: str, documentation: str, collect: Callable[[], float]):
+        self.metrics.append(Collected(name=name, documentation=documentation, metric_type="counter", collect=collect))
+
+    def gauge(self, name: str, documentation: str, collect: Callable[[], float]):
+        self.metrics.append(Collected(name=name, documentation=documentation, metric_type="gauge", collect=collect))
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        return "\n".join(line for metric in self.metrics for line in metric.render()) + "\n"
+
+
+class MetricsMiddleware(object):
+    """
+    ASGI middleware that times every HTTP request.
+
+    Requests are labelled with the route template, e.g. /get_game_state, rather than the URL,
+    so the number of series stays bounded however many games are played.
+    """
+
+    def __init__(self, app, latency: Histogram, requests: Counter):
+        self.app = app
+        self.latency = latency
+        self.requests = requests
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start": status[0] = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get("route")
+            endpoint = route.path if route is not None else "unmatched"
+            self.latency.observe(time.perf_counter() - start, endpoint=endpoint, method=scope["method"])
+            self.requests.inc(endpoint=endpoint, method=scope["method"], status=str(status[0]))
@@ -1,13 +1,38 @@
-from fastapi import FastAPI, HTTPException
+import asyncio
+import numpy as np
+from threading import Lock
+from fastapi import BackgroundTasks, FastAPI, HTTPException, Header, Response, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from pygin import GinRummyEngine, Card
+from pygin.constants import FULL_DECK, CARD_INDEX, HAND_SIZE, DEADWOOD_CACHE_SIZE
+from pygin.equity import PlayerView, draw_outcomes, knock_within, opponent_card_probabilities
+from pygin.errors import RoundOverError
+from pygin.eventlog import EventLogWriter
+from pygin.ismcts import ISMCTSPlayer, RoundState
+from pygin.melds import DEADWOOD_CACHE, SOLVER_STATS
+from pygin.profiler import PROFILER
+from pygin.strategies import DISCARD, DRAW
 import uvicorn
+from .metrics import MetricsMiddleware, MetricsRegistry
+from .sessions import Session, SessionManager, SessionLimitError
+from .store import StoreConflictError, create_store
 from .utils import load_config
 
 # Load configuration
-config = load_config('config.yaml')
+config = load_config('config.yml')
+server_config = config.get('server', {})
+engine_config = config.get('engine', {})
+sessions_config = config.get('sessions', {})
+ai_config = config.get('ai', {})
+event_log_config = config.get('event_log', {})
+profiler_config = config.get('profiler', {})
+
+# Size the deadwood cache shared by all games in this process
+DEADWOOD_CACHE.resize(engine_config.get('deadwood_cache_size', DEADWOOD_CACHE_SIZE))
 
 # Initialize FastAPI app
 app = FastAPI()
@@ -21,8 +46,65 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
-# Global game instance
-game: Optional[GinRummyEngine] = None
+# Prometheus metrics served at /metrics
+metrics = MetricsRegistry()
+request_latency = metrics.histogram('pygin_http_request_duration_seconds', 'Time spent handling HTTP requests, by endpoint.')
+requests_total = metrics.counter('pygin_http_requests_total', 'HTTP requests handled, by endpoint and status code.')
+app.add_middleware(MetricsMiddleware, latency=request_latency, requests=requests_total)
+
+# Sampling profiler for pygin.utils and the engine, switched on and off through /profiler
+if profiler_config.get('enabled', False):
+    PROFILER.start(interval=profiler_config.get('interval', 0.005))
+
+# Append-only log of every game played on this server, if enabled. Every worker appends to the same file.
+event_log: Optional[EventLogWriter] = None
+if event_log_config.get('path'):
+    event_log = EventLogWriter(path=event_log_config['path'], batch_size=event_log_config.get('batch_size', 1024))
+
+
+def log_game_id(game_id: str) -> int:
+    """Event log records carry a 64-bit game id, taken from the start of the session id."""
+    return int(game_id[:16], 16)
+
+
+def resume_event_log(session: Session):
+    """Log the moves this worker serves for a game it loaded from the store."""
+    event_log.resume(engine=session.game, game_id=log_game_id(session.game_id))
+
+
+def end_event_log(game_id: str, version: int):
+    """End the log of a game this worker reset or evicted, after the last version in the store."""
+    event_log.end(game_id=log_game_id(game_id), version=version)
+
+
+# Games hosted by this process
+sessions = SessionManager(
+    max_sessions=sessions_config.get('max_sessions', 10000),
+    idle_timeout=sessions_config.get('idle_timeout', 3600),
+    store=create_store(sessions_config),
+    on_load=resume_event_log if event_log else None,
+    on_evict=end_event_log if event_log else None,
+)
+
+metrics.gauge('pygin_active_games', 'Games in the session store.', lambda: sessions.store.count())
+metrics.gauge('pygin_cached_games', 'Games cached by this worker.', lambda: len(sessions))
+metrics.gauge('pygin_websocket_subscribers', 'Open game state websockets on this worker.',
+              lambda: sum(len(session.subscribers) for session in list(sessions.sessions.values())))
+metrics.collected_counter('pygin_evicted_games_total', 'Idle games evicted by this worker.', lambda: sessions.evictions)
+metrics.collected_counter('pygin_store_conflicts_total', 'Moves rejected because another worker changed the game first.', lambda: sessions.conflicts)
+metrics.collected_counter('pygin_mark_deadwood_calls_total', 'Calls to mark_deadwood.', lambda: SOLVER_STATS.mark_deadwood_calls)
+metrics.collected_counter('pygin_solver_searches_total', 'Deadwood searches run.', lambda: SOLVER_STATS.searches)
+metrics.collected_counter('pygin_solver_nodes_total', 'Hand subsets evaluated by the deadwood searches.', lambda: SOLVER_STATS.nodes)
+metrics.collected_counter('pygin_deadwood_cache_hits_total', 'Solved hands found in the deadwood cache.', lambda: DEADWOOD_CACHE.hits)
+metrics.collected_counter('pygin_deadwood_cache_misses_total', 'Hands not found in the deadwood cache.', lambda: DEADWOOD_CACHE.misses)
+metrics.collected_counter('pygin_deadwood_cache_evictions_total', 'Solved hands evicted from the deadwood cache.', lambda: DEADWOOD_CACHE.evictions)
+metrics.gauge('pygin_deadwood_cache_size', 'Solved hands in the deadwood cache.', lambda: len(DEADWOOD_CACHE))
+metrics.gauge('pygin_profiler_running', 'Whether the sampling profiler is running.', lambda: int(PROFILER.running))
+
+# Computer opponent shared by all single-player tables, started on first use
+ai_player: Optional[ISMCTSPlayer] = None
+ai_player_lock = Lock()
+ISMCTS_OPPONENT = "ismcts"
 
 
 class CardModel(BaseModel):
@@ -39,98 +121,311 @@ class PlayerModel(BaseModel):
     hand: HandModel
 
 
+def serialize_cards(value: Any) -> Any:
+    """Replace the cards in nested lists and dicts with their JSON form."""
+    if isinstance(value, Card): return value.to_dict()
+    if isinstance(value, list): return [serialize_cards(item) for item in value]
+    if isinstance(value, dict): return {key: serialize_cards(item) for key, item in value.items()}
+    return value
+
+
+def get_session(game_id: str) -> Session:
+    session = sessions.get(game_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Game not found")
+    return session
+
+
+@app.exception_handler(StoreConflictError)
+def store_conflict(request, exc: StoreConflictError):
+    return JSONResponse(status_code=409, content={"detail": exc.message})
+
+
+@app.exception_handler(RoundOverError)
+def round_over(request, exc: RoundOverError):
+    return JSONResponse(status_code=400, content={"detail": exc.message})
+
+
+def evict_idle_games():
+    with sessions.lock:
+        sessions.evict_idle()
+
+
+async def evict_idle_periodically(interval: float):
+    """Evict idle games on a timer, so they are freed even while no new games are started."""
+    while True:
+        await asyncio.sleep(interval)
+        await run_in_threadpool(evict_idle_games)
+
+
+eviction_task: Optional[asyncio.Task] = None
+
+
+@app.on_event("startup")
+async def start_eviction():
+    global eviction_task
+    interval = sessions_config.get('eviction_interval', 60)
+    if interval: eviction_task = asyncio.create_task(evict_idle_periodically(interval))
+
+
+@app.on_event("shutdown")
+def close_stores():
+    if eviction_task:
+        eviction_task.cancel()
+    sessions.store.close()
+    if event_log:
+        event_log.close()
+    if ai_player:
+        ai_player.close()
+
+
+def get_ai_player() -> ISMCTSPlayer:
+    global ai_player
+    with ai_player_lock:
+        if ai_player is None:
+            ai_player = ISMCTSPlayer(time_budget=ai_config.get('time_budget', 1.0), workers=ai_config.get('workers'))
+    return ai_player
+
+
+def require_human_turn(session: Session):
+    """Reject moves while the computer opponent is to play. Expects the session lock to be held."""
+    if session.ai_player_idx == session.game.get_current_player_idx() and not session.game.round_over:
+        raise HTTPException(status_code=409, detail="The computer is thinking")
+
+
+def schedule_ai_turns(session: Session, background_tasks: BackgroundTasks):
+    """Let the computer opponent play after the response is sent, if it is its turn. Expects the session lock to be held."""
+    game = session.game
+    if session.ai_thinking or session.ai_player_idx != game.get_current_player_idx() or game.round_over: return
+    # The task only runs once the move is saved; a request that fails, e.g. on a store conflict, drops it.
+    background_tasks.add_task(play_ai_turns, session)
+
+
+def play_ai_turns(session: Session):
+    """
+    Play the computer opponent's turns.
+
+    Each decision is searched on a clone by the AI's worker processes without holding the
+    session lock, so the human's requests are answered while it thinks. The move is only
+    applied if the game did not change in the meantime.
+    """
+    with session.lock:
+        if session.ai_thinking: return  # Scheduled by another request as well.
+        session.ai_thinking = True
+    phase = DRAW
+    try:
+        while True:
+            with sessions.locked(session):
+                game = session.game
+                if session.ai_player_idx != game.get_current_player_idx() or game.round_over: return
+                searched = game.clone()
+            action = get_ai_player().choose_action(engine=searched, phase=phase)
+            try:
+                with sessions.locked(session):
+                    game = session.game
+                    if game.version != searched.version:
+                        # Changed elsewhere, e.g. a new round was dealt: search again from the current state.
+                        phase = DISCARD if len(game.get_current_player().get_hand()) > HAND_SIZE else DRAW
+                        continue
+                    state = RoundState(engine=game, phase=phase)
+                    state.apply(action)
+                    phase = state.phase
+            except StoreConflictError:
+                continue  # The session was reloaded with the stored game.
+    finally:
+        session.ai_thinking = False
+
+
+def end_turn_unless_knock_possible(session: Session, background_tasks: BackgroundTasks):
+    """Pass the turn after a discard, unless the player may knock and has to decide first."""
+    game = session.game
+    if not game.round_over and not game.can_knock():
+        game.switch_turn()
+        schedule_ai_turns(session, background_tasks)
+
+
 @app.post("/start_game")
-def start_game(player1_name: str, player2_name: str):
+def start_game(player1_name: str, player2_name: str, background_tasks: BackgroundTasks, opponent: Optional[str] = None):
     if player1_name == player2_name:
         raise HTTPException(status_code=400, detail="Player names must be different")
+    if opponent not in (None, ISMCTS_OPPONENT):
+        raise HTTPException(status_code=400, detail=f"Unknown opponent: {opponent}")
 
-    global game
     game = GinRummyEngine(player1=player1_name, player2=player2_name)
-    game.deal_initial_hands()
-    return {"message": "Game started successfully"}
+    try:
+        # The computer plays as player 2.
+        session = sessions.create(game=game, ai_player_idx=1 if opponent == ISMCTS_OPPONENT else None)
+    except SessionLimitError as e:
+        raise HTTPException(status_code=503, detail=e.message)
+    with sessions.locked(session):
+        if event_log:
+            event_log.attach(engine=game, game_id=log_game_id(session.game_id))
+        game.deal_initial_hands()
+        schedule_ai_turns(session, background_tasks)
+    return {"message": "Game started successfully", "game_id": session.game_id}
 
 
 @app.get("/get_player_hand")
-def get_player_hand(player_name: str):
-    if not game:
-        raise HTTPException(status_code=400, detail="Game not started")
-
-    player = game.get_player(player_name)
-    if not player:
-        raise HTTPException(status_code=404, detail="Player not found")
-
-    hand = player.get_hand()
-    cards = list(map(lambda c: c.to_dict(), hand))
+def get_player_hand(game_id: str, player_name: str):
+    session = get_session(game_id)
+    with sessions.locked(session):
+        player = session.game.get_player(player_name)
+        if not player:
+            raise HTTPException(status_code=404, detail="Player not found")
+
+        hand = player.get_hand()
+        cards = list(map(lambda c: c.to_dict(), hand))
     return {"hand": cards}
 
 
 @app.post("/draw_card")
-def draw_card(from_discard_stack: bool):
-    if not game:
-        raise HTTPException(status_code=400, detail="Game not started")
-
-    card = game.draw_card(from_discard_stack=from_discard_stack)
+def draw_card(game_id: str, from_discard_stack: bool):
+    session = get_session(game_id)
+    with sessions.locked(session):
+        require_human_turn(session)
+        card = session.game.draw_card(from_discard_stack=from_discard_stack)
     return {"card": card.to_dict()}
 
 
 @app.post("/discard_card")
-def discard_card(card: CardModel):
-    if not game:
-        raise HTTPException(status_code=400, detail="Game not started")
-
-    game.discard_card(Card(card.rank, card.suit))
+def discard_card(game_id: str, card: CardModel, background_tasks: BackgroundTasks):
+    session = get_session(game_id)
+    with sessions.locked(session):
+        require_human_turn(session)
+        discarded = Card(card.rank, card.suit)
+        if not session.game.get_current_player().get_hand().has_card(discarded):
+            raise HTTPException(status_code=400, detail="The card is not in the current player's hand")
+
+        session.game.discard_card(FULL_DECK[CARD_INDEX[discarded]])
+        end_turn_unless_knock_possible(session, background_tasks)
     return {"message": "Card discarded successfully"}
 
 
-@app.post("/knock")
-def knock():
-    if not game:
-        raise HTTPException(status_code=400, detail="Game not started")
+def has_finished_turn(game: GinRummyEngine) -> bool:
+    """Whether the current player has drawn and discarded this turn."""
+    return game.has_discarded and len(game.get_current_player().get_hand()) == HAND_SIZE
+
+
+@app.post("/end_turn")
+def end_turn(game_id: str, background_tasks: BackgroundTasks):
+    session = get_session(game_id)
+    with sessions.locked(session):
+        if session.game.round_over:
+            raise HTTPException(status_code=400, detail="The round is over")
+        require_human_turn(session)
+        if not has_finished_turn(session.game):
+            raise HTTPException(status_code=400, detail="Draw and discard a card before ending the turn")
+
+        session.game.switch_turn()
+        schedule_ai_turns(session, background_tasks)
+    return {"message": "Turn ended successfully"}
 
-    if not game.can_knock():
-        raise HTTPException(status_code=400, detail="Cannot knock")
 
-    game.knock()
-    return {"message": "Player knocked successfully"}
+@app.post("/knock")
+def knock(game_id: str):
+    session = get_session(game_id)
+    with sessions.locked(session):
+        require_human_turn(session)
+        if not session.game.can_knock():
+            raise HTTPException(status_code=400, detail="Cannot knock")
+
+        breakdown = session.game.knock()
+    return {"message": "Player knocked successfully", "result": serialize_cards(breakdown)}
+
+
+@app.post("/gin")
+def gin(game_id: str):
+    """Go Gin after discarding, or Big Gin with all 11 cards melded right after drawing."""
+    session = get_session(game_id)
+    with sessions.locked(session):
+        game = session.game
+        if game.round_over:
+            raise HTTPException(status_code=400, detail="The round is over")
+        require_human_turn(session)
+        if len(game.get_current_player().get_hand()) == HAND_SIZE + 1: is_gin, points = game.is_big_gin()
+        elif has_finished_turn(game): is_gin, points = game.is_gin()
+        else: is_gin, points = False, 0
+        if not is_gin:
+            raise HTTPException(status_code=400, detail="Cannot go Gin")
+
+        game.gin()
+    return {"message": "Player went Gin successfully", "points": points}
+
+
+@app.get("/suggest_discard")
+def suggest_discard(game_id: str, player_name: str):
+    session = get_session(game_id)
+    with sessions.locked(session):
+        game = session.game
+        if player_name != game.get_current_player().name:
+            raise HTTPException(status_code=400, detail="Not this player's turn")
+        if len(game.get_current_player().get_hand()) != HAND_SIZE + 1:
+            raise HTTPException(status_code=400, detail="Draw a card before discarding")
+
+        suggestions = game.suggest_discard()
+    return {"discards": [{**suggestion, "card": suggestion["card"].to_dict()} for suggestion in suggestions]}
+
+
+@app.get("/hand_equity")
+def hand_equity(game_id: str, player_name: str, turns: int = 3, samples: int = 128):
+    """Chances of improving on the next draw and of knocking soon, and what the opponent may hold, for hints."""
+    session = get_session(game_id)
+    with sessions.locked(session):
+        game = session.game
+        player = game.get_player(player_name)
+        if not player:
+            raise HTTPException(status_code=404, detail="Player not found")
+        if len(player.get_hand()) != HAND_SIZE:
+            raise HTTPException(status_code=400, detail="Hand equity is computed before drawing")
+
+        view = PlayerView.from_engine(game, game.players.index(player))
+    opponent_probabilities = opponent_card_probabilities(view)
+    unseen = opponent_probabilities[(opponent_probabilities > 0) & (opponent_probabilities < 1)]
+    return serialize_cards({
+        "draw": draw_outcomes(view),
+        "knock_within": knock_within(view, turns=turns, samples=min(samples, 1024)),
+        "opponent": {
+            "known_cards": [FULL_DECK[card_idx] for card_idx in np.flatnonzero(opponent_probabilities == 1)],
+            "unseen_card_probability": float(unseen[0]) if len(unseen) else 0.0,
+        },
+    })
 
 
 @app.post("/reset_game")
-def reset_game():
-    global game
-    game = None
+def reset_game(game_id: str):
+    sessions.remove(game_id)
     return {"message": "Game reset successfully"}
 
 
 @app.get("/reset_round")
-def reset_round():
-    game.reset_round()
+def reset_round(game_id: str, background_tasks: BackgroundTasks):
+    session = get_session(game_id)
+    with sessions.locked(session):
+        session.game.reset_round()
+        schedule_ai_turns(session, background_tasks)
     return {"message": "Round reset successfully"}
 
 
-@app.get("/get_game_state")
-def get_game_state(player_name: str):
-    if not game:
-        raise HTTPException(status_code=400, detail="Game not started")
-
+def build_game_state(session: Session, player_name: str) -> Dict[str, Any]:
+    """The state shown to a player. Expects the session lock to be held."""
+    game = session.game
     player = game.get_player(player_name)
     if not player:
         raise HTTPException(status_code=404, detail="Player not found")
 
-    player_hand = player.get_hand()
-    opponent_hand_size = len(game.get_opponent_player().get_hand())
-    discard_pile_top = game.discard_stack[-1].to_dict() if game.discard_stack else None
-    deck_size = len(game.deck)
-    can_knock = game.can_knock()
-    is_gin, gin_score = game.is_gin()
-    is_big_gin, big_gin_score = game.is_big_gin()
-
+    # Deadwood for both hands is tracked incrementally by the hands themselves.
+    current_hand_size = len(game.get_current_player().get_hand())
+    is_gin, gin_score = game.is_gin() if has_finished_turn(game) else (False, 0)
+    is_big_gin, big_gin_score = game.is_big_gin() if current_hand_size == HAND_SIZE + 1 else (False, 0)
     return {
-        "player_hand": list(map(lambda c: c.to_dict(), player_hand)),
-        "opponent_hand_size": opponent_hand_size,
-        "discard_pile_top": discard_pile_top,
-        "deck_size": deck_size,
+        "version": game.version,
+        "player_hand": list(map(lambda c: c.to_dict(), player.get_hand())),
+        "opponent_hand_size": len(game.get_opponent_player().get_hand()),
+        "discard_pile_top": game.discard_stack[-1].to_dict() if game.discard_stack else None,
+        "deck_size": len(game.deck),
         "is_current_player": player_name == game.get_current_player().name,
-        "can_knock": can_knock,
+        "round_over": game.round_over,
+        "can_knock": not game.round_over and game.can_knock(),
         "is_gin": is_gin,
         "gin_score": gin_score,
         "is_big_gin": is_big_gin,
@@ -138,9 +433,115 @@ def get_game_state(player_name: str):
     }
 
 
+def locked_game_state(session: Session, player_name: str) -> Dict[str, Any]:
+    with sessions.locked(session):
+        return build_game_state(session, player_name)
+
+
+def watched_game_state(session: Session, player_name: str) -> Optional[Dict[str, Any]]:
+    """Marks a watched game as used and returns its current state, or None once the game is gone."""
+    if not sessions.store.exists(game_id=session.game_id): return None
+    sessions.touch(session)  # Keep a watched game from being evicted.
+    return locked_game_state(session, player_name)
+
+
+@app.get("/get_game_state")
+def get_game_state(game_id: str, player_name: str, response: Response, since_version: Optional[int] = None,
+                   if_none_match: Optional[str] = Header(default=None)):
+    session = get_session(game_id)
+    with sessions.locked(session):
+        etag = f'"{session.game.version}"'
+        if since_version == session.game.version or if_none_match == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        state = build_game_state(session, player_name)
+    response.headers["ETag"] = etag
+    return state
+
+
+@app.websocket("/ws/{game_id}/{player_name}")
+async def game_state_updates(websocket: WebSocket, game_id: str, player_name: str):
+    """Pushes the full state on connect, then only the fields that changed after each state change."""
+    session = await run_in_threadpool(sessions.get, game_id)  # Loading from the store blocks.
+    if not session or not session.game.get_player(player_name):
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    updates = session.subscribe(loop=asyncio.get_running_loop())
+    # Only a shared store can change behind this worker's back.
+    poll_interval = sessions_config.get('poll_interval', 1.0) if sessions.store.shared else None
+    try:
+        state = await run_in_threadpool(locked_game_state, session, player_name)
+        await websocket.send_json(state)
+        while True:
+            try:
+                await asyncio.wait_for(updates.get(), timeout=poll_interval)
+            except asyncio.TimeoutError:
+                pass  # Look for moves made through other workers.
+            while not updates.empty(): updates.get_nowait()  # Coalesce bursts of changes into one delta.
+            new_state = await run_in_threadpool(watched_game_state, session, player_name)
+            if new_state is None:  # Reset or evicted.
+                await websocket.close()
+                break
+            changes = {key: value for key, value in new_state.items() if state.get(key) != value}
+            state = new_state
+            if changes: await websocket.send_json(changes)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.unsubscribe(updates)
+
+
+@app.get("/cache_stats")
+def cache_stats():
+    return {"deadwood": DEADWOOD_CACHE.stats()}
+
+
+@app.get("/ai_stats")
+def ai_stats():
+    return ai_player.stats if ai_player else {}
+
+
+@app.get("/session_stats")
+def session_stats():
+    return sessions.stats()
+
+
+@app.get("/metrics")
+def get_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+@app.post("/profiler/start")
+def start_profiler(interval: Optional[float] = None, reset: bool = False):
+    if reset:
+        PROFILER.reset()
+    PROFILER.start(interval=interval)
+    return PROFILER.stats()
+
+
+@app.post("/profiler/stop")
+def stop_profiler():
+    PROFILER.stop()
+    return PROFILER.stats()
+
+
+@app.get("/profiler")
+def get_profile(limit: int = 20, collapsed: bool = False):
+    """The hottest sampled stacks, or all of them in the collapsed format for flame graphs."""
+    if collapsed:
+        return PlainTextResponse(PROFILER.collapsed())
+    return {**PROFILER.stats(), "stacks": PROFILER.top(limit=limit)}
+
+
 if __name__ == "__main__":
+    workers = server_config.get('workers', 1)
+    if workers > 1 and not sessions.store.shared:
+        raise SystemExit("Running several workers needs a shared session store, e.g. sessions.store: sqlite")
     uvicorn.run(
-        app,
-        host=config.get('host', '0.0.0.0'),
-        port=config.get('port', 8000),
+        "backend.server:app" if workers > 1 else app,
+        host=server_config.get('host', '0.0.0.0'),
+        port=server_config.get('port', 8000),
+        workers=workers,
     )
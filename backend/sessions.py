@@ -0,0 +1,194 @@
+import time
+from asyncio import AbstractEventLoop, Queue
+from contextlib import contextmanager
+from threading import Lock
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from uuid import uuid4
+from pygin import GinRummyEngine
+from .store import GameStore, MemoryStore, StoreConflictError, serialize_game, deserialize_game
+from .utils import estimate_size
+
+
+class SessionLimitError(Exception):
+    """Exception raised when a new game would exceed the maximum number of sessions."""
+    def __init__(self, message="The server is hosting the maximum number of games."):
+        self.message = message
+        super().__init__(self.message)
+
+
+class Session(object):
+    """A hosted game together with the lock that serializes requests to it and its push subscribers."""
+
+    def __init__(self, game_id: str, game: GinRummyEngine):
+        self.game_id = game_id
+        self.game = game
+        self.lock = Lock()
+        self.created_at = time.monotonic()
+        self.last_access = self.created_at
+        self.subscribers: List[Tuple[AbstractEventLoop, Queue]] = []
+        self.ai_player_idx: Optional[int] = None  # Seat played by the computer opponent, if any.
+        self.ai_thinking = False  # Whether this process is playing the computer's turns in the background.
+        self.stored_version: Optional[int] = None  # Version of the game this process last loaded or saved.
+        self.store_touched_at = self.created_at  # When this process last marked the stored game as used.
+        game.subscribe(self.publish)
+
+    def __repr__(self):
+        return f"Session(game_id={self.game_id})"
+
+    def touch(self):
+        """Marks the session as recently used."""
+        self.last_access = time.monotonic()
+
+    def subscribe(self, loop: AbstractEventLoop) -> Queue:
+        """Returns a queue that receives the game version after every state change."""
+        queue = Queue()
+        self.subscribers.append((loop, queue))
+        return queue
+
+    def unsubscribe(self, queue: Queue):
+        """Stops delivering state changes to a queue returned by subscribe."""
+        self.subscribers = [(loop, q) for loop, q in self.subscribers if q is not queue]
+
+    def publish(self, event: str, **details):
+        """Engine listener that wakes up the subscribers. Called from request threads."""
+        for loop, queue in self.subscribers:
+            loop.call_soon_threadsafe(queue.put_nowait, self.game.version)
+
+
+class SessionManager(object):
+    """
+    The games served by this process, keyed by game id and backed by a game store.
+
+    Sessions are a per-process cache of the stored games. Requests to a game run inside
+    locked(), which brings the cached game up to date with the store, holds the session lock
+    so requests to different tables never wait on each other, and saves the game if it changed.
+    With a shared store any worker can serve any request for any game.
+    """
+
+    def __init__(self, max_sessions: int, idle_timeout: float, store: Optional[GameStore] = None,
+                 on_load: Optional[Callable[[Session], None]] = None, on_evict: Optional[Callable[[str, int], None]] = None):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.store = store or MemoryStore()
+        self.on_load = on_load  # Called with every session rebuilt from the store, e.g. to resume logging it.
+        self.on_evict = on_evict  # Called with the id and last version of every game this process deletes, e.g. to end its log.
+        self.sessions: Dict[str, Session] = {}
+        self.evictions = 0
+        self.conflicts = 0
+        self.lock = Lock()
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def create(self, game: GinRummyEngine, ai_player_idx: Optional[int] = None) -> Session:
+        """Registers a new game, evicting idle sessions to make room if needed."""
+        with self.lock:
+            if self.store.count() >= self.max_sessions: self.evict_idle()
+            if self.store.count() >= self.max_sessions: raise SessionLimitError
+            session = Session(game_id=uuid4().hex, game=game)
+            session.ai_player_idx = ai_player_idx
+            self.store.create(game_id=session.game_id, data=serialize_game(game, ai_player_idx), version=game.version)
+            session.stored_version = game.version
+            self.sessions[session.game_id] = session
+        return session
+
+    def get(self, game_id: str) -> Optional[Session]:
+        """Returns the session for the game id, or None if there is no such game."""
+        session = self.sessions.get(game_id)
+        if session is None:
+            stored = self.store.load(game_id=game_id)
+            if stored is None: return None
+            with self.lock:
+                session = self.sessions.get(game_id)
+                if session is None:
+                    game, ai_player_idx = deserialize_game(stored[0])
+                    session = Session(game_id=game_id, game=game)
+                    session.ai_player_idx = ai_player_idx
+                    session.stored_version = stored[1]
+                    if self.on_load: self.on_load(session)
+                    self.sessions[game_id] = session
+        elif not self.store.exists(game_id=game_id):
+            with self.lock:
+                self.sessions.pop(game_id, None)
+            return None
+        self.touch(session)
+        return session
+
+    def touch(self, session: Session):
+        """Marks the session and its stored game as recently used, so neither is evicted while the game is in use."""
+        session.touch()
+        if session.last_access - session.store_touched_at < self.idle_timeout / 4: return
+        self.store.touch(game_id=session.game_id)
+        session.store_touched_at = session.last_access
+
+    @contextmanager
+    def locked(self, session: Session) -> Iterator[Session]:
+        """Holds the session lock around a request, loading newer state first and saving changes afterwards."""
+        with session.lock:
+            self.refresh(session)
+            try:
+                yield session
+            finally:
+                if session.game.version != session.stored_version: self.save(session)
+
+    def refresh(self, session: Session):
+        """Replaces the cached game with the stored one if another worker changed it. Expects the session lock to be held."""
+        stored = self.store.load(game_id=session.game_id, known_version=session.stored_version)
+        if stored is None: return
+        game, session.ai_player_idx = deserialize_game(stored[0])
+        session.game.restore(game.snapshot())
+        session.stored_version = stored[1]
+        session.publish("refresh")
+
+    def save(self, session: Session):
+        """Stores the cached game. On a conflict the cached game is reloaded and StoreConflictError is raised."""
+        data = serialize_game(session.game, session.ai_player_idx)
+        try:
+            self.store.save(game_id=session.game_id, data=data, version=session.game.version, expected_version=session.stored_version)
+        except StoreConflictError:
+            self.conflicts += 1
+            session.stored_version = None
+            self.refresh(session)
+            raise
+        session.stored_version = session.game.version
+        session.store_touched_at = time.monotonic()
+
+    def remove(self, game_id: str) -> Optional[Session]:
+        """Removes the game and returns its cached session, if this process had one."""
+        version = self.store.delete(game_id=game_id)
+        if version is not None and self.on_evict: self.on_evict(game_id, version)
+        with self.lock:
+            return self.sessions.pop(game_id, None)
+
+    def evict_idle(self) -> int:
+        """
+        Removes games that no worker has used within the idle timeout, along with their cached
+        sessions, and drops cached sessions that this process has not used within it. Requests
+        and watchers mark games as used through touch(). Expects the registry lock to be held.
+        """
+        evicted = self.store.evict_idle(cutoff=time.time() - self.idle_timeout)
+        cutoff = time.monotonic() - self.idle_timeout
+        idle_game_ids = [game_id for game_id, session in self.sessions.items() if session.last_access < cutoff]
+        for game_id in set(evicted).union(idle_game_ids): self.sessions.pop(game_id, None)
+        if self.on_evict:
+            for game_id, version in evicted.items(): self.on_evict(game_id, version)
+        self.evictions += len(evicted)
+        return len(evicted)
+
+    def memory_usage(self) -> int:
+        """Estimates the bytes held by the games cached in this process, counting shared objects such as cards once."""
+        seen = set()
+        return sum(estimate_size(session.game, seen) for session in list(self.sessions.values()))
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the session counters."""
+        with self.lock:
+            self.evict_idle()
+        return {
+            "active_sessions": self.store.count(),
+            "cached_sessions": len(self.sessions),
+            "max_sessions": self.max_sessions,
+            "evicted_sessions": self.evictions,
+            "conflicts": self.conflicts,
+            "memory_bytes": self.memory_usage(),
+        }
@@ -0,0 +1,274 @@
+import sqlite3
+import struct
+import time
+from contextlib import contextmanager
+from queue import Queue
+from threading import Lock
+from typing import Dict, Iterator, Optional, Tuple
+from pygin import GinRummyEngine
+from pygin.engine import EngineSnapshot
+
+# seed, version, known cards, scores, rounds won, start and current player, flags, computer seat,
+# then the lengths of the two names, the deck, the discard pile and the two hands, and whether an RNG state follows.
+GAME_HEADER = struct.Struct("<QQQQiiHHBBBBHHBBBBB")
+RNG_STATE = struct.Struct("<625I?d")
+NO_AI_PLAYER = 0xFF
+ROUND_OVER = 1
+HAS_DISCARDED = 2
+
+
+class StoreConflictError(Exception):
+    """Exception raised when a game was changed by another request since it was loaded."""
+    def __init__(self, message="The game was changed by another request. Retry with the current state."):
+        self.message = message
+        super().__init__(self.message)
+
+
+def serialize_game(game: GinRummyEngine, ai_player_idx: Optional[int] = None) -> bytes:
+    """Pack a game into a few hundred bytes plus the RNG state, with cards stored as card indices."""
+    snapshot = game.snapshot()
+    names = [player.name.encode("utf-8") for player in game.players]
+    header = GAME_HEADER.pack(
+        game.seed, snapshot.version, snapshot.known_cards[0], snapshot.known_cards[1],
+        snapshot.scores[0], snapshot.scores[1], snapshot.rounds_won[0], snapshot.rounds_won[1],
+        snapshot.start_player_idx, snapshot.current_player_idx,
+        (ROUND_OVER if snapshot.round_over else 0) | (HAS_DISCARDED if snapshot.has_discarded else 0),
+        NO_AI_PLAYER if ai_player_idx is None else ai_player_idx,
+        len(names[0]), len(names[1]), len(snapshot.deck), len(snapshot.discard_stack),
+        len(snapshot.hands[0]), len(snapshot.hands[1]), True,
+    )
+    _, internal_state, gauss_next = snapshot.rng_state
+    rng_state = RNG_STATE.pack(*internal_state, gauss_next is not None, gauss_next or 0.0)
+    return b"".join([header, names[0], names[1], snapshot.deck, snapshot.discard_stack, snapshot.hands[0], snapshot.hands[1], rng_state])
+
+
+def deserialize_game(data: bytes) -> Tuple[GinRummyEngine, Optional[int]]:
+    """Rebuild a game packed by serialize_game. Returns the game and the computer's seat, if any."""
+    (seed, version, known_cards_0, known_cards_1, score_0, score_1, rounds_won_0, rounds_won_1,
+     start_player_idx, current_player_idx, flags, ai_player_idx,
+     *lengths, has_rng_state) = GAME_HEADER.unpack_from(data)
+    fields, offset = [], GAME_HEADER.size
+    for length in lengths:
+        fields.append(bytes(data[offset:offset + length]))
+        offset += length
+    name_1, name_2, deck, discard_stack, hand_0, hand_1 = fields
+    rng_state = None
+    if has_rng_state:
+        *internal_state, has_gauss_next, gauss_next = RNG_STATE.unpack_from(data, offset)
+        rng_state = (3, tuple(internal_state), gauss_next if has_gauss_next else None)
+
+    game = GinRummyEngine(player1=name_1.decode("utf-8"), player2=name_2.decode("utf-8"), seed=seed)
+    game.restore(EngineSnapshot(
+        deck=deck,
+        discard_stack=discard_stack,
+        hands=(hand_0, hand_1),
+        known_cards=(known_cards_0, known_cards_1),
+        scores=(score_0, score_1),
+        rounds_won=(rounds_won_0, rounds_won_1),
+        start_player_idx=start_player_idx,
+        current_player_idx=current_player_idx,
+        round_over=bool(flags & ROUND_OVER),
+        has_discarded=bool(flags & HAS_DISCARDED),
+        version=version,
+        rng_state=rng_state,
+    ))
+    return game, None if ai_player_idx == NO_AI_PLAYER else ai_player_idx
+
+
+class GameStore(object):
+    """
+    Storage for serialized games, keyed by game id.
+
+    Every game carries a version. save only succeeds if the stored version is still the one the
+    caller loaded, so two workers changing the same game cannot overwrite each other's moves.
+    """
+
+    shared = False  # Whether other processes see the same games.
+
+    def create(self, game_id: str, data: bytes, version: int):
+        raise NotImplementedError
+
+    def load(self, game_id: str, known_version: Optional[int] = None) -> Optional[Tuple[bytes, int]]:
+        """Returns (data, version), or None if the game does not exist or still has known_version."""
+        raise NotImplementedError
+
+    def save(self, game_id: str, data: bytes, version: int, expected_version: int):
+        """Replaces the game if its stored version is expected_version, otherwise raises StoreConflictError."""
+        raise NotImplementedError
+
+    def exists(self, game_id: str) -> bool:
+        raise NotImplementedError
+
+    def delete(self, game_id: str) -> Optional[int]:
+        """Deletes the game. Returns the version it was deleted at, or None if there was no such game."""
+        raise NotImplementedError
+
+    def touch(self, game_id: str):
+        """Marks the game as used now, so evict_idle keeps it. Saving a game marks it too."""
+        raise NotImplementedError
+
+    def evict_idle(self, cutoff: float) -> Dict[str, int]:
+        """Deletes games not used since the cutoff (a time.time() value). Returns the versions of the deleted games by id."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class MemoryStore(GameStore):
+    """Keeps games in this process. Only usable with a single server worker."""
+
+    def __init__(self):
+        self.games: Dict[str, Tuple[bytes, int, float]] = {}  # Game id to data, version and time last used.
+        self.lock = Lock()
+
+    def create(self, game_id: str, data: bytes, version: int):
+        with self.lock:
+            self.games[game_id] = (data, version, time.time())
+
+    def load(self, game_id: str, known_version: Optional[int] = None) -> Optional[Tuple[bytes, int]]:
+        entry = self.games.get(game_id)
+        if entry is None or entry[1] == known_version: return None
+        return entry[0], entry[1]
+
+    def save(self, game_id: str, data: bytes, version: int, expected_version: int):
+        with self.lock:
+            entry = self.games.get(game_id)
+            if entry is None or entry[1] != expected_version: raise StoreConflictError
+            self.games[game_id] = (data, version, time.time())
+
+    def exists(self, game_id: str) -> bool:
+        return game_id in self.games
+
+    def delete(self, game_id: str) -> Optional[int]:
+        with self.lock:
+            entry = self.games.pop(game_id, None)
+        return entry[1] if entry else None
+
+    def touch(self, game_id: str):
+        with self.lock:
+            entry = self.games.get(game_id)
+            if entry is not None: self.games[game_id] = (entry[0], entry[1], time.time())
+
+    def evict_idle(self, cutoff: float) -> Dict[str, int]:
+        with self.lock:
+            idle_game_ids = [game_id for game_id, (_, _, used_at) in self.games.items() if used_at < cutoff]
+            return {game_id: self.games.pop(game_id)[1] for game_id in idle_game_ids}
+
+    def count(self) -> int:
+        return len(self.games)
+
+
+class ConnectionPool(object):
+    """A fixed number of SQLite connections shared by the request threads."""
+
+    def __init__(self, path: str, size: int):
+        self.connections: Queue = Queue()
+        for _ in range(size):
+            connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+            connection.execute("PRAGMA journal_mode=WAL")  # Readers do not block the writer and vice versa.
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.connections.put(connection)
+        self.size = size
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        connection = self.connections.get()
+        try:
+            yield connection
+        finally:
+            self.connections.put(connection)
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """A connection inside a write transaction that is committed on success and rolled back on error."""
+        with self.connection() as connection:
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield connection
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+    def close(self):
+        for _ in range(self.size): self.connections.get().close()
+
+
+class SQLiteStore(GameStore):
+    """Keeps games in a SQLite database in WAL mode, shared by all workers on the machine."""
+
+    shared = True
+
+    def __init__(self, path: str, pool_size: int = 4):
+        self.path = path
+        self.pool = ConnectionPool(path=path, size=pool_size)
+        with self.pool.connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS games ("
+                "game_id TEXT PRIMARY KEY, data BLOB NOT NULL, version INTEGER NOT NULL, saved_at REAL NOT NULL)"
+            )  # saved_at is the time the game was last saved or touched.
+            connection.execute("CREATE INDEX IF NOT EXISTS games_saved_at ON games (saved_at)")
+
+    def __repr__(self):
+        return f"SQLiteStore(path={self.path})"
+
+    def create(self, game_id: str, data: bytes, version: int):
+        with self.pool.connection() as connection:
+            connection.execute("INSERT INTO games VALUES (?, ?, ?, ?)", (game_id, data, version, time.time()))
+
+    def load(self, game_id: str, known_version: Optional[int] = None) -> Optional[Tuple[bytes, int]]:
+        with self.pool.connection() as connection:
+            # The blob is only read when the caller's copy is out of date.
+            row = connection.execute(
+                "SELECT data, version FROM games WHERE game_id = ? AND version IS NOT ?", (game_id, known_version)
+            ).fetchone()
+        return row
+
+    def save(self, game_id: str, data: bytes, version: int, expected_version: int):
+        with self.pool.connection() as connection:
+            cursor = connection.execute(
+                "UPDATE games SET data = ?, version = ?, saved_at = ? WHERE game_id = ? AND version = ?",
+                (data, version, time.time(), game_id, expected_version),
+            )
+        if cursor.rowcount == 0: raise StoreConflictError
+
+    def exists(self, game_id: str) -> bool:
+        with self.pool.connection() as connection:
+            return connection.execute("SELECT 1 FROM games WHERE game_id = ?", (game_id,)).fetchone() is not None
+
+    def delete(self, game_id: str) -> Optional[int]:
+        with self.pool.transaction() as connection:
+            row = connection.execute("SELECT version FROM games WHERE game_id = ?", (game_id,)).fetchone()
+            connection.execute("DELETE FROM games WHERE game_id = ?", (game_id,))
+        return row[0] if row else None
+
+    def touch(self, game_id: str):
+        with self.pool.connection() as connection:
+            connection.execute("UPDATE games SET saved_at = ? WHERE game_id = ?", (time.time(), game_id))
+
+    def evict_idle(self, cutoff: float) -> Dict[str, int]:
+        with self.pool.transaction() as connection:
+            versions = dict(connection.execute("SELECT game_id, version FROM games WHERE saved_at < ?", (cutoff,)).fetchall())
+            connection.execute("DELETE FROM games WHERE saved_at < ?", (cutoff,))
+        return versions
+
+    def count(self) -> int:
+        with self.pool.connection() as connection:
+            return connection.execute("SELECT COUNT(*) FROM games").fetchone()[0]
+
+    def close(self):
+        self.pool.close()
+
+
+def create_store(config: Dict) -> GameStore:
+    """Builds the store named in the sessions section of the configuration."""
+    backend = config.get('store', 'memory')
+    if backend == 'memory':
+        return MemoryStore()
+    if backend == 'sqlite':
+        return SQLiteStore(path=config.get('sqlite_path', 'games.db'), pool_size=config.get('pool_size', 4))
+    raise ValueError(f"Unknown session store: {backend}")
@@ -1,3 +1,4 @@
+import sys
 import yaml
 
 
@@ -12,3 +13,20 @@ def load_config(config_file):
         print(f"Error: Invalid YAML format in '{config_file}': {e}")
         return {}
     return config
+
+
+def estimate_size(obj, seen=None):
+    """Estimate the memory held by an object and everything it references, in bytes."""
+    if seen is None: seen = set()
+    if id(obj) in seen: return 0
+    seen.add(id(obj))
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_size(key, seen) + estimate_size(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(estimate_size(item, seen) for item in obj)
+    if hasattr(obj, '__dict__'):
+        size += estimate_size(vars(obj), seen)
+    for slot in getattr(type(obj), '__slots__', ()):
+        if hasattr(obj, slot): size += estimate_size(getattr(obj, slot), seen)
+    return size
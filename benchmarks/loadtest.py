@@ -0,0 +1,377 @@
+"""
+Load test for the HTTP API with simulated players.
+
+Starts the backend with uvicorn (or targets a running server with --url) and ramps up
+asyncio bots through the given concurrency stages. Every bot plays complete games for both
+seats: the player whose turn it is thinks for a while, during which the waiting player polls
+/get_game_state with since_version, then draws, asks for the suggested discard and discards,
+knocking whenever it can. Some turns also ask for /hand_equity, as the hint panel does.
+
+For every stage the report has the requests per second, p50/p99 latency and error rate per
+endpoint, the server's CPU and memory use and the solver counters from /metrics:
+
+    python -m benchmarks.loadtest --ramp 10 50 100 --stage-seconds 30 --output load.json
+    python -m benchmarks.loadtest --url http://localhost:8000 --ramp 20
+
+Needs httpx; psutil is used for the server's resource usage if installed, /proc otherwise.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+from pygin.constants import MAX_SCORE
+from benchmarks.run import percentile
+
+PLAYER_NAMES = ("player1", "player2")
+SOLVER_METRICS = ("pygin_solver_searches_total", "pygin_solver_nodes_total", "pygin_deadwood_cache_hits_total", "pygin_deadwood_cache_misses_total")
+
+
+class Recorder(object):
+    """Latencies and failures of the requests sent during the current stage, by endpoint."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.started_at = time.perf_counter()
+
+    def record(self, endpoint: str, seconds: float, error: Optional[str] = None):
+        self.latencies[endpoint].append(seconds)
+        if error is not None: self.errors[endpoint][error] += 1
+
+    def summary(self) -> Dict:
+        seconds = time.perf_counter() - self.started_at
+        endpoints = {}
+        for endpoint, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+            errors = sum(self.errors[endpoint].values())
+            endpoints[endpoint] = {
+                "requests": len(latencies),
+                "rps": len(latencies) / seconds,
+                "p50_ms": percentile(latencies, 0.50) * 1000,
+                "p99_ms": percentile(latencies, 0.99) * 1000,
+                "error_rate": errors / len(latencies),
+                "errors": dict(self.errors[endpoint]),
+            }
+        requests = sum(len(latencies) for latencies in self.latencies.values())
+        errors = sum(sum(errors.values()) for errors in self.errors.values())
+        return {
+            "seconds": seconds,
+            "requests": requests,
+            "rps": requests / seconds,
+            "error_rate": errors / max(requests, 1),
+            "endpoints": endpoints,
+        }
+
+
+class RequestFailed(Exception):
+    """Exception raised by a bot request that returned an error status or did not complete."""
+
+
+class Bot(object):
+    """One simulated table, playing game after game until it is cancelled."""
+
+    def __init__(self, client, recorder: Recorder, rng: random.Random, think_time: float, poll_interval: float,
+                 discard_draw_probability: float, hint_probability: float, max_turns: int):
+        self.client = client
+        self.recorder = recorder
+        self.rng = rng
+        self.think_time = think_time
+        self.poll_interval = poll_interval
+        self.discard_draw_probability = discard_draw_probability
+        self.hint_probability = hint_probability
+        self.max_turns = max_turns
+        self.games = 0
+
+    async def request(self, method: str, endpoint: str, **kwargs):
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, endpoint, **kwargs)
+        except Exception as e:
+            self.recorder.record(endpoint, time.perf_counter() - start, error=type(e).__name__)
+            raise RequestFailed(f"{endpoint}: {e!r}") from None
+        seconds = time.perf_counter() - start
+        if response.status_code >= 400:
+            self.recorder.record(endpoint, seconds, error=str(response.status_code))
+            raise RequestFailed(f"{endpoint}: {response.status_code} {response.text}")
+        self.recorder.record(endpoint, seconds)
+        return response
+
+    async def run(self):
+        while True:
+            try:
+                await self.play_game()
+            except RequestFailed:
+                await asyncio.sleep(self.poll_interval)  # Failures are recorded; start over with a new game.
+
+    async def play_game(self):
+        response = await self.request("POST", "/start_game", params={"player1_name": PLAYER_NAMES[0], "player2_name": PLAYER_NAMES[1]})
+        game_id = response.json()["game_id"]
+        try:
+            scores = [0, 0]
+            while max(scores) < MAX_SCORE:
+                result = await self.play_round(game_id)
+                if result is not None: scores[result["winner_idx"]] += abs(result["points"])
+                if max(scores) < MAX_SCORE: await self.request("GET", "/reset_round", params={"game_id": game_id})
+            self.games += 1
+        finally:
+            await self.request("POST", "/reset_game", params={"game_id": game_id})
+
+    async def play_round(self, game_id: str) -> Optional[Dict]:
+        """Play turns until someone knocks. Returns the knock result, or None if the round ran out of turns."""
+        states = {}
+        for player_name in PLAYER_NAMES:
+            states[player_name] = (await self.request("GET", "/get_game_state", params={"game_id": game_id, "player_name": player_name})).json()
+        for _ in range(self.max_turns):
+            player_name = next(name for name in PLAYER_NAMES if states[name]["is_current_player"])
+            waiting_name = PLAYER_NAMES[1 - PLAYER_NAMES.index(player_name)]
+            await self.think(game_id, waiting_name, states)
+
+            state = await self.poll_state(game_id, player_name, states)
+            if self.rng.random() < self.hint_probability:
+                await self.request("GET", "/hand_equity", params={"game_id": game_id, "player_name": player_name})
+            from_discard_stack = state["discard_pile_top"] is not None and self.rng.random() < self.discard_draw_probability
+            await self.request("POST", "/draw_card", params={"game_id": game_id, "from_discard_stack": from_discard_stack})
+            suggestions = (await self.request("GET", "/suggest_discard", params={"game_id": game_id, "player_name": player_name})).json()["discards"]
+            await self.request("POST", "/discard_card", params={"game_id": game_id}, json=suggestions[0]["card"])
+
+            state = await self.poll_state(game_id, player_name, states)
+            if state["can_knock"]:  # Otherwise the server has already passed the turn.
+                return (await self.request("POST", "/knock", params={"game_id": game_id})).json()["result"]
+            await self.poll_state(game_id, waiting_name, states)
+        return None
+
+    async def think(self, game_id: str, waiting_name: str, states: Dict[str, Dict]):
+        """Wait for the current player to move, with the waiting player polling for changes."""
+        remaining = self.rng.expovariate(1 / self.think_time) if self.think_time > 0 else 0.0
+        while remaining > 0:
+            await asyncio.sleep(min(remaining, self.poll_interval))
+            remaining -= self.poll_interval
+            await self.poll_state(game_id, waiting_name, states)
+
+    async def poll_state(self, game_id: str, player_name: str, states: Dict[str, Dict]) -> Dict:
+        """Fetch a player's state, sending the last seen version so that an unchanged game costs a 304."""
+        state = states[player_name]
+        response = await self.request("GET", "/get_game_state", params={"game_id": game_id, "player_name": player_name, "since_version": state["version"]})
+        if response.status_code != 304: states[player_name] = state = response.json()
+        return state
+
+
+class ServerResources(object):
+    """CPU time and resident memory of a server process and its workers."""
+
+    def __init__(self, pid: int):
+        self.pid = pid
+        try:
+            import psutil
+            self.process = psutil.Process(pid)
+        except ImportError:
+            self.process = None
+        self.clock_ticks = os.sysconf("SC_CLK_TCK")
+        self.page_size = os.sysconf("SC_PAGE_SIZE")
+
+    def pids(self) -> List[int]:
+        pids, pending = [], [self.pid]
+        while pending:
+            pid = pending.pop()
+            pids.append(pid)
+            try:
+                for task in os.listdir(f"/proc/{pid}/task"):
+                    with open(f"/proc/{pid}/task/{task}/children") as file: pending.extend(int(child) for child in file.read().split())
+            except OSError:
+                pass
+        return pids
+
+    def sample(self) -> Tuple[float, int]:
+        """Total CPU seconds used so far and the current resident memory in bytes."""
+        if self.process is not None:
+            import psutil
+            cpu_seconds, rss = 0.0, 0
+            for process in [self.process] + self.process.children(recursive=True):
+                try:
+                    times = process.cpu_times()
+                    cpu_seconds += times.user + times.system
+                    rss += process.memory_info().rss
+                except psutil.NoSuchProcess:
+                    pass
+            return cpu_seconds, rss
+        cpu_ticks, pages = 0, 0
+        for pid in self.pids():
+            try:
+                with open(f"/proc/{pid}/stat") as file: fields = file.read().rsplit(")", 1)[1].split()
+                with open(f"/proc/{pid}/statm") as file: pages += int(file.read().split()[1])
+            except OSError:
+                continue
+            cpu_ticks += int(fields[11]) + int(fields[12])  # utime and stime.
+        return cpu_ticks / self.clock_ticks, pages * self.page_size
+
+
+async def monitor_resources(resources: ServerResources, peaks: List[int], interval: float = 0.5):
+    """Keep the peak resident memory of the server up to date while a stage runs."""
+    while True:
+        peaks[0] = max(peaks[0], resources.sample()[1])
+        await asyncio.sleep(interval)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, workers: int) -> subprocess.Popen:
+    """Start the backend with uvicorn from the repository root, so that it reads config.yml."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.server:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=root,
+    )
+
+
+async def wait_until_ready(client, server: Optional[subprocess.Popen], timeout: float = 30.0):
+    deadline = time.perf_counter() + timeout
+    while True:
+        if server is not None and server.poll() is not None: raise RuntimeError(f"The server exited with code {server.returncode}")
+        try:
+            if (await client.get("/session_stats")).status_code == 200: return
+        except Exception:
+            if time.perf_counter() > deadline: raise
+        await asyncio.sleep(0.2)
+
+
+async def scrape_solver_metrics(client) -> Dict[str, float]:
+    """The solver and cache counters of the worker that answers /metrics."""
+    values = {}
+    try:
+        text = (await client.get("/metrics")).text
+    except Exception:
+        return values
+    for line in text.splitlines():
+        name, _, value = line.partition(" ")
+        if name in SOLVER_METRICS: values[name] = float(value)
+    return values
+
+
+async def run_load(url: str, ramp: List[int], stage_seconds: float, seed: int, server: Optional[subprocess.Popen],
+                   bot_options: Dict) -> List[Dict]:
+    try:
+        import httpx
+    except ImportError:
+        raise ImportError("The load test needs httpx: pip install httpx") from None
+    limits = httpx.Limits(max_connections=max(ramp), max_keepalive_connections=max(ramp))
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30.0) as client:
+        await wait_until_ready(client, server)
+        resources = ServerResources(server.pid) if server is not None else None
+        recorder = Recorder()
+        bots: List[Bot] = []
+        tasks: List[asyncio.Task] = []
+        stages = []
+        try:
+            for concurrency in ramp:
+                while len(bots) < concurrency:
+                    bot = Bot(client=client, recorder=recorder, rng=random.Random(f"{seed}:{len(bots)}"), **bot_options)
+                    bots.append(bot)
+                    tasks.append(asyncio.create_task(bot.run()))
+                while len(bots) > concurrency:
+                    bots.pop()
+                    tasks.pop().cancel()
+
+                solver_before = await scrape_solver_metrics(client)
+                games_before = sum(bot.games for bot in bots)
+                cpu_before = resources.sample()[0] if resources else None
+                client_cpu_before = time.process_time()
+                peaks = [0]
+                monitor = asyncio.create_task(monitor_resources(resources, peaks)) if resources else None
+                recorder.reset()
+                await asyncio.sleep(stage_seconds)
+                stage = {"concurrency": concurrency, **recorder.summary(), "games": sum(bot.games for bot in bots) - games_before}
+                # A load generator near 100% of a core is measuring itself rather than the server.
+                stage["client_cpu_percent"] = 100 * (time.process_time() - client_cpu_before) / stage["seconds"]
+                if monitor is not None:
+                    monitor.cancel()
+                    cpu_seconds, rss = resources.sample()
+                    stage["server"] = {
+                        "cpu_percent": 100 * (cpu_seconds - cpu_before) / stage["seconds"],
+                        "rss_bytes": rss,
+                        "peak_rss_bytes": max(peaks[0], rss),
+                    }
+                solver_after = await scrape_solver_metrics(client)
+                stage["solver"] = {name: solver_after[name] - solver_before.get(name, 0.0) for name in solver_after}
+                stages.append(stage)
+                print_stage(stage)
+        finally:
+            for task in tasks: task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+    return stages
+
+
+def print_stage(stage: Dict):
+    server = stage.get("server")
+    resources = f" cpu {server['cpu_percent']:.0f}% rss {server['peak_rss_bytes'] / 2 ** 20:.0f}MB" if server else ""
+    print(f"{stage['concurrency']} bots: {stage['rps']:.0f} req/s, {stage['games']} games, errors {stage['error_rate']:.2%}{resources} "
+          f"client cpu {stage['client_cpu_percent']:.0f}%", file=sys.stderr)
+    for endpoint, result in stage["endpoints"].items():
+        print(f"  {endpoint}: {result['rps']:.1f} req/s p50 {result['p50_ms']:.1f}ms p99 {result['p99_ms']:.1f}ms errors {result['error_rate']:.2%}", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Load an already running server instead of starting one.")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes of the started server; more than one needs a shared session store.")
+    parser.add_argument("--ramp", type=int, nargs="+", default=[1, 10, 50], help="Number of concurrent bots in each stage.")
+    parser.add_argument("--stage-seconds", type=float, default=20.0, help="Duration of each stage.")
+    parser.add_argument("--think-time", type=float, default=0.5, help="Mean seconds a player thinks before moving (exponentially distributed).")
+    parser.add_argument("--poll-interval", type=float, default=0.25, help="Seconds between the waiting player's state polls.")
+    parser.add_argument("--discard-draw-probability", type=float, default=0.3, help="Chance of drawing from the discard pile.")
+    parser.add_argument("--hint-probability", type=float, default=0.1, help="Chance of requesting /hand_equity before a draw.")
+    parser.add_argument("--max-turns", type=int, default=200, help="Turns after which a round without a knock is dealt again.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed for the bots' decisions.")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout.")
+    parser.add_argument("--max-error-rate", type=float, help="Exit non-zero if any stage's error rate exceeds this fraction.")
+    args = parser.parse_args(argv)
+
+    server = None
+    url = args.url
+    if url is None:
+        port = free_port()
+        server = start_server(port=port, workers=args.workers)
+        url = f"http://127.0.0.1:{port}"
+    bot_options = {
+        "think_time": args.think_time,
+        "poll_interval": args.poll_interval,
+        "discard_draw_probability": args.discard_draw_probability,
+        "hint_probability": args.hint_probability,
+        "max_turns": args.max_turns,
+    }
+    try:
+        stages = asyncio.run(run_load(url=url, ramp=args.ramp, stage_seconds=args.stage_seconds, seed=args.seed, server=server, bot_options=bot_options))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=30)
+
+    report = json.dumps({"url": url, "workers": args.workers if server else None, "stages": stages}, indent=2)
+    if args.output:
+        with open(args.output, "w") as file: file.write(report)
+    else:
+        print(report)
+
+    if args.max_error_rate is not None and any(stage["error_rate"] > args.max_error_rate for stage in stages):
+        print(f"Error rate above {args.max_error_rate:.2%}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,219 @@
+"""
+Benchmark suite for the solver, engine and HTTP hot paths.
+
+Every workload uses fixed seeds so runs are comparable. Each workload reports latency
+percentiles and its peak traced memory, the report is written as JSON, and a stored baseline
+can be used to flag regressions:
+
+    python -m benchmarks.run --output bench.json --baseline benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline benchmarks/baseline.json
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+from pygin import GinRummyEngine, Hand
+from pygin.constants import FULL_DECK, HAND_SIZE
+from pygin.melds import DEADWOOD_CACHE
+from pygin.strategies import greedy_strategy, play_round
+from pygin.utils import mark_deadwood, find_optimal_melds
+
+Workload = Callable[[int], Callable[[], None]]  # Takes the sample index, returns the operation to time.
+
+
+def make_hand(cards) -> Hand:
+    hand = Hand()
+    for card in cards: hand.add_card(card)
+    return hand
+
+
+def random_hands(hand_size: int, count: int, seed: int) -> List[list]:
+    rng = random.Random(seed)
+    return [rng.sample(FULL_DECK, hand_size) for _ in range(count)]
+
+
+def pathological_hands() -> List[list]:
+    """Hands where most cards belong to several overlapping sets and runs."""
+    by_rank_and_suit = {(card.rank, card.suit): card for card in FULL_DECK}
+    ranks = [['5', '6', '7'], ['9', '10', 'J'], ['2', '3', '4']]
+    hands = []
+    for rank_group in ranks:
+        cards = [card for card in FULL_DECK if card.rank in rank_group]  # 12 cards: 3 sets x 4 runs
+        for skipped in cards: hands.append([card for card in cards if card is not skipped])
+    hands.append([by_rank_and_suit[(rank, suit)] for suit in ['Hearts', 'Spades'] for rank in ['4', '5', '6', '7', '8']] + [by_rank_and_suit[('6', 'Clubs')]])
+    return hands
+
+
+def solver_workload(hands: List[list]) -> Workload:
+    """The full meld search behind mark_deadwood for a hand seen for the first time."""
+    def workload(sample_idx: int) -> Callable[[], None]:
+        cards = hands[sample_idx % len(hands)]
+        DEADWOOD_CACHE.clear()  # Measure the search itself, not a cache hit.
+        return lambda: find_optimal_melds(cards)
+    return workload
+
+
+def hand_build_workload(hands: List[list]) -> Workload:
+    """Dealing a hand card by card with incremental meld tracking, then marking its deadwood."""
+    def workload(sample_idx: int) -> Callable[[], None]:
+        cards = hands[sample_idx % len(hands)]
+        DEADWOOD_CACHE.clear()
+        return lambda: mark_deadwood(make_hand(cards))
+    return workload
+
+
+def engine_round_workload(sample_idx: int) -> Callable[[], None]:
+    engine = GinRummyEngine(player1="player1", player2="player2", seed=sample_idx)
+    engine.deal_initial_hands()
+    rng = random.Random(sample_idx)
+    return lambda: play_round(engine=engine, strategies=[greedy_strategy, greedy_strategy], rng=rng)
+
+
+def deal_workload(sample_idx: int) -> Callable[[], None]:
+    engine = GinRummyEngine(player1="player1", player2="player2", seed=sample_idx)
+    engine.deal_initial_hands()
+    return engine.reset_round
+
+
+def http_workloads() -> Dict[str, Workload]:
+    """Workloads for the FastAPI endpoints, driven through an in-process client."""
+    try:
+        from fastapi.testclient import TestClient
+        from backend.server import app
+    except ImportError as e:
+        print(f"Skipping HTTP benchmarks: {e}", file=sys.stderr)
+        return {}
+    client = TestClient(app)
+
+    def start_game() -> str:
+        return client.post("/start_game", params={"player1_name": "player1", "player2_name": "player2"}).json()["game_id"]
+
+    def current_player(game_id: str) -> str:
+        state = client.get("/get_game_state", params={"game_id": game_id, "player_name": "player1"}).json()
+        return "player1" if state["is_current_player"] else "player2"
+
+    def start_game_workload(sample_idx: int) -> Callable[[], None]:
+        return start_game
+
+    def game_state_workload(sample_idx: int) -> Callable[[], None]:
+        game_id = start_game()
+        return lambda: client.get("/get_game_state", params={"game_id": game_id, "player_name": "player1"})
+
+    def draw_card_workload(sample_idx: int) -> Callable[[], None]:
+        game_id = start_game()
+        return lambda: client.post("/draw_card", params={"game_id": game_id, "from_discard_stack": False})
+
+    def discard_card_workload(sample_idx: int) -> Callable[[], None]:
+        game_id = start_game()
+        client.post("/draw_card", params={"game_id": game_id, "from_discard_stack": False})
+        player_name = current_player(game_id)
+        card = client.get("/get_player_hand", params={"game_id": game_id, "player_name": player_name}).json()["hand"][0]
+        return lambda: client.post("/discard_card", params={"game_id": game_id}, json=card)
+
+    return {
+        "http_start_game": start_game_workload,
+        "http_get_game_state": game_state_workload,
+        "http_draw_card": draw_card_workload,
+        "http_discard_card": discard_card_workload,
+    }
+
+
+def get_workloads(include_http: bool) -> Dict[str, Workload]:
+    workloads = {
+        "solver_10": solver_workload(random_hands(hand_size=HAND_SIZE, count=256, seed=10)),
+        "solver_11": solver_workload(random_hands(hand_size=HAND_SIZE + 1, count=256, seed=11)),
+        "solver_pathological": solver_workload(pathological_hands()),
+        "mark_deadwood_11": hand_build_workload(random_hands(hand_size=HAND_SIZE + 1, count=256, seed=11)),
+        "mark_deadwood_pathological": hand_build_workload(pathological_hands()),
+        "engine_round": engine_round_workload,
+        "deck_reset_and_deal": deal_workload,
+    }
+    if include_http: workloads.update(http_workloads())
+    return workloads
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    return sorted_values[min(int(fraction * len(sorted_values)), len(sorted_values) - 1)]
+
+
+def run_workload(workload: Workload, samples: int) -> Dict[str, float]:
+    """Time each sample, then repeat a few samples under tracemalloc to find the memory peak."""
+    timings = []
+    for sample_idx in range(samples):
+        operation = workload(sample_idx)
+        start = time.perf_counter_ns()
+        operation()
+        timings.append((time.perf_counter_ns() - start) / 1000)
+
+    peak = 0
+    for sample_idx in range(min(samples, 20)):
+        operation = workload(sample_idx)
+        tracemalloc.start()
+        operation()
+        peak = max(peak, tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    timings.sort()
+    return {
+        "samples": samples,
+        "mean_us": sum(timings) / len(timings),
+        "p50_us": percentile(timings, 0.50),
+        "p90_us": percentile(timings, 0.90),
+        "p99_us": percentile(timings, 0.99),
+        "max_us": timings[-1],
+        "peak_memory_bytes": peak,
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """Return a message for every workload whose p50 or memory peak regressed beyond the tolerance."""
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline: continue
+        for metric in ("p50_us", "peak_memory_bytes"):
+            allowed = baseline[name][metric] * (1 + tolerance)
+            if result[metric] > allowed:
+                regressions.append(f"{name}: {metric} {result[metric]:.1f} > {baseline[name][metric]:.1f} (+{tolerance:.0%} allowed)")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--samples", type=int, default=500, help="Samples per workload.")
+    parser.add_argument("--only", nargs="*", help="Run only the named workloads.")
+    parser.add_argument("--no-http", action="store_true", help="Skip the FastAPI endpoint workloads.")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout.")
+    parser.add_argument("--baseline", help="Compare against a stored JSON report and fail on regressions.")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown before a regression is flagged.")
+    parser.add_argument("--save-baseline", help="Write the results to this file as the new baseline.")
+    args = parser.parse_args(argv)
+
+    workloads = get_workloads(include_http=not args.no_http)
+    results = {}
+    for name, workload in workloads.items():
+        if args.only and name not in args.only: continue
+        results[name] = run_workload(workload=workload, samples=args.samples)
+        print(f"{name}: p50 {results[name]['p50_us']:.1f}us p99 {results[name]['p99_us']:.1f}us peak {results[name]['peak_memory_bytes']}B", file=sys.stderr)
+
+    report = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as file: file.write(report)
+    else:
+        print(report)
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as file: file.write(report)
+
+    if args.baseline:
+        with open(args.baseline) as file: baseline = json.load(file)
+        regressions = compare(results=results, baseline=baseline, tolerance=args.tolerance)
+        for regression in regressions: print(f"REGRESSION {regression}", file=sys.stderr)
+        if regressions: return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,14 +1,24 @@
 import React, { useState } from 'react';
+import axios from 'axios';
 import GameSetup from './components/GameSetup';
 import GameBoard from './components/GameBoard';
 
 function App() {
   const [gameStarted, setGameStarted] = useState(false);
   const [playerNames, setPlayerNames] = useState(['', '']);
+  const [gameId, setGameId] = useState(null);
 
-  const startGame = (player1, player2) => {
-    setPlayerNames([player1, player2]);
-    setGameStarted(true);
+  const startGame = async (player1, player2) => {
+    try {
+      const response = await axios.post('/start_game', null, {
+        params: { player1_name: player1, player2_name: player2 },
+      });
+      setGameId(response.data.game_id);
+      setPlayerNames([player1, player2]);
+      setGameStarted(true);
+    } catch (error) {
+      console.error('Error starting game:', error);
+    }
   };
 
   return (
@@ -16,7 +26,7 @@ function App() {
       {!gameStarted ? (
         <GameSetup onStartGame={startGame} />
       ) : (
-        <GameBoard playerNames={playerNames} />
+        <GameBoard gameId={gameId} playerNames={playerNames} />
       )}
     </div>
   );
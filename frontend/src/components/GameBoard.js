@@ -1,7 +1,7 @@
 import React, { useState } from 'react';
 import PlayerView from './PlayerView';
 
-function GameBoard({ playerNames }) {
+function GameBoard({ gameId, playerNames }) {
   const [currentPlayer, setCurrentPlayer] = useState(playerNames[0]);
 
   const handlePlayerChange = () => {
@@ -11,7 +11,7 @@ function GameBoard({ playerNames }) {
   return (
     <div>
       <h2>Game Board</h2>
-      <PlayerView playerName={currentPlayer} />
+      <PlayerView gameId={gameId} playerName={currentPlayer} />
       <button onClick={handlePlayerChange}>Switch Player View</button>
     </div>
   );
@@ -2,21 +2,33 @@ import React, { useState, useEffect } from 'react';
 import axios from 'axios';
 import { Card, Deck } from 'react-playing-cards';
 
-function PlayerView({ playerName }) {
+function PlayerView({ gameId, playerName }) {
   const [gameState, setGameState] = useState(null);
+  const [knockResult, setKnockResult] = useState(null);
+  const [hasDiscarded, setHasDiscarded] = useState(false);
 
   useEffect(() => {
-    const fetchGameState = async () => {
-      try {
-        const response = await axios.get(`/get_game_state?player_name=${playerName}`);
-        setGameState(response.data);
-      } catch (error) {
-        console.error('Error fetching game state:', error);
-      }
+    // The server sends the full state on connect and only the changed fields afterwards.
+    setGameState(null);
+    setKnockResult(null);
+    const protocol = window.location.protocol === 'https:' ? 'wss' : 'ws';
+    const socket = new WebSocket(`${protocol}://${window.location.host}/ws/${gameId}/${playerName}`);
+    socket.onmessage = (event) => {
+      const changes = JSON.parse(event.data);
+      setGameState((state) => ({ ...state, ...changes }));
     };
+    socket.onerror = (error) => {
+      console.error('Error receiving game state:', error);
+    };
+
+    return () => socket.close();
+  }, [gameId, playerName]);
 
-    fetchGameState();
-  }, [playerName]);
+  const isCurrentPlayer = gameState ? gameState.is_current_player : false;
+  useEffect(() => {
+    // A new turn starts whenever the turn passes.
+    setHasDiscarded(false);
+  }, [isCurrentPlayer]);
 
   if (!gameState) {
     return <div>Loading...</div>;
@@ -28,6 +40,7 @@ function PlayerView({ playerName }) {
     discard_pile_top,
     deck_size,
     is_current_player,
+    round_over,
     can_knock,
     is_gin,
     gin_score,
@@ -37,9 +50,10 @@ function PlayerView({ playerName }) {
 
   const handleDrawCard = async (fromDiscardPile) => {
     try {
-      const response = await axios.post('/draw_card', { from_discard_stack: fromDiscardPile });
-      // Update the game state with the response data
-      setGameState(response.data);
+      await axios.post('/draw_card', null, {
+        params: { game_id: gameId, from_discard_stack: fromDiscardPile },
+      });
+      // The new game state is pushed over the WebSocket
     } catch (error) {
       console.error('Error drawing card:', error);
     }
@@ -47,22 +61,39 @@ function PlayerView({ playerName }) {
 
   const handleDiscardCard = async (card) => {
     try {
-      await axios.post('/discard_card', card);
-      // Update game state after discarding the card
+      await axios.post('/discard_card', card, { params: { game_id: gameId } });
+      // If the player may knock, the server waits for them to knock or end the turn
+      setHasDiscarded(true);
     } catch (error) {
       console.error('Error discarding card:', error);
     }
   };
 
+  const handleEndTurn = async () => {
+    try {
+      await axios.post('/end_turn', null, { params: { game_id: gameId } });
+    } catch (error) {
+      console.error('Error ending turn:', error);
+    }
+  };
+
   const handleKnock = async () => {
     try {
-      await axios.post('/knock');
-      // Update game state after knocking
+      const response = await axios.post('/knock', null, { params: { game_id: gameId } });
+      setKnockResult(response.data.result);
     } catch (error) {
       console.error('Error knocking:', error);
     }
   };
 
+  const handleGin = async () => {
+    try {
+      await axios.post('/gin', null, { params: { game_id: gameId } });
+    } catch (error) {
+      console.error('Error going Gin:', error);
+    }
+  };
+
   return (
     <div>
       <h2>Your Hand</h2>
@@ -102,13 +133,30 @@ function PlayerView({ playerName }) {
       >
         <Deck count={deck_size} />
       </div>
-      {is_current_player && (
+      {is_current_player && !round_over && (
         <>
           {can_knock && <button onClick={handleKnock}>Knock</button>}
-          {is_gin && <button>Gin ({gin_score} points)</button>}
-          {is_big_gin && <button>Big Gin ({big_gin_score} points)</button>}
+          {can_knock && hasDiscarded && <button onClick={handleEndTurn}>End turn</button>}
+          {is_gin && <button onClick={handleGin}>Gin ({gin_score} points)</button>}
+          {is_big_gin && <button onClick={handleGin}>Big Gin ({big_gin_score} points)</button>}
         </>
       )}
+      {knockResult && (
+        <div>
+          <h2>Knock</h2>
+          <p>Your deadwood: {knockResult.knocker_deadwood}</p>
+          <p>
+            Opponent's deadwood: {knockResult.defender_deadwood_before_layoffs}
+            {knockResult.layoffs.length > 0 && ` (${knockResult.defender_deadwood} after laying off `}
+            {knockResult.layoffs.map((layoff) => layoff.cards.map((card) => `${card.rank} of ${card.suit}`).join(', ')).join('; ')}
+            {knockResult.layoffs.length > 0 && ')'}
+          </p>
+          <p>
+            {knockResult.undercut ? 'Undercut! ' : ''}
+            {Math.abs(knockResult.points)} points to {knockResult.undercut ? 'your opponent' : 'you'}
+          </p>
+        </div>
+      )}
     </div>
   );
 }
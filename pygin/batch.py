@@ -0,0 +1,224 @@
+"""
+Vectorized batch of Gin Rummy games for strategy evaluation.
+
+Holds N games as NumPy arrays (deck permutations, 52-bit hand masks, discard stacks and scores)
+and applies each GinRummyEngine operation to many games at once. Every game owns the same
+random stream as GinRummyEngine(player1, player2, seed=seed), so the same seeds and moves
+produce the same deals, hands and scores as the engine.
+"""
+
+import random
+from typing import Optional, Sequence, Tuple, Union
+import numpy as np
+from .constants import CARD_VALUES, HAND_SIZE, KNOCK_LIMIT, GIN_BONUS, BIG_GIN_BONUS, UNDERCUT_BONUS, ROUND_WIN_BONUS
+from .errors import EmptyDeckError, CardDoesNotExistError
+from .deck import shuffle
+from .melds import MELDS, solve_deadwood
+from .utils import score_knock
+
+NUM_CARDS = len(CARD_VALUES)
+CARD_BITS = np.left_shift(np.uint64(1), np.arange(NUM_CARDS, dtype=np.uint64))
+MELD_MASKS = np.array(MELDS, dtype=np.uint64)
+MELD_CARDS = (MELD_MASKS[:, None] & CARD_BITS[None, :]) != 0
+CARD_VALUE_ARRAY = np.array(CARD_VALUES, dtype=np.int64)
+MELD_VALUES = MELD_CARDS @ CARD_VALUE_ARRAY
+
+GameSelection = Optional[np.ndarray]
+
+
+def mask_bits(masks: np.ndarray) -> np.ndarray:
+    """Expand hand masks into a boolean array with a trailing axis of 52 cards."""
+    return (np.asarray(masks, dtype=np.uint64)[..., None] & CARD_BITS) != 0
+
+
+def deadwood_counts(masks: np.ndarray) -> np.ndarray:
+    """
+    Compute the minimum deadwood points for an array of hand masks.
+
+    Melds contained in each hand are found with one mask comparison against the meld index.
+    Hands whose melds do not overlap are scored directly from those arrays; only hands with
+    overlapping melds (a choice to make) go through the solver, once per distinct hand and
+    through the shared deadwood cache.
+    """
+    masks = np.asarray(masks, dtype=np.uint64)
+    unique_masks, inverse = np.unique(masks.ravel(), return_inverse=True)
+    contained = (unique_masks[:, None] & MELD_MASKS[None, :]) == MELD_MASKS[None, :]
+    coverage = contained.astype(np.int16) @ MELD_CARDS.astype(np.int16)
+    deadwood = mask_bits(unique_masks) @ CARD_VALUE_ARRAY - contained @ MELD_VALUES
+    for idx in np.flatnonzero(coverage.max(axis=1, initial=0) > 1):
+        deadwood[idx], _ = solve_deadwood(mask=int(unique_masks[idx]))
+    return deadwood[inverse.ravel()].reshape(masks.shape)
+
+
+class BatchGinRummy(object):
+    """
+    N games of Gin Rummy stored as arrays and advanced in lockstep.
+
+    Every operation takes an optional array of game indices so games that finish a round early
+    can be left alone. Decks are drawn from the end, like Deck.draw_card.
+    """
+
+    def __init__(self, seeds: Sequence[int]):
+        self.rngs = [random.Random(seed) for seed in seeds]
+        num_games = len(self.rngs)
+        self.decks = np.zeros((num_games, NUM_CARDS), dtype=np.int8)
+        self.deck_sizes = np.zeros(num_games, dtype=np.int64)
+        self.discard_stacks = np.zeros((num_games, NUM_CARDS), dtype=np.int8)
+        self.discard_sizes = np.zeros(num_games, dtype=np.int64)
+        self.hands = np.zeros((num_games, 2), dtype=np.uint64)
+        self.scores = np.zeros((num_games, 2), dtype=np.int64)
+        self.rounds_won = np.zeros((num_games, 2), dtype=np.int64)
+        self.reset_decks(games=None)
+        self.start_player_idx = np.array([rng.randint(0, 1) for rng in self.rngs], dtype=np.int64)
+        self.current_player_idx = self.start_player_idx.copy()
+
+    def __len__(self):
+        return len(self.rngs)
+
+    def __repr__(self):
+        return f"BatchGinRummy(games={len(self)})"
+
+    def select(self, games: GameSelection) -> np.ndarray:
+        """Return the game indices an operation applies to."""
+        return np.arange(len(self)) if games is None else np.asarray(games, dtype=np.int64)
+
+    def reset_decks(self, games: GameSelection):
+        """Refill and shuffle the decks with each game's random stream."""
+        for game_idx in self.select(games):
+            order = list(range(NUM_CARDS))
+            shuffle(self.rngs[game_idx], order)
+            self.decks[game_idx] = order
+            self.deck_sizes[game_idx] = NUM_CARDS
+
+    def reshuffle_discard_stacks(self, games: np.ndarray):
+        """Shuffle the discard piles of the selected games into new decks."""
+        for game_idx in games:
+            cards = self.discard_stacks[game_idx, :self.discard_sizes[game_idx]].tolist()
+            shuffle(self.rngs[game_idx], cards)
+            self.decks[game_idx, :len(cards)] = cards
+            self.deck_sizes[game_idx] = len(cards)
+            self.discard_sizes[game_idx] = 0
+
+    def pop_deck(self, games: np.ndarray) -> np.ndarray:
+        """Draw the top card of each selected deck."""
+        if np.any(self.deck_sizes[games] == 0): raise EmptyDeckError
+        self.deck_sizes[games] -= 1
+        return self.decks[games, self.deck_sizes[games]].astype(np.int64)
+
+    def deal_initial_hands(self, games: GameSelection = None):
+        """Deal 10 cards to each player, alternating from the starting player."""
+        games = self.select(games)
+        first_player_idx = self.start_player_idx[games]
+        for _ in range(HAND_SIZE):
+            for player_idx in [first_player_idx, 1 - first_player_idx]:
+                self.hands[games, player_idx] |= CARD_BITS[self.pop_deck(games=games)]
+
+    def draw_card(self, from_discard_stack: Union[bool, np.ndarray], games: GameSelection = None) -> np.ndarray:
+        """Draw a card for the current players from the deck or the discard pile, returning the card indices."""
+        games = self.select(games)
+        from_discard_stack = np.broadcast_to(from_discard_stack, games.shape) & (self.discard_sizes[games] > 0)
+        cards = np.empty(len(games), dtype=np.int64)
+        discard_games = games[from_discard_stack]
+        self.discard_sizes[discard_games] -= 1
+        cards[from_discard_stack] = self.discard_stacks[discard_games, self.discard_sizes[discard_games]]
+        deck_games = games[~from_discard_stack]
+        self.reshuffle_discard_stacks(games=deck_games[self.deck_sizes[deck_games] == 0])
+        cards[~from_discard_stack] = self.pop_deck(games=deck_games)
+        self.hands[games, self.current_player_idx[games]] |= CARD_BITS[cards]
+        return cards
+
+    def discard_card(self, cards: np.ndarray, games: GameSelection = None):
+        """Discard a card from each current player's hand."""
+        games = self.select(games)
+        cards = np.asarray(cards, dtype=np.int64)
+        player_idx = self.current_player_idx[games]
+        if np.any(self.hands[games, player_idx] & CARD_BITS[cards] == 0): raise CardDoesNotExistError
+        self.hands[games, player_idx] &= ~CARD_BITS[cards]
+        self.discard_stacks[games, self.discard_sizes[games]] = cards
+        self.discard_sizes[games] += 1
+
+    def switch_turn(self, games: GameSelection = None):
+        """Switch the turn to the next player."""
+        games = self.select(games)
+        self.current_player_idx[games] = 1 - self.current_player_idx[games]
+
+    def hand_sizes(self, games: GameSelection = None) -> np.ndarray:
+        """Return the number of cards in each player's hand, shaped (games, 2)."""
+        return mask_bits(self.hands[self.select(games)]).sum(axis=-1)
+
+    def get_deadwood_counts(self, games: GameSelection = None) -> np.ndarray:
+        """Return the deadwood count of each player's hand, shaped (games, 2)."""
+        return deadwood_counts(self.hands[self.select(games)])
+
+    def current_and_opponent_deadwood(self, games: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Return the deadwood counts of the current and opponent players."""
+        deadwood = self.get_deadwood_counts(games=games)
+        rows = np.arange(len(games))
+        current_player_idx = self.current_player_idx[games]
+        return deadwood[rows, current_player_idx], deadwood[rows, 1 - current_player_idx]
+
+    def can_knock(self, games: GameSelection = None) -> np.ndarray:
+        """Check which current players are allowed to knock."""
+        games = self.select(games)
+        current_player_idx = self.current_player_idx[games]
+        return deadwood_counts(self.hands[games, current_player_idx]) <= KNOCK_LIMIT
+
+    def knock(self, games: GameSelection = None):
+        """
+        Score a knock by the current player of each selected game, with the opponent's layoffs.
+
+        Layoffs depend on the knocker's melds, so each knock is settled by score_knock; a game
+        knocks at most once per round, so this is not worth vectorizing.
+        """
+        games = self.select(games)
+        current_player_idx = self.current_player_idx[games]
+        points = np.array([
+            score_knock(knocker_mask=int(self.hands[game_idx, player_idx]), defender_mask=int(self.hands[game_idx, 1 - player_idx]))
+            for game_idx, player_idx in zip(games, current_player_idx)
+        ], dtype=np.int64)
+        winner_idx = np.where(points > 0, current_player_idx, 1 - current_player_idx)
+        self.scores[games, winner_idx] += np.abs(points)
+        self.rounds_won[games, winner_idx] += 1
+
+    def is_gin(self, games: GameSelection = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Check which current players have Gin and what they would win."""
+        return self.check_gin(games=games, hand_size=HAND_SIZE, bonus=GIN_BONUS)
+
+    def is_big_gin(self, games: GameSelection = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Check which current players have Big Gin and what they would win."""
+        return self.check_gin(games=games, hand_size=HAND_SIZE + 1, bonus=BIG_GIN_BONUS)
+
+    def check_gin(self, games: GameSelection, hand_size: int, bonus: int) -> Tuple[np.ndarray, np.ndarray]:
+        """Shared implementation of is_gin and is_big_gin."""
+        games = self.select(games)
+        current_hand_sizes = self.hand_sizes(games=games)[np.arange(len(games)), self.current_player_idx[games]]
+        assert np.all(current_hand_sizes == hand_size)
+        current_deadwood, opponent_deadwood = self.current_and_opponent_deadwood(games=games)
+        is_gin = current_deadwood == 0
+        return is_gin, np.where(is_gin, opponent_deadwood + bonus, 0)
+
+    def gin(self, games: GameSelection = None):
+        """Score Gin (10 cards) or Big Gin (11 cards) for the current player of each selected game."""
+        games = self.select(games)
+        current_player_idx = self.current_player_idx[games]
+        current_hand_sizes = self.hand_sizes(games=games)[np.arange(len(games)), current_player_idx]
+        current_deadwood, opponent_deadwood = self.current_and_opponent_deadwood(games=games)
+        assert np.all(current_deadwood == 0)
+        bonus = np.where(current_hand_sizes == HAND_SIZE + 1, BIG_GIN_BONUS, GIN_BONUS)
+        self.scores[games, current_player_idx] += opponent_deadwood + bonus
+        self.rounds_won[games, current_player_idx] += 1
+
+    def reset_round(self, games: GameSelection = None):
+        """Reset the selected games for a new round."""
+        games = self.select(games)
+        self.reset_decks(games=games)
+        self.discard_sizes[games] = 0
+        self.hands[games] = 0
+        self.start_player_idx[games] = 1 - self.start_player_idx[games]
+        self.current_player_idx[games] = self.start_player_idx[games]
+        self.deal_initial_hands(games=games)
+
+    def compute_final_scores(self, games: GameSelection = None):
+        """Add the round win bonuses to the scores."""
+        games = self.select(games)
+        self.scores[games] += self.rounds_won[games] * ROUND_WIN_BONUS
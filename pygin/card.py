@@ -1,8 +1,10 @@
 from dataclasses import dataclass
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class Card:
+    """A playing card. Cards are immutable, so the cards of FULL_DECK are shared by every deck, hand and game."""
+
     rank: str
     suit: str
 
@@ -7,6 +7,13 @@ FULL_DECK = [
     for suit in SUITS
     for rank in RANKS
 ]
+RANK_VALUES = {rank: 10 if rank in ['J', 'Q', 'K'] else 1 if rank == 'A' else int(rank) for rank in RANKS}
+
+# Compact representation: card i of FULL_DECK is bit i of a 52-bit hand mask.
+RANK_INDEX = {rank: idx for idx, rank in enumerate(RANKS)}
+SUIT_INDEX = {suit: idx for idx, suit in enumerate(SUITS)}
+CARD_INDEX = {card: idx for idx, card in enumerate(FULL_DECK)}
+CARD_VALUES = [RANK_VALUES[card.rank] for card in FULL_DECK]
 MAX_SCORE = 100
 HAND_SIZE = 10
 KNOCK_LIMIT = 10
@@ -14,3 +21,4 @@ GIN_BONUS = 25
 BIG_GIN_BONUS = 50
 UNDERCUT_BONUS = 10
 ROUND_WIN_BONUS = 10
+DEADWOOD_CACHE_SIZE = 65536
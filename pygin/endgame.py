@@ -0,0 +1,278 @@
+"""
+Perfect-information endgame solver.
+
+Once the stock is small, both hands, the discard pile and the set of cards left in the stock can
+be searched exactly. Decisions (draw source, discard, knock or pass) are searched with alpha-beta;
+drawing from the stock is a chance node averaged over the cards it may hold, pruned with Star1
+bounds. Positions are stored in a transposition table keyed by a Zobrist hash.
+
+Every line ends at a real terminal: a knock, Gin or Big Gin, or a draw from the empty stock. The
+engine answers that draw by reshuffling the discard pile into a fresh stock (rule 5), which is no
+longer an endgame, so the solver scores it as a dead round worth 0 points, as under the standard
+rule that a round is void once the stock runs out. Drawing from the discard pile does not shorten
+the stock, so the players can cycle: a position that repeats on the search path is scored as a dead
+round too, and subtrees that met a repetition are kept out of the transposition table.
+
+Values are expected round points for player 0 minus those for player 1. A search that reaches
+max_depth falls back to a deadwood estimate and reports that its value is not exact.
+"""
+
+import math
+import random
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple
+from .cache import LRUCache
+from .constants import CARD_INDEX, CARD_VALUES, HAND_SIZE, KNOCK_LIMIT, GIN_BONUS, BIG_GIN_BONUS
+from .engine import GinRummyEngine
+from .melds import solve_deadwood, solve_removals
+from .strategies import DRAW, DISCARD, KNOCK
+from .utils import iter_mask, score_knock
+
+Action = Tuple[str, int]  # Same encoding as pygin.ismcts: (DRAW, from discard 0/1), (DISCARD, card index), (KNOCK, 0/1)
+ENDGAME_STOCK_SIZE = 2  # Solves in a fraction of a second. Each extra stock card costs over ten times more.
+ENDGAME_MAX_DEPTH = 64  # Decisions along one line. Endgames from ENDGAME_STOCK_SIZE need about 20.
+NUM_CARDS = len(CARD_VALUES)
+VALUE_BOUND = BIG_GIN_BONUS + HAND_SIZE * 10  # No round is worth more points than Big Gin against ten face cards.
+EXACT, LOWER, UPPER = 0, 1, 2
+
+_zobrist_rng = random.Random(0x5EED)
+ZOBRIST_HANDS = [[_zobrist_rng.getrandbits(64) for _ in range(NUM_CARDS)] for _ in range(2)]
+ZOBRIST_STOCK = [_zobrist_rng.getrandbits(64) for _ in range(NUM_CARDS)]
+ZOBRIST_DISCARD = [[_zobrist_rng.getrandbits(64) for _ in range(NUM_CARDS)] for _ in range(NUM_CARDS)]  # [depth][card]
+ZOBRIST_PLAYER = _zobrist_rng.getrandbits(64)
+ZOBRIST_PHASES = {phase: _zobrist_rng.getrandbits(64) for phase in (DRAW, DISCARD, KNOCK)}
+
+
+@dataclass
+class EndgameResult:
+    value: float  # Expected round points for the player to move, minus the opponent's.
+    best_action: Action
+    action_values: Dict[Action, float]
+    exact: bool
+    nodes: int
+    seconds: float
+    tt_probes: int
+    tt_hits: int
+    stats: Dict[str, float] = field(default_factory=dict)
+
+
+@dataclass
+class Position:
+    hands: List[int]
+    stock: int
+    discard_stack: List[int]
+    player_idx: int
+    phase: str
+    key: int = 0
+
+    def compute_key(self) -> int:
+        key = ZOBRIST_PHASES[self.phase] ^ (ZOBRIST_PLAYER if self.player_idx else 0)
+        for player_idx, hand in enumerate(self.hands):
+            for card_idx in iter_mask(hand): key ^= ZOBRIST_HANDS[player_idx][card_idx]
+        for card_idx in iter_mask(self.stock): key ^= ZOBRIST_STOCK[card_idx]
+        for depth, card_idx in enumerate(self.discard_stack): key ^= ZOBRIST_DISCARD[depth][card_idx]
+        return key
+
+
+def is_endgame(engine: GinRummyEngine, stock_size: int = ENDGAME_STOCK_SIZE) -> bool:
+    """Check if the stock is small enough to hand the round to the solver."""
+    return len(engine.deck) <= stock_size
+
+
+def deadwood(mask: int) -> int:
+    return solve_deadwood(mask=mask)[0]
+
+
+class EndgameSolver(object):
+    """Expectimax with alpha-beta on decision nodes, Star1 on chance nodes and a Zobrist-hashed transposition table."""
+
+    def __init__(self, max_depth: int = ENDGAME_MAX_DEPTH, tt_size: int = 1 << 20):
+        self.max_depth = max_depth
+        self.table = LRUCache(maxsize=tt_size)
+        self.nodes = 0
+        self.repetitions = 0
+        self.path = set()  # Keys of the decision nodes on the line being searched.
+
+    def solve(self, engine: GinRummyEngine, phase: str = DRAW) -> EndgameResult:
+        """Solve the current player's decision in the given phase of their turn."""
+        start = time.perf_counter()
+        self.nodes = self.repetitions = 0
+        probes, hits = self.table.hits + self.table.misses, self.table.hits
+        position = Position(
+            hands=[player.get_hand().mask for player in engine.players],
+            stock=sum(1 << card_idx for card_idx in engine.deck.indices),
+            discard_stack=[CARD_INDEX[card] for card in engine.discard_stack],
+            player_idx=engine.get_current_player_idx(),
+            phase=phase,
+        )
+        position.key = position.compute_key()
+
+        # Search every root action with a full window so each gets an exact value.
+        sign = 1 if position.player_idx == 0 else -1
+        action_values, exact = {}, True
+        self.path = {position.key}
+        for action in self.actions(position):
+            value, action_exact = self.apply(position, action, self.max_depth - 1, -math.inf, math.inf)
+            action_values[action] = sign * value
+            exact = exact and action_exact
+        self.path = set()
+        best_action = max(action_values, key=action_values.get)
+
+        seconds = time.perf_counter() - start
+        tt_probes = self.table.hits + self.table.misses - probes
+        tt_hits = self.table.hits - hits
+        return EndgameResult(
+            value=action_values[best_action],
+            best_action=best_action,
+            action_values=action_values,
+            exact=exact,
+            nodes=self.nodes,
+            seconds=seconds,
+            tt_probes=tt_probes,
+            tt_hits=tt_hits,
+            stats={
+                "nodes_per_second": self.nodes / seconds if seconds else 0.0,
+                "tt_hit_rate": tt_hits / tt_probes if tt_probes else 0.0,
+                "repetitions": self.repetitions,
+            },
+        )
+
+    def actions(self, position: Position) -> List[Action]:
+        """Legal actions, ordered so the likely best ones are searched first."""
+        # The stock draw comes first: it moves towards a terminal, while discard pickups can cycle.
+        if position.phase == DRAW:
+            return [(DRAW, 0), (DRAW, 1)] if position.discard_stack else [(DRAW, 0)]
+        if position.phase == KNOCK:
+            return [(KNOCK, 1), (KNOCK, 0)]
+        removals = solve_removals(mask=position.hands[position.player_idx])
+        return [(DISCARD, card_idx) for card_idx in sorted(removals, key=lambda card_idx: removals[card_idx][0])]
+
+    def search(self, position: Position, depth: int, alpha: float, beta: float) -> Tuple[float, bool]:
+        """Value of a decision node for player 0, and whether it is exact."""
+        self.nodes += 1
+        if position.key in self.path:
+            self.repetitions += 1
+            return 0.0, True
+        entry = self.table.get(position.key)
+        if entry is not None:
+            entry_depth, entry_value, entry_flag, entry_exact = entry
+            if entry_exact or entry_depth >= depth:
+                if entry_flag == EXACT: return entry_value, entry_exact
+                if entry_flag == LOWER: alpha = max(alpha, entry_value)
+                else: beta = min(beta, entry_value)
+                if alpha >= beta: return entry_value, entry_exact
+        if depth <= 0:
+            return self.estimate(position), False
+
+        self.path.add(position.key)
+        repetitions = self.repetitions
+        maximizing = position.player_idx == 0
+        original_alpha, original_beta = alpha, beta
+        best = -math.inf if maximizing else math.inf
+        exact = True
+        for action in self.actions(position):
+            value, action_exact = self.apply(position, action, depth - 1, alpha, beta)
+            exact = exact and action_exact
+            if maximizing:
+                best = max(best, value)
+                alpha = max(alpha, best)
+            else:
+                best = min(best, value)
+                beta = min(beta, best)
+            if alpha >= beta: break
+
+        self.path.discard(position.key)
+
+        # A value that relied on a repetition depends on the path, so it is not stored.
+        if self.repetitions == repetitions:
+            flag = UPPER if best <= original_alpha else LOWER if best >= original_beta else EXACT
+            self.table.put(position.key, (depth, best, flag, exact))
+        return best, exact
+
+    def apply(self, position: Position, action: Action, depth: int, alpha: float, beta: float) -> Tuple[float, bool]:
+        """Value of taking an action in a position, for player 0."""
+        decision, value = action
+        player_idx = position.player_idx
+        hand = position.hands[player_idx]
+        sign = 1 if player_idx == 0 else -1
+
+        if decision == KNOCK:
+            if value: return sign * score_knock(knocker_mask=hand, defender_mask=position.hands[1 - player_idx]), True
+            return self.search(self.next_turn(position), depth, alpha, beta)
+
+        if decision == DISCARD:
+            card_idx = value
+            new_hand = hand & ~(1 << card_idx)
+            hand_deadwood = deadwood(new_hand)
+            if hand_deadwood == 0:
+                return sign * (deadwood(position.hands[1 - player_idx]) + GIN_BONUS), True
+            child = self.move(position, hand=new_hand, discard_stack=position.discard_stack + [card_idx])
+            child.key ^= ZOBRIST_HANDS[player_idx][card_idx] ^ ZOBRIST_DISCARD[len(position.discard_stack)][card_idx]
+            if hand_deadwood <= KNOCK_LIMIT: return self.search(self.with_phase(child, KNOCK), depth, alpha, beta)
+            return self.search(self.next_turn(child), depth, alpha, beta)
+
+        if value:  # Draw the top of the discard pile.
+            card_idx = position.discard_stack[-1]
+            child = self.move(position, hand=hand | 1 << card_idx, discard_stack=position.discard_stack[:-1])
+            child.key ^= ZOBRIST_DISCARD[len(position.discard_stack) - 1][card_idx] ^ ZOBRIST_HANDS[player_idx][card_idx]
+            return self.after_draw(child, depth, alpha, beta)
+
+        # Drawing from the empty stock would reshuffle the discard pile into a new stock: the round is dead.
+        stock = position.stock
+        if not stock: return 0.0, True
+
+        # Otherwise a chance node over the cards the stock may hold. Every value lies within
+        # VALUE_BOUND, so each child's window is narrowed to the values that can still move the
+        # average into (alpha, beta), and the node is cut as soon as the average cannot (Star1).
+        count = bin(stock).count("1")
+        total, exact, remaining = 0.0, True, count
+        for card_idx in iter_mask(stock):
+            remaining -= 1
+            child = Position(
+                hands=list(position.hands),
+                stock=stock & ~(1 << card_idx),
+                discard_stack=position.discard_stack,
+                player_idx=player_idx,
+                phase=position.phase,
+                key=position.key ^ ZOBRIST_STOCK[card_idx] ^ ZOBRIST_HANDS[player_idx][card_idx],
+            )
+            child.hands[player_idx] = hand | 1 << card_idx
+            child_alpha = max(-VALUE_BOUND, count * alpha - total - remaining * VALUE_BOUND)
+            child_beta = min(VALUE_BOUND, count * beta - total + remaining * VALUE_BOUND)
+            child_value, child_exact = self.after_draw(child, depth, child_alpha, child_beta)
+            total += child_value
+            exact = exact and child_exact
+            if total - remaining * VALUE_BOUND >= count * beta: return (total - remaining * VALUE_BOUND) / count, exact
+            if total + remaining * VALUE_BOUND <= count * alpha: return (total + remaining * VALUE_BOUND) / count, exact
+        return total / count, exact
+
+    def after_draw(self, position: Position, depth: int, alpha: float, beta: float) -> Tuple[float, bool]:
+        """Score Big Gin after a draw, otherwise continue with the discard decision."""
+        player_idx = position.player_idx
+        if deadwood(position.hands[player_idx]) == 0:
+            sign = 1 if player_idx == 0 else -1
+            return sign * (deadwood(position.hands[1 - player_idx]) + BIG_GIN_BONUS), True
+        return self.search(self.with_phase(position, DISCARD), depth, alpha, beta)
+
+    def estimate(self, position: Position) -> float:
+        """Heuristic value at the depth limit: the knock outcome if both hands were revealed now."""
+        hands = [hand for hand in position.hands]
+        for player_idx, hand in enumerate(hands):
+            if bin(hand).count("1") > HAND_SIZE:  # Mid-turn: assume the best discard.
+                hands[player_idx] = min((hand & ~(1 << card_idx) for card_idx in iter_mask(hand)), key=deadwood)
+        return float(deadwood(hands[1]) - deadwood(hands[0]))
+
+    def move(self, position: Position, hand: int, discard_stack: List[int]) -> Position:
+        hands = list(position.hands)
+        hands[position.player_idx] = hand
+        return Position(hands=hands, stock=position.stock, discard_stack=discard_stack, player_idx=position.player_idx, phase=position.phase, key=position.key)
+
+    def with_phase(self, position: Position, phase: str) -> Position:
+        position.key ^= ZOBRIST_PHASES[position.phase] ^ ZOBRIST_PHASES[phase]
+        position.phase = phase
+        return position
+
+    def next_turn(self, position: Position) -> Position:
+        child = Position(hands=position.hands, stock=position.stock, discard_stack=position.discard_stack, player_idx=1 - position.player_idx, phase=position.phase, key=position.key ^ ZOBRIST_PLAYER)
+        return self.with_phase(child, DRAW)
@@ -24,23 +24,63 @@ Rules:
 """
 
 import random
+from copy import copy
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
 from .player import Player
 from .deck import Deck
 from .hand import Hand
 from .card import Card
-from .utils import mark_deadwood
-from .constants import HAND_SIZE, KNOCK_LIMIT, GIN_BONUS, BIG_GIN_BONUS, UNDERCUT_BONUS, ROUND_WIN_BONUS
+from .errors import RoundOverError
+from .utils import mark_deadwood, get_card_value, get_deadwood_count, knock_breakdown
+from .melds import solve_removals
+from .constants import FULL_DECK, CARD_INDEX, HAND_SIZE, KNOCK_LIMIT, GIN_BONUS, BIG_GIN_BONUS, ROUND_WIN_BONUS
+
+
+class EngineSnapshot(NamedTuple):
+    """Compact copy of an engine's game state. Cards are stored as bytes of card indices."""
+    deck: bytes
+    discard_stack: bytes
+    hands: Tuple[bytes, bytes]
+    known_cards: Tuple[int, int]
+    scores: Tuple[int, int]
+    rounds_won: Tuple[int, int]
+    start_player_idx: int
+    current_player_idx: int
+    round_over: bool
+    has_discarded: bool
+    version: int
+    rng_state: Optional[tuple]
 
 
 class GinRummyEngine(object):
-    def __init__(self, player1: str, player2: str):
+    def __init__(self, player1: str, player2: str, seed: Optional[int] = None):
         self.players = [Player(name=player1), Player(name=player2)]
-        self.deck = Deck()
+        self.seed = seed if seed is not None else random.getrandbits(63)
+        self.rng = random.Random(self.seed)  # Deals, reshuffles and the starting player all draw from this stream.
+        self.deck = Deck(rng=self.rng)
         self.discard_stack = []
-        self.start_player_idx = random.randint(0, 1)
+        self.start_player_idx = self.rng.randint(0, 1)
         self.current_player_index = self.start_player_idx
         self.scores = [0, 0]
         self.rounds_won = [0, 0]
+        self.round_over = False  # Set by a knock or Gin until the next round is dealt.
+        self.has_discarded = False  # Whether the current player has discarded this turn.
+        self.known_cards = [0, 0]  # Masks of the cards each player is known to hold after picking them up from the discard pile.
+        self.version = 0  # Incremented on every state change.
+        self.listeners: List[Callable[..., None]] = []
+
+    def subscribe(self, listener: Callable[..., None]):
+        """Register a callback that is called as listener(event, **details) after every state change."""
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[..., None]):
+        """Remove a callback registered with subscribe."""
+        self.listeners.remove(listener)
+
+    def notify(self, event: str, **details):
+        """Bump the state version and tell the listeners what changed."""
+        self.version += 1
+        for listener in self.listeners: listener(event, **details)
 
     def get_player(self, player_name: str) -> Player:
         """Return the player object with the given name."""
@@ -48,9 +88,11 @@ class GinRummyEngine(object):
 
     def deal_initial_hands(self):
         """Deal 10 cards to each player from the deck."""
-        for _ in range(HAND_SIZE):
-            for idx in [self.start_player_idx, self.get_next_player_idx(player_idx=self.start_player_idx)]:
-                self.players[idx].take_card(card=self.deck.draw_card())
+        # Cards alternate between the players, starting with the start player, as if dealt one at a time.
+        dealt = self.deck.draw_indices(2 * HAND_SIZE)
+        self.players[self.start_player_idx].get_hand().set_indices(card_indices=dealt[0::2])
+        self.players[self.get_next_player_idx(player_idx=self.start_player_idx)].get_hand().set_indices(card_indices=dealt[1::2])
+        self.notify("deal")
 
     def get_next_player_idx(self, player_idx: int) -> int:
         """Return the index of the next player."""
@@ -75,18 +117,37 @@ class GinRummyEngine(object):
     def switch_turn(self):
         """Switch the turn to the next player."""
         self.current_player_index = self.get_opponent_player_idx()
+        self.has_discarded = False
+        self.notify("switch_turn", player_idx=self.current_player_index)
 
     def draw_card(self, from_discard_stack: bool) -> Card:
         """Draw a card from the deck or the discard pile."""
-        if from_discard_stack and self.discard_stack: card = self.discard_stack.pop()  # The top card of the discard pile is the last card in the list.
-        else: card = self.deck.draw_card()
+        if self.round_over: raise RoundOverError
+        from_discard_stack = from_discard_stack and len(self.discard_stack) > 0
+        if from_discard_stack: card = self.discard_stack.pop()  # The top card of the discard pile is the last card in the list.
+        else:
+            if len(self.deck) == 0: self.reshuffle_discard_stack()
+            card = self.deck.draw_card()
         self.get_current_player().take_card(card=card)
+        if from_discard_stack: self.known_cards[self.current_player_index] |= 1 << CARD_INDEX[card]
+        self.notify("draw_card", player_idx=self.current_player_index, card=card, from_discard_stack=from_discard_stack)
         return card
 
+    def reshuffle_discard_stack(self):
+        """Shuffle the discard pile into a new deck once the deck is empty."""
+        self.deck.refill(cards=self.discard_stack)
+        self.discard_stack = []
+
     def discard_card(self, card: Card):
         """Discard a card from the current player's hand."""
+        if self.round_over: raise RoundOverError
         self.get_current_player().discard_card(card=card)
+        card_idx = CARD_INDEX[card]
+        card = FULL_DECK[card_idx]
         self.discard_stack.append(card)
+        self.known_cards[self.current_player_index] &= ~(1 << card_idx)
+        self.has_discarded = True
+        self.notify("discard_card", player_idx=self.current_player_index, card=card)
 
     def can_knock(self) -> bool:
         """Check if the current player is allowed to knock."""
@@ -94,33 +155,59 @@ class GinRummyEngine(object):
         deadwood_count = self.get_deadwood_count(hand=player_hand)
         return deadwood_count <= KNOCK_LIMIT
 
-    def mark_deadwood(self, hand: Hand) -> Hand:
-        """Mark the deadwood cards in a given hand."""
+    def mark_deadwood(self, hand: Hand) -> int:
+        """Find the deadwood cards in a given hand, as a card mask."""
         return mark_deadwood(hand=hand)
 
     def get_card_value(self, card: Card) -> int:
         """Get the value of a card for scoring purposes."""
-        if card.rank in ['J', 'Q', 'K']: return 10
-        elif card.rank == 'A': return 1
-        else: return int(card.rank)
+        return get_card_value(card=card)
 
     def get_deadwood_count(self, hand: Hand) -> int:
         """Calculate the deadwood count (unmatched cards value) for a given hand."""
-        marked_hand = self.mark_deadwood(hand=hand)
-        deadwood_cards = [card for card in marked_hand if card.is_deadwood]
-        return sum(self.get_card_value(card=card) for card in deadwood_cards)
-
-    def knock(self):
-        """Handle the knock action by the current player."""
-        current_player_deadwood = self.get_deadwood_count(hand=self.get_current_player().get_hand())
-        opponent_player_deadwood = self.get_deadwood_count(hand=self.get_opponent_player().get_hand())
-        deadwood_difference = opponent_player_deadwood - current_player_deadwood
-        if deadwood_difference > 0:
-            self.scores[self.get_current_player_idx()] += deadwood_difference
-            self.rounds_won[self.get_current_player_idx()] += 1
-        else:
-            self.scores[self.get_opponent_player_idx()] += -deadwood_difference + UNDERCUT_BONUS
-            self.rounds_won[self.get_opponent_player_idx()] += 1
+        return get_deadwood_count(hand=hand)
+
+    def suggest_discard(self) -> List[Dict[str, Any]]:
+        """
+        Rank the current player's possible discards after drawing, best first.
+
+        Removing a card only changes the meld component that holds it, so each component is
+        searched once for all of its removals and the rest of the hand's deadwood is reused.
+        """
+        hand = self.get_current_player().get_hand()
+        assert len(hand) == HAND_SIZE + 1
+        deadwood_after: Dict[int, int] = {}
+        for component, (component_deadwood, _) in hand.components.items():
+            for card_idx, (removal_deadwood, _) in solve_removals(mask=component).items():
+                deadwood_after[card_idx] = hand.deadwood - component_deadwood + removal_deadwood
+        suggestions = [
+            {
+                "card": card,
+                "deadwood": deadwood_after[CARD_INDEX[card]],
+                "can_knock": deadwood_after[CARD_INDEX[card]] <= KNOCK_LIMIT,
+                "is_gin": deadwood_after[CARD_INDEX[card]] == 0,
+            }
+            for card in hand
+        ]
+        return sorted(suggestions, key=lambda suggestion: (suggestion["deadwood"], -self.get_card_value(card=suggestion["card"])))
+
+    def knock(self) -> Dict[str, Any]:
+        """
+        Handle the knock action by the current player.
+
+        The opponent lays off onto the knocker's melds before the hands are compared (rule 14).
+        Returns the breakdown of the melds, layoffs and points.
+        """
+        if self.round_over: raise RoundOverError
+        knocker_hand = self.get_current_player().get_hand()
+        breakdown = knock_breakdown(knocker_mask=knocker_hand.mask, defender_mask=self.get_opponent_player().get_hand().mask, knocker_melds=knocker_hand.melds)
+        points = breakdown["points"]
+        winner_idx = self.get_current_player_idx() if points > 0 else self.get_opponent_player_idx()
+        self.scores[winner_idx] += abs(points)
+        self.rounds_won[winner_idx] += 1
+        self.round_over = True
+        self.notify("knock", player_idx=self.current_player_index)
+        return {**breakdown, "knocker_idx": self.get_current_player_idx(), "winner_idx": winner_idx}
 
     def is_gin(self):
         """Check if the current player has Gin."""
@@ -136,14 +223,112 @@ class GinRummyEngine(object):
         win_amount = self.get_deadwood_count(hand=self.get_opponent_player().get_hand()) + BIG_GIN_BONUS if is_big_gin else 0
         return is_big_gin, win_amount
 
+    def gin(self):
+        """Handle the current player going Gin with 10 cards or Big Gin with 11 cards."""
+        if self.round_over: raise RoundOverError
+        if len(self.get_current_player().get_hand()) == HAND_SIZE + 1: is_gin, win_amount = self.is_big_gin()
+        else: is_gin, win_amount = self.is_gin()
+        assert is_gin
+        self.scores[self.get_current_player_idx()] += win_amount
+        self.rounds_won[self.get_current_player_idx()] += 1
+        self.round_over = True
+        self.notify("gin", player_idx=self.current_player_index)
+
     def reset_round(self):
         """Reset the game state for a new round."""
         self.deck.reset_deck()
         self.discard_stack = []
         for player in self.players: player.clear_hand()
+        self.known_cards = [0, 0]
+        self.round_over = False
         self.start_player_idx = self.get_next_player_idx(player_idx=self.start_player_idx)
+        self.current_player_index = self.start_player_idx
+        self.has_discarded = False
+        self.notify("reset_round")
         self.deal_initial_hands()
 
     def compute_final_scores(self):
         self.scores[self.get_current_player_idx()] += self.rounds_won[self.get_current_player_idx()] * ROUND_WIN_BONUS
         self.scores[self.get_opponent_player_idx()] += self.rounds_won[self.get_opponent_player_idx()] * ROUND_WIN_BONUS
+        self.notify("compute_final_scores")
+
+    def snapshot(self, include_rng: bool = True) -> EngineSnapshot:
+        """Capture the game state. Leave out the RNG state when the copy does not need to reproduce future shuffles."""
+        return EngineSnapshot(
+            deck=bytes(self.deck.indices),
+            discard_stack=bytes(CARD_INDEX[card] for card in self.discard_stack),
+            hands=(
+                bytes(CARD_INDEX[card] for card in self.players[0].get_hand()),
+                bytes(CARD_INDEX[card] for card in self.players[1].get_hand()),
+            ),
+            known_cards=(self.known_cards[0], self.known_cards[1]),
+            scores=(self.scores[0], self.scores[1]),
+            rounds_won=(self.rounds_won[0], self.rounds_won[1]),
+            start_player_idx=self.start_player_idx,
+            current_player_idx=self.current_player_index,
+            round_over=self.round_over,
+            has_discarded=self.has_discarded,
+            version=self.version,
+            rng_state=self.rng.getstate() if include_rng else None,
+        )
+
+    def restore(self, snapshot: EngineSnapshot):
+        """Restore the game state captured by snapshot. Listeners are not notified."""
+        self.deck.indices = list(snapshot.deck)
+        self.discard_stack = [FULL_DECK[card_idx] for card_idx in snapshot.discard_stack]
+        for player, hand in zip(self.players, snapshot.hands):
+            player.get_hand().set_indices(card_indices=list(hand))
+        self.known_cards = list(snapshot.known_cards)
+        self.scores = list(snapshot.scores)
+        self.rounds_won = list(snapshot.rounds_won)
+        self.start_player_idx = snapshot.start_player_idx
+        self.current_player_index = snapshot.current_player_idx
+        self.round_over = snapshot.round_over
+        self.has_discarded = snapshot.has_discarded
+        self.version = snapshot.version
+        if snapshot.rng_state is not None: self.rng.setstate(snapshot.rng_state)
+
+    def clone(self, include_rng: bool = False, rng: Optional[random.Random] = None) -> "GinRummyEngine":
+        """
+        Return an independent copy of the game without listeners, e.g. for lookahead search.
+
+        With include_rng the clone reshuffles exactly as this game would. Otherwise it shuffles with
+        rng, or with a stream seeded from the game's seed and version, so clones are reproducible and
+        never draw from this game's stream.
+        """
+        engine = copy(self)
+        engine.players = [player.copy() for player in self.players]
+        if include_rng:
+            engine.rng = random.Random(self.seed)
+            engine.rng.setstate(self.rng.getstate())
+        else: engine.rng = rng or random.Random(self.seed ^ self.version << 64)
+        engine.deck = Deck(rng=engine.rng, cards=[])
+        engine.deck.indices = list(self.deck.indices)
+        engine.discard_stack = list(self.discard_stack)
+        engine.known_cards = list(self.known_cards)
+        engine.scores = list(self.scores)
+        engine.rounds_won = list(self.rounds_won)
+        engine.listeners = []
+        return engine
+
+    def determinize(self, player_idx: int, rng: random.Random) -> "GinRummyEngine":
+        """
+        Return a clone in which everything the given player cannot see is resampled.
+
+        The opponent keeps the cards they are known to have picked up from the discard pile, and
+        the rest of their hand and the deck are dealt at random from the cards the player has not
+        seen, so hand and deck sizes stay the same. The clone also reshuffles with rng.
+        """
+        engine = self.clone(rng=rng)
+        opponent = engine.players[1 - player_idx]
+        known_mask = self.known_cards[1 - player_idx]
+        seen_mask = self.players[player_idx].get_hand().mask | known_mask
+        for card in self.discard_stack: seen_mask |= 1 << CARD_INDEX[card]
+        unseen = [card for card_idx, card in enumerate(FULL_DECK) if not seen_mask >> card_idx & 1]
+        rng.shuffle(unseen)
+
+        num_hidden = len(opponent.get_hand()) - bin(known_mask).count("1")
+        known = [card for card in opponent.get_hand() if known_mask >> CARD_INDEX[card] & 1]
+        opponent.get_hand().set_cards(cards=known + unseen[:num_hidden])
+        engine.deck.cards = unseen[num_hidden:]
+        return engine
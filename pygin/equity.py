@@ -0,0 +1,164 @@
+"""
+Hand equity estimates for one player's view of a game.
+
+A player sees their own hand, the discard pile and the cards the opponent picked up from it.
+Every other card is unseen, and from the player's point of view each unseen card is equally
+likely to be in the deck or in the opponent's hand. The estimates below score all unseen cards
+(or many sampled futures) at once with the vectorized deadwood counts of pygin.batch instead of
+solving hands one by one.
+"""
+
+import random
+from math import comb
+from typing import Any, Dict, Iterable, NamedTuple, Optional, Tuple
+import numpy as np
+from .batch import CARD_BITS, CARD_VALUE_ARRAY, MELD_CARDS, MELD_MASKS, MELD_VALUES, NUM_CARDS, mask_bits
+from .constants import CARD_INDEX, FULL_DECK, HAND_SIZE, KNOCK_LIMIT
+from .melds import solve_deadwood, solve_removals
+from .utils import iter_mask
+
+FULL_MASK = (1 << NUM_CARDS) - 1
+# Per meld and card, whether the meld holds the card and the meld's value, as float32 so coverage is a BLAS product
+MELD_CARD_COUNTS = MELD_CARDS.astype(np.float32)
+MELD_CARD_VALUES = MELD_CARD_COUNTS * MELD_VALUES[:, None].astype(np.float32)
+
+
+class PlayerView(NamedTuple):
+    """What one player knows about a game before drawing, with cards as indices and masks."""
+    hand: int
+    discard_stack: Tuple[int, ...]
+    opponent_known: int  # Cards the opponent picked up from the discard pile and still holds.
+    opponent_hand_size: int
+
+    @classmethod
+    def from_engine(cls, engine, player_idx: int) -> "PlayerView":
+        opponent_idx = 1 - player_idx
+        return cls(
+            hand=engine.players[player_idx].get_hand().mask,
+            discard_stack=tuple(CARD_INDEX[card] for card in engine.discard_stack),
+            opponent_known=engine.known_cards[opponent_idx],
+            opponent_hand_size=len(engine.players[opponent_idx].get_hand()),
+        )
+
+    @property
+    def unseen(self) -> int:
+        """Cards that are either in the deck or in the opponent's hand."""
+        seen = self.hand | self.opponent_known
+        for card_idx in self.discard_stack: seen |= 1 << card_idx
+        return FULL_MASK & ~seen
+
+
+def best_discards(hands: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    For an array of 11-card hand masks, find the discard that leaves the least deadwood.
+
+    In a hand whose melds do not overlap every meld has three cards, so discarding a melded
+    card breaks its meld and the deadwood of all 11 discards follows from the meld coverage
+    of each card. Only hands with overlapping melds are searched, one shared search per hand.
+    Ties go to the highest card, as in GinRummyEngine.suggest_discard. Returns the card index
+    discarded from each hand and the deadwood left.
+    """
+    hands = np.asarray(hands, dtype=np.uint64)
+    rows = np.arange(len(hands))
+    card_idx = np.nonzero(mask_bits(hands))[1].reshape(len(hands), HAND_SIZE + 1)
+    card_values = CARD_VALUE_ARRAY[card_idx]
+    contained = ((hands[:, None] & MELD_MASKS) == MELD_MASKS).astype(np.float32)
+    meld_counts = (contained @ MELD_CARD_COUNTS)[rows[:, None], card_idx]
+    meld_values = (contained @ MELD_CARD_VALUES)[rows[:, None], card_idx].astype(np.int64)
+    deadwood = (card_values * (meld_counts == 0)).sum(axis=1)
+    removals = deadwood[:, None] - card_values + np.where(meld_counts > 0, meld_values, 0)
+    overlapping = np.flatnonzero(meld_counts.max(axis=1) > 1)
+    unique_hands, first_rows, inverse = np.unique(hands[overlapping], return_index=True, return_inverse=True)
+    for hand, row in zip(unique_hands, overlapping[first_rows]):
+        solved = solve_removals(mask=int(hand))
+        removals[row] = [solved[card][0] for card in card_idx[row]]
+    removals[overlapping] = removals[overlapping[first_rows]][inverse.ravel()]
+    best = np.argmin(removals * 16 - card_values, axis=1)
+    return card_idx[rows, best], removals[rows, best]
+
+
+def draw_outcomes(view: PlayerView) -> Dict[str, Any]:
+    """
+    Exact outcomes of the next draw, followed by the best discard.
+
+    Every unseen card is an equally likely draw from the deck, so the deck probabilities are
+    averages over all unseen cards, evaluated in one batch. The top of the discard pile is
+    scored as well, since the player may take it instead.
+    """
+    deadwood = solve_deadwood(mask=view.hand)[0]
+    unseen = np.array(list(iter_mask(view.unseen)), dtype=np.int64)
+    after_deck = best_discards(np.uint64(view.hand) | CARD_BITS[unseen])[1] if len(unseen) else np.zeros(0, dtype=np.int64)
+    outcomes = {
+        "deadwood": deadwood,
+        "deck": {
+            "improve_probability": float(np.mean(after_deck < deadwood)) if len(unseen) else 0.0,
+            "knock_probability": float(np.mean(after_deck <= KNOCK_LIMIT)) if len(unseen) else 0.0,
+            "gin_probability": float(np.mean(after_deck == 0)) if len(unseen) else 0.0,
+            "expected_deadwood": float(np.mean(after_deck)) if len(unseen) else float(deadwood),
+            "improving_cards": [FULL_DECK[card_idx] for card_idx in unseen[after_deck < deadwood]],
+        },
+        "discard": None,
+    }
+    if view.discard_stack:
+        top = view.discard_stack[-1]
+        after_discard = best_discards(np.array([view.hand | 1 << top], dtype=np.uint64))[1]
+        outcomes["discard"] = {"card": FULL_DECK[top], "deadwood": int(after_discard[0]), "improves": bool(after_discard[0] < deadwood)}
+    return outcomes
+
+
+def knock_within(view: PlayerView, turns: int = 3, samples: int = 128, rng: Optional[random.Random] = None) -> Dict[str, Any]:
+    """
+    Sampled chances of being able to knock, or of reaching Gin, within the next turns.
+
+    Each sample draws the player's next cards without replacement from the unseen cards and
+    plays every turn with the best discard, all samples advancing together. Picking up
+    discards is left out, so the estimates are slightly pessimistic. Returns cumulative
+    probabilities for each number of turns.
+    """
+    rng = rng or random.Random()
+    unseen = np.array(list(iter_mask(view.unseen)), dtype=np.int64)
+    turns = min(turns, len(unseen))
+    np_rng = np.random.default_rng(rng.getrandbits(64))
+    draws = np.argsort(np_rng.random((samples, len(unseen))), axis=1)[:, :turns]
+    hands = np.full(samples, view.hand, dtype=np.uint64)
+    can_knock = np.zeros(samples, dtype=bool)
+    has_gin = np.zeros(samples, dtype=bool)
+    knock_probability, gin_probability = [], []
+    for turn in range(turns):
+        hands = hands | CARD_BITS[unseen[draws[:, turn]]]
+        discarded, deadwood = best_discards(hands)
+        hands = hands & ~CARD_BITS[discarded]
+        can_knock |= deadwood <= KNOCK_LIMIT
+        has_gin |= deadwood == 0
+        knock_probability.append(float(np.mean(can_knock)))
+        gin_probability.append(float(np.mean(has_gin)))
+    return {"turns": turns, "samples": samples, "knock_probability": knock_probability, "gin_probability": gin_probability}
+
+
+def opponent_card_probabilities(view: PlayerView) -> np.ndarray:
+    """
+    Probability that the opponent holds each card, as an array over card indices.
+
+    Picked-up cards are certain; the opponent's other cards are a uniform draw from the unseen
+    cards, so each unseen card is held with probability (unknown slots) / (unseen cards).
+    """
+    unseen = mask_bits(np.uint64(view.unseen))
+    unknown_slots = view.opponent_hand_size - bin(view.opponent_known).count("1")
+    probabilities = unseen * (unknown_slots / max(int(unseen.sum()), 1))
+    probabilities[mask_bits(np.uint64(view.opponent_known))] = 1.0
+    return probabilities
+
+
+def opponent_holds(view: PlayerView, cards: Iterable[int], require_all: bool = True) -> float:
+    """Hypergeometric probability that the opponent holds all (or, with require_all=False, any) of the given card indices."""
+    cards = set(cards)
+    possible = view.opponent_known | view.unseen
+    if require_all and any(not possible >> card_idx & 1 for card_idx in cards): return 0.0
+    if not require_all and any(view.opponent_known >> card_idx & 1 for card_idx in cards): return 1.0
+    num_unknown = sum(view.unseen >> card_idx & 1 for card_idx in cards)
+    num_unseen = bin(view.unseen).count("1")
+    unknown_slots = view.opponent_hand_size - bin(view.opponent_known).count("1")
+    if require_all:
+        if num_unknown > unknown_slots: return 0.0
+        return comb(num_unseen - num_unknown, unknown_slots - num_unknown) / comb(num_unseen, unknown_slots)
+    return 1.0 - comb(num_unseen - num_unknown, unknown_slots) / comb(num_unseen, unknown_slots)
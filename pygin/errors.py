@@ -10,3 +10,17 @@ class CardDoesNotExistError(Exception):
     def __init__(self, message="The card does not exist in the hand."):
         self.message = message
         super().__init__(self.message)
+
+
+class ReplayError(Exception):
+    """Exception raised when an event log cannot be replayed onto an engine."""
+    def __init__(self, message="The event log does not match the replayed game."):
+        self.message = message
+        super().__init__(self.message)
+
+
+class RoundOverError(Exception):
+    """Exception raised when a move is made after the round has ended."""
+    def __init__(self, message="The round is over. Deal the next round before playing on."):
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,266 @@
+"""
+Append-only binary event log for auditing and replaying GinRummyEngine games.
+
+Every engine mutation is written as one fixed-width little-endian record:
+
+    game id (u64) | sequence number (u32) | event type (u8) | player (u8) | card (u8) | flag (u8) | argument (u64)
+
+A game starts with a NEW_GAME record holding the engine seed, so replaying the events onto a fresh
+engine rebuilds the game exactly, including every shuffle. Writes are buffered and appended in
+batches; reads go through a memory map and stream records without loading the file.
+
+The sequence number of a record is the engine version the event produced. Server workers that
+share a game store also share the versions, so each worker can log the moves it serves to the
+same file, and replays put every game's records back in sequence order. A game's log ends with an
+END_GAME record when the game is finished or evicted.
+"""
+
+import mmap
+import os
+import struct
+import weakref
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+from .constants import FULL_DECK, CARD_INDEX
+from .engine import GinRummyEngine
+from .errors import ReplayError
+
+RECORD = struct.Struct("<QIBBBBQ")
+NO_CARD = 0xFF
+NO_PLAYER = 0xFF
+STALE_AFTER_RECORDS = 1 << 20  # iter_games gives up on a game with no record among this many later ones.
+
+NEW_GAME = 0
+DEAL = 1
+DRAW_CARD = 2
+DISCARD_CARD = 3
+SWITCH_TURN = 4
+KNOCK = 5
+GIN = 6
+RESET_ROUND = 7
+COMPUTE_FINAL_SCORES = 8
+END_GAME = 9
+EVENT_TYPES = {
+    "deal": DEAL,
+    "draw_card": DRAW_CARD,
+    "discard_card": DISCARD_CARD,
+    "switch_turn": SWITCH_TURN,
+    "knock": KNOCK,
+    "gin": GIN,
+    "reset_round": RESET_ROUND,
+    "compute_final_scores": COMPUTE_FINAL_SCORES,
+}
+
+
+class Event(NamedTuple):
+    game_id: int
+    sequence: int
+    event_type: int
+    player_idx: int
+    card_idx: int
+    flag: int
+    argument: int
+
+
+class EventLogWriter(object):
+    """
+    Appends engine events to a log file in batches. Safe to share between threads.
+
+    Each batch is appended with a single write, so several processes can append to one log.
+    """
+
+    def __init__(self, path: str, batch_size: int = 1024):
+        self.path = path
+        self.batch_size = batch_size
+        self.buffer = bytearray()
+        self.buffered = 0
+        self.listeners: Dict[int, Tuple[weakref.ref, Callable]] = {}  # Game id to the logged engine and its listener.
+        self.file = open(path, "ab", buffering=0)
+        self.lock = Lock()
+
+    def __repr__(self):
+        return f"EventLogWriter(path={self.path})"
+
+    def attach(self, engine: GinRummyEngine, game_id: int):
+        """Start logging a new game. Attach right after construction, before the initial deal."""
+        self.write(game_id, engine.version, NEW_GAME, NO_PLAYER, NO_CARD, 0, engine.seed)
+        self.resume(engine=engine, game_id=game_id)
+
+    def resume(self, engine: GinRummyEngine, game_id: int):
+        """Log the further events of a game that was started elsewhere, e.g. loaded from a shared store."""
+        engine_ref = weakref.ref(engine)  # The listener must not keep evicted games alive.
+
+        def listener(event: str, player_idx: int = NO_PLAYER, card=None, from_discard_stack: bool = False):
+            card_idx = CARD_INDEX.get(card, NO_CARD) if card is not None else NO_CARD
+            self.write(game_id, engine_ref().version, EVENT_TYPES[event], player_idx, card_idx, int(from_discard_stack), 0)
+
+        engine.subscribe(listener)
+        with self.lock:
+            self.listeners[game_id] = (engine_ref, listener)
+        # A game whose engine is dropped without being ended, e.g. with its cached session, is forgotten.
+        weakref.finalize(engine, self.forget, game_id, listener)
+
+    def forget(self, game_id: int, listener: Callable):
+        """Drop a game's listener, unless the game has since been resumed with another one."""
+        with self.lock:
+            if game_id in self.listeners and self.listeners[game_id][1] is listener: del self.listeners[game_id]
+
+    def detach(self, engine: GinRummyEngine, game_id: int):
+        """Stop logging a game and mark it as finished."""
+        self.end(game_id=game_id, version=engine.version)
+
+    def end(self, game_id: int, version: int):
+        """Mark a game as finished after the given version, e.g. when it is evicted, and stop logging it."""
+        with self.lock:
+            engine_ref, listener = self.listeners.pop(game_id, (None, None))
+        engine = engine_ref() if engine_ref else None
+        if engine is not None: engine.unsubscribe(listener)
+        self.write(game_id, version + 1, END_GAME, NO_PLAYER, NO_CARD, 0, 0)
+
+    def write(self, game_id: int, sequence: int, event_type: int, player_idx: int, card_idx: int, flag: int, argument: int):
+        """Buffer one record, flushing once a batch is full."""
+        with self.lock:
+            self.buffer += RECORD.pack(game_id, sequence, event_type, player_idx, card_idx, flag, argument)
+            self.buffered += 1
+            if self.buffered >= self.batch_size: self.flush_buffer()
+
+    def flush(self):
+        """Write all buffered records to the file."""
+        with self.lock:
+            self.flush_buffer()
+
+    def flush_buffer(self):
+        """Write the buffer. Expects the lock to be held."""
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.buffer = bytearray()
+            self.buffered = 0
+
+    def close(self):
+        """Flush and close the log."""
+        self.flush()
+        self.file.close()
+
+
+class EventLogReader(object):
+    """Memory-mapped, read-only view of an event log."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.file = open(path, "rb")
+        size = os.fstat(self.file.fileno()).st_size
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        self.num_records = size // RECORD.size
+
+    def __len__(self):
+        return self.num_records
+
+    def __getitem__(self, index: int) -> Event:
+        if not 0 <= index < self.num_records: raise IndexError(index)
+        return Event(*RECORD.unpack_from(self.map, index * RECORD.size))
+
+    def __iter__(self) -> Iterator[Event]:
+        for fields in RECORD.iter_unpack(memoryview(self.map)[:self.num_records * RECORD.size]):
+            yield Event(*fields)
+
+    def close(self):
+        if isinstance(self.map, mmap.mmap): self.map.close()
+        self.file.close()
+
+    def game_events(self, game_id: int) -> List[Event]:
+        """The events of one game in sequence order."""
+        return sorted((event for event in self if event.game_id == game_id), key=lambda event: event.sequence)
+
+    def replay(self, game_id: int, event_index: Optional[int] = None, player1: str = "player1", player2: str = "player2") -> GinRummyEngine:
+        """Rebuild a game as it was before the event with the given sequence number (all events by default)."""
+        replay = Replay(player1=player1, player2=player2)
+        for event in self.game_events(game_id=game_id):
+            if event_index is not None and event.sequence >= event_index: break
+            if event.event_type == END_GAME: break
+            replay.apply(event)
+        if replay.engine is None: raise ReplayError(f"Game {game_id} is not in the log.")
+        return replay.engine
+
+    def iter_games(self, stale_after: int = STALE_AFTER_RECORDS) -> Iterator[Tuple[int, GinRummyEngine]]:
+        """
+        Replay every game in one streaming pass, yielding each game when it ends.
+
+        Only games that are still in progress at the current position of the log are held in
+        memory. A game without an END_GAME record, e.g. one abandoned when its server stopped, is
+        yielded as it stands once stale_after further records pass without one of its own, or at
+        the end of the log.
+        """
+        replays: "OrderedDict[int, Tuple[int, Replay]]" = OrderedDict()  # Least recently logged game first.
+        for index, event in enumerate(self):
+            _, replay = replays.pop(event.game_id, (index, None))
+            if replay is None: replay = Replay()
+            if replay.add(event):
+                yield event.game_id, replay.engine
+            else:
+                replays[event.game_id] = (index, replay)
+            while replays:
+                game_id, (last_index, stale) = next(iter(replays.items()))
+                if index - last_index < stale_after: break
+                del replays[game_id]
+                if stale.engine is not None: yield game_id, stale.engine
+        for game_id, (_, replay) in replays.items():
+            if replay.engine is not None: yield game_id, replay.engine
+
+
+class Replay(object):
+    """Applies logged events to an engine, checking every drawn card against the log."""
+
+    def __init__(self, player1: str = "player1", player2: str = "player2"):
+        self.player1 = player1
+        self.player2 = player2
+        self.engine: Optional[GinRummyEngine] = None
+        self.skip_deal = False  # reset_round deals by itself, so its DEAL record is already applied.
+        self.pending: Dict[int, Event] = {}  # Events read ahead of an earlier one, by sequence number.
+        self.next_sequence: Optional[int] = None
+
+    def add(self, event: Event) -> bool:
+        """
+        Apply an event once all earlier events of the game are applied. Returns True when the game has ended.
+
+        Records appended by different workers can reach the file out of order, so events are
+        held back until the events before them have been read.
+        """
+        self.pending[event.sequence] = event
+        if event.event_type == NEW_GAME: self.next_sequence = event.sequence
+        while self.next_sequence is not None and self.next_sequence in self.pending:
+            event = self.pending.pop(self.next_sequence)
+            self.next_sequence += 1
+            if event.event_type == END_GAME: return True
+            self.apply(event)
+        return False
+
+    def apply(self, event: Event):
+        if event.event_type == NEW_GAME:
+            self.engine = GinRummyEngine(player1=self.player1, player2=self.player2, seed=event.argument)
+            return
+        engine = self.engine
+        if engine is None: raise ReplayError(f"Game {event.game_id} has events before NEW_GAME.")
+
+        if event.event_type == DEAL:
+            if not self.skip_deal: engine.deal_initial_hands()
+            self.skip_deal = False
+        elif event.event_type == DRAW_CARD:
+            card = engine.draw_card(from_discard_stack=bool(event.flag))
+            if CARD_INDEX[card] != event.card_idx:
+                raise ReplayError(f"Game {event.game_id} event {event.sequence}: drew {card}, log has {FULL_DECK[event.card_idx]}.")
+        elif event.event_type == DISCARD_CARD:
+            engine.discard_card(card=FULL_DECK[event.card_idx])
+        elif event.event_type == SWITCH_TURN:
+            engine.switch_turn()
+        elif event.event_type == KNOCK:
+            engine.knock()
+        elif event.event_type == GIN:
+            engine.gin()
+        elif event.event_type == RESET_ROUND:
+            engine.reset_round()
+            self.skip_deal = True
+        elif event.event_type == COMPUTE_FINAL_SCORES:
+            engine.compute_final_scores()
+        else:
+            raise ReplayError(f"Game {event.game_id} event {event.sequence}: unknown event type {event.event_type}.")
@@ -0,0 +1,249 @@
+"""
+Self-play training data export.
+
+Games are played by strategies as in pygin.strategies, and every decision is recorded as one
+row of DECISION_DTYPE: the position as seen by the deciding player (hand mask, discard pile,
+known opponent cards, deadwood, legal actions) together with the action taken and the final
+score of the game.
+
+Exports are split into shards of consecutive seeds. Each shard is played by one worker
+process and written in chunks of at most chunk_rows rows, either as memory-mapped .npy files
+or, if pyarrow is installed, as Arrow IPC files. A shard is marked as done only once all of
+its chunks are written, so an interrupted export resumes with the unfinished shards and
+produces the same rows as an uninterrupted one.
+"""
+
+import json
+import os
+import random
+from multiprocessing import Pool
+from typing import Any, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+import numpy as np
+from .constants import CARD_INDEX, MAX_SCORE
+from .engine import GinRummyEngine
+from .strategies import DRAW, DISCARD, KNOCK, Strategy, play_game
+
+NUM_CARDS = 52
+
+# Actions 0-51 discard that card; the others are the draw and knock choices.
+DRAW_DECK = 52
+DRAW_DISCARD = 53
+PASS = 54
+KNOCK_ACTION = 55
+
+DECISIONS = {DRAW: 0, DISCARD: 1, KNOCK: 2}
+
+NPY = "npy"
+ARROW = "arrow"
+
+DECISION_DTYPE = np.dtype([
+    ("seed", np.int64),
+    ("decision_idx", np.int32),  # Position of the decision within its game.
+    ("round_idx", np.int16),
+    ("player_idx", np.int8),
+    ("decision", np.int8),  # 0 draw, 1 discard, 2 knock.
+    ("hand", np.uint64),  # Mask of the deciding player's cards.
+    ("opponent_known", np.uint64),  # Mask of the cards the opponent picked up from the discard pile.
+    ("discard_pile", np.int8, (NUM_CARDS,)),  # Card indices, bottom first, padded with -1.
+    ("discard_size", np.int8),
+    ("deck_size", np.int8),
+    ("deadwood", np.int16),
+    ("scores", np.int16, (2,)),  # Deciding player's score first.
+    ("legal_actions", np.uint64),  # Bit a is set if action a is legal.
+    ("action", np.int8),
+    ("final_score", np.int16),
+    ("final_margin", np.int16),  # Deciding player's final score minus the opponent's.
+    ("finished", np.bool_),  # False if the game was abandoned before anyone reached the target score.
+])
+
+
+class ShardResult(NamedTuple):
+    seed_start: int
+    seed_end: int
+    rows: int
+    skipped: bool  # Already exported by an earlier run.
+
+
+def record_decision(engine: GinRummyEngine, decision: str, action: Any, round_idx: int) -> Tuple:
+    """The current player's view of the position and the action they took, as a DECISION_DTYPE row without the game fields."""
+    player_idx = engine.get_current_player_idx()
+    hand = engine.get_current_player().get_hand()
+    discard_pile = [CARD_INDEX[card] for card in engine.discard_stack]
+    if decision == DRAW:
+        legal_actions = 1 << DRAW_DECK | (1 << DRAW_DISCARD if discard_pile else 0)
+        action = DRAW_DISCARD if action and discard_pile else DRAW_DECK
+    elif decision == DISCARD:
+        legal_actions = hand.mask
+        action = CARD_INDEX[action]
+    else:
+        legal_actions = 1 << PASS | 1 << KNOCK_ACTION
+        action = KNOCK_ACTION if action else PASS
+    return (
+        0, 0, round_idx, player_idx, DECISIONS[decision], hand.mask, engine.known_cards[1 - player_idx],
+        discard_pile + [-1] * (NUM_CARDS - len(discard_pile)), len(discard_pile), len(engine.deck), hand.deadwood,
+        (engine.scores[player_idx], engine.scores[1 - player_idx]), legal_actions, action, 0, 0, False,
+    )
+
+
+def play_recorded_game(strategies: Sequence[Strategy], seed: int, max_score: int = MAX_SCORE) -> np.ndarray:
+    """Play a game with play_game and return its decisions as an array of DECISION_DTYPE rows."""
+    rows: List[Tuple] = []
+    round_idx = [0]
+
+    def recording(strategy: Strategy) -> Strategy:
+        def decide(engine: GinRummyEngine, decision: str, rng: random.Random) -> Any:
+            action = strategy(engine, decision, rng)
+            rows.append(record_decision(engine=engine, decision=decision, action=action, round_idx=round_idx[0]))
+            return action
+        return decide
+
+    def start_round(idx: int):
+        round_idx[0] = idx
+
+    recording_strategies = [recording(strategy) for strategy in strategies]
+    engine, finished = play_game(strategies=recording_strategies, seed=seed, max_score=max_score, on_round=start_round)
+
+    decisions = np.array(rows, dtype=DECISION_DTYPE)
+    decisions["seed"] = seed
+    decisions["decision_idx"] = np.arange(len(decisions))
+    final_scores = np.array(engine.scores, dtype=np.int16)
+    decisions["final_score"] = final_scores[decisions["player_idx"]]
+    decisions["final_margin"] = decisions["final_score"] - final_scores[1 - decisions["player_idx"]]
+    decisions["finished"] = finished
+    return decisions
+
+
+def iter_decisions(strategies: Sequence[Strategy], seeds: Iterator[int], max_score: int = MAX_SCORE) -> Iterator[np.ndarray]:
+    """Play a game per seed, yielding each game's decisions as soon as it is finished."""
+    for seed in seeds: yield play_recorded_game(strategies=strategies, seed=seed, max_score=max_score)
+
+
+def shard_name(seed_start: int, seed_end: int) -> str:
+    return f"shard-{seed_start:012d}-{seed_end:012d}"
+
+
+class ChunkWriter(object):
+    """Collects rows in a fixed-size buffer and writes every full buffer as the next chunk file of a shard."""
+
+    def __init__(self, directory: str, name: str, chunk_rows: int, file_format: str = NPY):
+        if file_format not in (NPY, ARROW): raise ValueError(f"Unknown export format: {file_format}")
+        self.directory = directory
+        self.name = name
+        self.file_format = file_format
+        self.buffer = np.zeros(chunk_rows, dtype=DECISION_DTYPE)
+        self.size = 0
+        self.chunks: List[str] = []
+        self.rows = 0
+
+    def write(self, rows: np.ndarray):
+        while len(rows):
+            count = min(len(rows), len(self.buffer) - self.size)
+            self.buffer[self.size:self.size + count] = rows[:count]
+            self.size += count
+            rows = rows[count:]
+            if self.size == len(self.buffer): self.flush()
+
+    def flush(self):
+        if not self.size: return
+        path = os.path.join(self.directory, f"{self.name}-{len(self.chunks):05d}.{self.file_format}")
+        if self.file_format == NPY:
+            chunk = np.lib.format.open_memmap(path, mode="w+", dtype=DECISION_DTYPE, shape=(self.size,))
+            chunk[:] = self.buffer[:self.size]
+            chunk.flush()
+            del chunk
+        else:
+            write_arrow(path=path, rows=self.buffer[:self.size])
+        self.chunks.append(os.path.basename(path))
+        self.rows += self.size
+        self.size = 0
+
+    def close(self):
+        """Write the last chunk and mark the shard as done."""
+        self.flush()
+        marker = os.path.join(self.directory, f"{self.name}.done")
+        with open(marker + ".tmp", "w") as file:
+            json.dump({"rows": self.rows, "chunks": self.chunks}, file)
+        os.replace(marker + ".tmp", marker)
+
+
+def write_arrow(path: str, rows: np.ndarray):
+    """Write rows as one Arrow record batch, with array fields as fixed-size lists."""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("Exporting Arrow files needs pyarrow: pip install pyarrow") from None
+    columns = []
+    for name in DECISION_DTYPE.names:
+        column = rows[name]
+        if column.ndim == 1: columns.append(pa.array(column))
+        else: columns.append(pa.FixedSizeListArray.from_arrays(pa.array(column.ravel()), column.shape[1]))
+    batch = pa.RecordBatch.from_arrays(columns, names=list(DECISION_DTYPE.names))
+    with pa.OSFile(path, "wb") as sink, pa.ipc.new_file(sink, batch.schema) as writer:
+        writer.write_batch(batch)
+
+
+def read_arrow(path: str) -> np.ndarray:
+    """Read an Arrow file written by write_arrow back into DECISION_DTYPE rows."""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("Reading Arrow files needs pyarrow: pip install pyarrow") from None
+    with pa.memory_map(path, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    rows = np.empty(table.num_rows, dtype=DECISION_DTYPE)
+    for name in DECISION_DTYPE.names:
+        column = table.column(name).combine_chunks()
+        if rows[name].ndim == 1: rows[name] = column.to_numpy(zero_copy_only=False)
+        else: rows[name] = column.flatten().to_numpy(zero_copy_only=False).reshape(rows[name].shape)
+    return rows
+
+
+def is_exported(directory: str, seed_start: int, seed_end: int) -> bool:
+    return os.path.exists(os.path.join(directory, f"{shard_name(seed_start, seed_end)}.done"))
+
+
+def export_shard(task: Tuple[str, Sequence[Strategy], int, int, int, str, int]) -> ShardResult:
+    """Play and write the games of one seed range, replacing chunks left by an interrupted run."""
+    directory, strategies, seed_start, seed_end, chunk_rows, file_format, max_score = task
+    name = shard_name(seed_start, seed_end)
+    for file_name in os.listdir(directory):
+        if file_name.startswith(name + "-"): os.remove(os.path.join(directory, file_name))
+
+    writer = ChunkWriter(directory=directory, name=name, chunk_rows=chunk_rows, file_format=file_format)
+    for decisions in iter_decisions(strategies=strategies, seeds=range(seed_start, seed_end), max_score=max_score):
+        writer.write(decisions)
+    writer.close()
+    return ShardResult(seed_start=seed_start, seed_end=seed_end, rows=writer.rows, skipped=False)
+
+
+def export(directory: str, strategies: Sequence[Strategy], seed_start: int, seed_end: int, shard_size: int = 1000,
+           chunk_rows: int = 1 << 16, file_format: str = NPY, processes: Optional[int] = None,
+           max_score: int = MAX_SCORE) -> Iterator[ShardResult]:
+    """
+    Export the games with seeds in [seed_start, seed_end) across a process pool, yielding shards as they finish.
+
+    Shards finished by an earlier run with the same shard size are skipped, so an interrupted
+    export is resumed by running it again.
+    """
+    os.makedirs(directory, exist_ok=True)
+    tasks = []
+    for start in range(seed_start, seed_end, shard_size):
+        end = min(start + shard_size, seed_end)
+        if is_exported(directory, start, end): yield ShardResult(seed_start=start, seed_end=end, rows=0, skipped=True)
+        else: tasks.append((directory, strategies, start, end, chunk_rows, file_format, max_score))
+    if not tasks: return
+
+    with Pool(processes=processes) as pool:
+        yield from pool.imap_unordered(export_shard, tasks)
+
+
+def load_decisions(directory: str) -> Iterator[np.ndarray]:
+    """Iterate over the chunks of the finished shards in seed order. .npy chunks are memory-mapped; Arrow chunks are read whole."""
+    for marker in sorted(file_name for file_name in os.listdir(directory) if file_name.endswith(".done")):
+        with open(os.path.join(directory, marker)) as file:
+            chunks = json.load(file)["chunks"]
+        for chunk in chunks:
+            path = os.path.join(directory, chunk)
+            if chunk.endswith("." + NPY): yield np.load(path, mmap_mode="r")
+            elif chunk.endswith("." + ARROW): yield read_arrow(path)
+            else: raise ValueError(f"Unknown export format: {chunk}")
@@ -1,10 +1,25 @@
+from typing import Dict, List, Tuple
 from .card import Card
 from .errors import CardDoesNotExistError
+from .constants import CARD_INDEX, CARD_VALUES, FULL_DECK
+from .melds import CARD_MELDS, solve_deadwood, split_components
 
 
 class Hand(object):
+    """
+    An ordered hand of cards that tracks its optimal melds as cards are added and removed.
+
+    Cards that share a meld in the hand form a component, and components never share a meld,
+    so each component is solved on its own. Adding or removing a card only re-solves the
+    component(s) that card touches, which makes `deadwood` and `melds` plain attribute reads.
+    """
+    __slots__ = ("cards", "mask", "components", "deadwood")
+
     def __init__(self):
         self.cards = []
+        self.mask = 0  # Bit i is set when FULL_DECK[i] is in the hand.
+        self.components: Dict[int, Tuple[int, Tuple[int, ...]]] = {}  # Component mask -> solved deadwood and melds.
+        self.deadwood = 0
 
     def __len__(self):
         return len(self.cards)
@@ -21,19 +36,80 @@ class Hand(object):
     def __getitem__(self, index: int) -> Card:
         return self.cards[index]
 
+    @property
+    def melds(self) -> Tuple[int, ...]:
+        """The melds of the optimal arrangement, each as a card mask."""
+        return tuple(meld for _, melds in self.components.values() for meld in melds)
+
     def add_card(self, card: Card):
         """Adds a card to the hand."""
-        self.cards.append(card)
+        card_idx = CARD_INDEX[card]
+        card_bit = 1 << card_idx
+        self.cards.append(FULL_DECK[card_idx])  # The shared instance, even if an equal copy was passed in.
+        self.mask |= card_bit
+
+        # The new card joins every component it now shares a meld with.
+        touched = card_bit
+        for meld in CARD_MELDS[card_idx]:
+            if meld & self.mask == meld: touched |= meld
+        merged = card_bit
+        for component in [component for component in self.components if component & touched]:
+            merged |= component
+            self.remove_component(component=component)
+        self.add_component(component=merged)
+
+    def copy(self) -> "Hand":
+        """Returns an independent copy of the hand that shares the solved components."""
+        hand = Hand()
+        hand.cards = list(self.cards)
+        hand.mask = self.mask
+        hand.components = dict(self.components)
+        hand.deadwood = self.deadwood
+        return hand
+
+    def set_cards(self, cards: List[Card]):
+        """Replaces the cards in the hand, solving each meld component once."""
+        self.set_indices(card_indices=[CARD_INDEX[card] for card in cards])
+
+    def set_indices(self, card_indices: List[int]):
+        """Replaces the cards in the hand with the given card indices, solving each meld component once."""
+        self.clear()
+        self.cards = [FULL_DECK[card_idx] for card_idx in card_indices]
+        for card_idx in card_indices: self.mask |= 1 << card_idx
+        for component in split_components(mask=self.mask): self.add_component(component=component)
 
     def has_card(self, card: Card) -> bool:
         """Returns True if the hand has the card, False otherwise."""
-        return card in self.cards
+        card_idx = CARD_INDEX.get(card)
+        return card_idx is not None and self.mask >> card_idx & 1 == 1
 
     def remove_card(self, card: Card):
         """Removes a card from the hand if it exists."""
         if not self.has_card(card=card): raise CardDoesNotExistError
         self.cards.remove(card)
+        card_bit = 1 << CARD_INDEX[card]
+        self.mask &= ~card_bit
+
+        # Only the component that held the card can fall apart.
+        component = next(component for component in self.components if component & card_bit)
+        self.remove_component(component=component)
+        for split_component in split_components(mask=component & ~card_bit): self.add_component(component=split_component)
+
+    def add_component(self, component: int):
+        """Solves a component and adds it to the tracked arrangement."""
+        if component & (component - 1): solution = solve_deadwood(mask=component)
+        else: solution = (CARD_VALUES[component.bit_length() - 1], ())  # A single card is deadwood.
+        self.components[component] = solution
+        self.deadwood += solution[0]
+
+    def remove_component(self, component: int):
+        """Removes a component from the tracked arrangement."""
+        deadwood, _ = self.components.pop(component)
+        self.deadwood -= deadwood
 
     def clear(self):
         """Resets the hand to an empty set of cards."""
         self.cards = []
+        self.mask = 0
+        self.components = {}
+        self.deadwood = 0
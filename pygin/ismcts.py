@@ -0,0 +1,191 @@
+"""
+Information-Set Monte Carlo Tree Search (ISMCTS) computer opponent.
+
+Each iteration resamples the cards the searching player cannot see (GinRummyEngine.determinize),
+walks a single tree of decisions shared by all samples, finishes the round with greedy playouts
+and backs up the change in score. Decisions are the same as a turn in pygin.strategies: draw from
+the deck or the discard pile, choose a discard, then knock or pass.
+
+Root parallelism: every worker process searches its own tree for the same wall-clock budget and
+the root statistics are summed, so the move improves with the number of cores. By default there
+is one worker per core, and the calling process only waits, so a server thread asking for a move
+does not hold the GIL while the search runs.
+"""
+
+import math
+import os
+import random
+import time
+from multiprocessing import get_context
+from typing import Dict, List, Optional, Tuple
+from .constants import FULL_DECK, CARD_INDEX
+from .engine import GinRummyEngine
+from .strategies import DRAW, DISCARD, KNOCK, greedy_strategy, play_round
+
+Action = Tuple[str, int]  # (DRAW, from discard 0/1), (DISCARD, card index) or (KNOCK, knock 0/1)
+REWARD_SCALE = 100  # Score swings are divided by this to keep rewards near [-1, 1].
+MAX_PLAYOUT_TURNS = 60
+
+
+class RoundState(object):
+    """A round of a GinRummyEngine advanced one decision at a time."""
+    __slots__ = ("engine", "phase")
+
+    def __init__(self, engine: GinRummyEngine, phase: str = DRAW):
+        self.engine = engine
+        self.phase = phase
+
+    @property
+    def finished(self) -> bool:
+        return self.engine.round_over
+
+    def legal_actions(self) -> List[Action]:
+        """Return the actions available to the current player."""
+        if self.phase == DRAW: return [(DRAW, 0), (DRAW, 1)] if self.engine.discard_stack else [(DRAW, 0)]
+        if self.phase == DISCARD: return [(DISCARD, CARD_INDEX[card]) for card in self.engine.get_current_player().get_hand()]
+        return [(KNOCK, 1), (KNOCK, 0)]
+
+    def apply(self, action: Action):
+        """Apply an action, scoring Gin automatically and passing the turn when it ends."""
+        decision, value = action
+        engine = self.engine
+        if decision == DRAW:
+            engine.draw_card(from_discard_stack=bool(value))
+            if engine.get_current_player().get_hand().deadwood == 0: engine.gin()
+            else: self.phase = DISCARD
+        elif decision == DISCARD:
+            engine.discard_card(card=FULL_DECK[value])
+            if engine.get_current_player().get_hand().deadwood == 0: engine.gin()
+            elif engine.can_knock(): self.phase = KNOCK
+            else: self.end_turn()
+        elif value: engine.knock()
+        else: self.end_turn()
+
+    def end_turn(self):
+        self.engine.switch_turn()
+        self.phase = DRAW
+
+    def playout(self, rng: random.Random):
+        """Finish the round with greedy play for both players."""
+        while not self.finished and self.phase != DRAW:
+            if self.phase == DISCARD: self.apply((DISCARD, CARD_INDEX[greedy_strategy(self.engine, DISCARD, rng)]))
+            else: self.apply((KNOCK, 1))
+        if not self.finished:
+            play_round(engine=self.engine, strategies=[greedy_strategy, greedy_strategy], rng=rng, max_turns=MAX_PLAYOUT_TURNS)
+
+
+class Node(object):
+    __slots__ = ("action", "parent", "player_idx", "children", "visits", "availability", "total_reward")
+
+    def __init__(self, action: Optional[Action], parent: Optional["Node"], player_idx: int):
+        self.action = action
+        self.parent = parent
+        self.player_idx = player_idx  # The player who chose the action leading here.
+        self.children: Dict[Action, "Node"] = {}
+        self.visits = 0
+        self.availability = 1
+        self.total_reward = 0.0
+
+    def ucb(self, exploration: float) -> float:
+        return self.total_reward / self.visits + exploration * math.sqrt(math.log(self.availability) / self.visits)
+
+
+def search(engine: GinRummyEngine, phase: str, time_budget: float, rng: random.Random, exploration: float = 0.7) -> Tuple[Dict[Action, Tuple[int, float]], int]:
+    """
+    Run ISMCTS for the current player until the time budget runs out.
+
+    Returns the visits and total reward of each root action, and the number of playouts.
+    """
+    deadline = time.perf_counter() + time_budget
+    player_idx = engine.get_current_player_idx()
+    start_scores = list(engine.scores)
+    root = Node(action=None, parent=None, player_idx=player_idx)
+    playouts = 0
+    while playouts == 0 or time.perf_counter() < deadline:
+        state = RoundState(engine=engine.determinize(player_idx=player_idx, rng=rng), phase=phase)
+        node = root
+
+        # Selection and expansion: only actions legal in this sample compete.
+        while not state.finished:
+            legal_actions = state.legal_actions()
+            for action in legal_actions:
+                if action in node.children: node.children[action].availability += 1
+            untried = [action for action in legal_actions if action not in node.children]
+            mover_idx = state.engine.get_current_player_idx()
+            if untried:
+                action = rng.choice(untried)
+                node.children[action] = Node(action=action, parent=node, player_idx=mover_idx)
+                node = node.children[action]
+                state.apply(action)
+                break
+            node = max((node.children[action] for action in legal_actions), key=lambda child: child.ucb(exploration))
+            state.apply(node.action)
+
+        if not state.finished: state.playout(rng=rng)
+        scores = state.engine.scores
+        reward = ((scores[0] - start_scores[0]) - (scores[1] - start_scores[1])) / REWARD_SCALE  # From player 0's view.
+        while node is not root:
+            node.visits += 1
+            node.total_reward += reward if node.player_idx == 0 else -reward
+            node = node.parent
+        playouts += 1
+
+    return {action: (child.visits, child.total_reward) for action, child in root.children.items()}, playouts
+
+
+def _search_worker(task: Tuple[GinRummyEngine, str, float, int, float]) -> Tuple[Dict[Action, Tuple[int, float]], int]:
+    engine, phase, time_budget, seed, exploration = task
+    return search(engine=engine, phase=phase, time_budget=time_budget, rng=random.Random(seed), exploration=exploration)
+
+
+class ISMCTSPlayer(object):
+    """
+    Computer opponent that searches each decision for a fixed wall-clock budget on several cores.
+
+    workers defaults to the number of cores. With workers=0 the search runs in the calling
+    process instead of a process pool.
+    """
+
+    def __init__(self, time_budget: float = 1.0, workers: Optional[int] = None, exploration: float = 0.7, seed: Optional[int] = None):
+        self.time_budget = time_budget
+        self.workers = (os.cpu_count() or 1) if workers is None else workers
+        self.exploration = exploration
+        self.rng = random.Random(seed)
+        # Spawned rather than forked, since the caller may be a threaded server.
+        self.pool = get_context("spawn").Pool(processes=self.workers) if self.workers > 0 else None
+        self.stats = {"playouts": 0, "seconds": 0.0, "playouts_per_second": 0.0}
+
+    def __repr__(self):
+        return f"ISMCTSPlayer(time_budget={self.time_budget}, workers={self.workers})"
+
+    def close(self):
+        """Shut down the worker processes."""
+        if self.pool:
+            self.pool.terminate()
+            self.pool = None
+
+    def choose_action(self, engine: GinRummyEngine, phase: str) -> Action:
+        """Search the current player's decision and return the most visited action."""
+        start = time.perf_counter()
+        searched = engine.clone()
+        tasks = [(searched, phase, self.time_budget, self.rng.getrandbits(63), self.exploration) for _ in range(max(self.workers, 1))]
+        results = self.pool.map(_search_worker, tasks) if self.pool else [_search_worker(tasks[0])]
+
+        visits: Dict[Action, int] = {}
+        playouts = 0
+        for root_stats, worker_playouts in results:
+            playouts += worker_playouts
+            for action, (action_visits, _) in root_stats.items(): visits[action] = visits.get(action, 0) + action_visits
+        legal_actions = RoundState(engine=searched, phase=phase).legal_actions()
+
+        seconds = time.perf_counter() - start
+        self.stats = {"playouts": playouts, "seconds": seconds, "playouts_per_second": playouts / seconds}
+        return max(legal_actions, key=lambda action: visits.get(action, 0))
+
+    def play_turn(self, engine: GinRummyEngine) -> bool:
+        """Play the current player's whole turn. Returns True if it ended the round."""
+        state = RoundState(engine=engine, phase=DRAW)
+        player_idx = engine.get_current_player_idx()
+        while not state.finished and engine.get_current_player_idx() == player_idx:
+            state.apply(self.choose_action(engine=engine, phase=state.phase))
+        return state.finished
@@ -0,0 +1,220 @@
+"""
+Precomputed index of every legal meld in a 52-card deck.
+
+Melds are stored as 52-bit card masks (bit i is card i of FULL_DECK), so checking whether a
+hand contains a meld, or whether a card can be laid off onto one, is a mask intersection.
+"""
+
+from itertools import product
+from threading import Lock
+from typing import Callable, Dict, List, Tuple
+from .cache import LRUCache
+from .constants import SUITS, RANKS, CARD_VALUES, DEADWOOD_CACHE_SIZE
+
+# Sets: three or four cards of the same rank
+SETS: List[int] = []
+for _rank_idx in range(len(RANKS)):
+    _rank_cards = [suit_idx * len(RANKS) + _rank_idx for suit_idx in range(len(SUITS))]
+    _four_of_a_kind = sum(1 << card_idx for card_idx in _rank_cards)
+    SETS.append(_four_of_a_kind)
+    SETS.extend(_four_of_a_kind & ~(1 << card_idx) for card_idx in _rank_cards)
+
+# Runs: three or more consecutive cards of the same suit
+RUNS: List[int] = [
+    sum(1 << (suit_idx * len(RANKS) + rank_idx) for rank_idx in range(start, start + length))
+    for suit_idx in range(len(SUITS))
+    for length in range(3, len(RANKS) + 1)
+    for start in range(len(RANKS) - length + 1)
+]
+
+MELDS: List[int] = SETS + RUNS
+MELD_SET = frozenset(MELDS)
+
+# Reverse index: the melds that contain each card
+CARD_MELDS: List[Tuple[int, ...]] = [
+    tuple(meld for meld in MELDS if meld >> card_idx & 1)
+    for card_idx in range(len(SUITS) * len(RANKS))
+]
+
+# The melds whose lowest card is each card, so every meld is visited once when scanning a hand
+_LOWEST_CARD_MELDS: List[Tuple[int, ...]] = [
+    tuple(meld for meld in card_melds if meld & -meld == 1 << card_idx)
+    for card_idx, card_melds in enumerate(CARD_MELDS)
+]
+
+# Solved hands keyed by hand mask, shared by every engine in the process
+DEADWOOD_CACHE = LRUCache(maxsize=DEADWOOD_CACHE_SIZE)
+
+
+class SolverStats(object):
+    """Counters for the deadwood searches run in this process. Safe to share between threads."""
+
+    def __init__(self):
+        self.searches = 0
+        self.nodes = 0  # Subsets of a hand evaluated by the searches.
+        self.mark_deadwood_calls = 0
+        self.lock = Lock()
+
+    def record(self, solve: Callable):
+        """Count a finished search built by make_solver."""
+        nodes = len(solve.memo) - 1
+        with self.lock:
+            self.searches += 1
+            self.nodes += nodes
+
+    def record_mark_deadwood(self):
+        with self.lock:
+            self.mark_deadwood_calls += 1
+
+    def stats(self) -> Dict[str, int]:
+        with self.lock:
+            return {"searches": self.searches, "nodes": self.nodes, "mark_deadwood_calls": self.mark_deadwood_calls}
+
+
+SOLVER_STATS = SolverStats()
+
+
+def is_meld(mask: int) -> bool:
+    """Check if the cards in a mask form a legal set or run."""
+    return mask in MELD_SET
+
+
+def can_lay_off(card_idx: int, meld: int) -> bool:
+    """Check if a card can be added to an existing meld."""
+    return not meld >> card_idx & 1 and (meld | 1 << card_idx) in MELD_SET
+
+
+def melds_in(mask: int) -> List[int]:
+    """Return every meld whose cards are all in the mask."""
+    melds = []
+    remaining = mask
+    while remaining:
+        lowest = remaining & -remaining
+        remaining ^= lowest
+        melds.extend(meld for meld in _LOWEST_CARD_MELDS[lowest.bit_length() - 1] if meld & mask == meld)
+    return melds
+
+
+def split_components(mask: int) -> List[int]:
+    """Split a hand mask into groups of cards that are connected through the melds in the hand."""
+    components: List[int] = []
+    for meld in melds_in(mask):
+        overlapping = [component for component in components if component & meld]
+        for component in overlapping: components.remove(component)
+        components.append(meld | sum(overlapping))
+    unmatched = mask & ~sum(components)
+    while unmatched:
+        lowest = unmatched & -unmatched
+        unmatched ^= lowest
+        components.append(lowest)
+    return components
+
+
+def make_solver(mask: int) -> Callable[[int], Tuple[int, Tuple[int, ...]]]:
+    """
+    Build the memoized search over the subsets of a hand mask.
+
+    Each card is either deadwood or part of one of the candidate melds, so the search
+    picks the lowest uncovered card, branches on those options and memoizes the result
+    for every subset of remaining cards. A 10 or 11 card hand has at most 2^11 subsets,
+    which keeps evaluation in the sub-millisecond range instead of enumerating every
+    arrangement. Queries for different subsets of the same hand share the memo.
+    """
+    melds_by_card: Dict[int, List[int]] = {}
+    for meld in melds_in(mask):
+        remaining = meld
+        while remaining:
+            lowest = remaining & -remaining
+            remaining ^= lowest
+            melds_by_card.setdefault(lowest, []).append(meld)
+
+    memo: Dict[int, Tuple[int, Tuple[int, ...]]] = {0: (0, ())}
+
+    def solve(remaining: int) -> Tuple[int, Tuple[int, ...]]:
+        if remaining in memo: return memo[remaining]
+        lowest = remaining & -remaining
+        points, melds = solve(remaining ^ lowest)
+        best = (points + CARD_VALUES[lowest.bit_length() - 1], melds)
+        for meld in melds_by_card.get(lowest, ()):
+            if meld & remaining != meld: continue
+            points, melds = solve(remaining ^ meld)
+            if points < best[0]: best = (points, melds + (meld,))
+        memo[remaining] = best
+        return best
+
+    solve.memo = memo
+    return solve
+
+
+def solve_deadwood(mask: int) -> Tuple[int, Tuple[int, ...]]:
+    """
+    Find the melds that leave the least deadwood points in a hand mask.
+
+    Returns the deadwood points and the melds used, each as a card mask. Results are
+    cached in DEADWOOD_CACHE.
+    """
+    cached = DEADWOOD_CACHE.get(mask)
+    if cached is not None: return cached
+
+    solve = make_solver(mask=mask)
+    result = solve(mask)
+    SOLVER_STATS.record(solve)
+    DEADWOOD_CACHE.put(mask, result)
+    return result
+
+
+def solve_removals(mask: int) -> Dict[int, Tuple[int, Tuple[int, ...]]]:
+    """Solve the hand left after removing each card of a mask, sharing one search. Keyed by card index."""
+    solve = None
+    results = {}
+    remaining = mask
+    while remaining:
+        lowest = remaining & -remaining
+        remaining ^= lowest
+        result = DEADWOOD_CACHE.get(mask ^ lowest)
+        if result is None:
+            if solve is None: solve = make_solver(mask=mask)
+            result = solve(mask ^ lowest)
+            DEADWOOD_CACHE.put(mask ^ lowest, result)
+        results[lowest.bit_length() - 1] = result
+    if solve is not None: SOLVER_STATS.record(solve)
+    return results
+
+
+def layoff_options(meld: int, mask: int) -> List[int]:
+    """Return every group of cards in the mask that can be laid off onto a meld together, starting with none."""
+    lowest = meld & -meld
+    options = [0]
+    for extended in CARD_MELDS[lowest.bit_length() - 1]:
+        laid_off = extended ^ meld
+        if extended & meld == meld and laid_off and laid_off & mask == laid_off: options.append(laid_off)
+    return options
+
+
+def solve_layoffs(mask: int, knocker_melds: Tuple[int, ...]) -> Tuple[int, Tuple[int, ...], Tuple[int, ...]]:
+    """
+    Find the defender's best combination of layoffs and own melds after a knock.
+
+    Laying off a group of cards is only valid if it extends a knocker meld to another meld,
+    so each knocker meld has a handful of options. Every combination of disjoint options is
+    scored by solving the cards left over, and all of them share one memo over the subsets
+    of the hand. Returns the deadwood points, the defender's melds and the cards laid off onto
+    each knocker meld, as card masks.
+    """
+    options = [layoff_options(meld=meld, mask=mask) for meld in knocker_melds]
+    if all(len(meld_options) == 1 for meld_options in options):
+        points, melds = solve_deadwood(mask=mask)
+        return points, melds, (0,) * len(knocker_melds)
+
+    solve = make_solver(mask=mask)
+    best = None
+    for layoffs in product(*options):
+        laid_off = 0
+        for cards in layoffs:
+            if laid_off & cards: break
+            laid_off |= cards
+        else:
+            points, melds = solve(mask & ~laid_off)
+            if best is None or points < best[0]: best = (points, melds, layoffs)
+    SOLVER_STATS.record(solve)
+    return best
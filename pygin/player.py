@@ -17,6 +17,11 @@ class Player(object):
     def get_hand(self) -> Hand:
         return self.hand
 
+    def copy(self) -> "Player":
+        player = Player(name=self.name)
+        player.hand = self.hand.copy()
+        return player
+
     def take_card(self, card: Card):
         self.hand.add_card(card)
 
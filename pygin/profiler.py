@@ -0,0 +1,112 @@
+"""
+Sampling profiler that can be switched on and off in a running process.
+
+A background thread periodically reads the stack of every other thread with
+sys._current_frames() and counts the stacks that pass through the target modules. Nothing
+is installed in the profiled code, so a stopped profiler costs nothing.
+"""
+
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+Frame = Tuple[str, str, int]  # Module, function and line number.
+
+TARGET_MODULES = ("pygin.utils", "pygin.engine")
+
+
+class SamplingProfiler(object):
+    def __init__(self, interval: float = 0.005, target_modules: Tuple[str, ...] = TARGET_MODULES, packages: Tuple[str, ...] = ("pygin", "backend")):
+        self.interval = interval
+        self.target_modules = frozenset(target_modules)
+        self.packages = packages  # Frames outside these packages are left out of the recorded stacks.
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.started_at: Optional[float] = None
+        self.seconds = 0.0
+        self.thread: Optional[threading.Thread] = None
+        self.stopping = threading.Event()
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return f"SamplingProfiler(interval={self.interval}, running={self.running})"
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None
+
+    def start(self, interval: Optional[float] = None):
+        """Start sampling. Does nothing if the profiler is already running."""
+        with self.lock:
+            if self.thread is not None: return
+            if interval is not None: self.interval = interval
+            self.stopping.clear()
+            self.started_at = time.perf_counter()
+            self.thread = threading.Thread(target=self.run, name="pygin-profiler", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Stop sampling and keep the collected stacks."""
+        with self.lock:
+            if self.thread is None: return
+            self.stopping.set()
+            self.thread.join()
+            self.thread = None
+            self.seconds += time.perf_counter() - self.started_at
+
+    def reset(self):
+        """Forget the collected stacks."""
+        with self.lock:
+            self.stacks = Counter()
+            self.samples = 0
+            self.seconds = 0.0
+            if self.thread is not None: self.started_at = time.perf_counter()
+
+    def run(self):
+        own_thread_id = threading.get_ident()
+        while not self.stopping.wait(self.interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread_id: continue
+                stack = self.extract_stack(frame)
+                if stack: self.stacks[stack] += 1
+            self.samples += 1
+
+    def extract_stack(self, frame) -> Optional[Tuple[Frame, ...]]:
+        """The frames of a thread's stack inside the packages, outermost first, if it passes through a target module."""
+        stack = []
+        hit = False
+        while frame is not None:
+            module = frame.f_globals.get("__name__", "")
+            if module in self.target_modules: hit = True
+            if module.startswith(self.packages): stack.append((module, frame.f_code.co_name, frame.f_lineno))
+            frame = frame.f_back
+        return tuple(reversed(stack)) if hit else None
+
+    def top(self, limit: int = 20) -> List[Dict]:
+        """The most frequently sampled stacks, with the share of samples they were seen in."""
+        samples = max(self.samples, 1)
+        return [
+            {
+                "count": count,
+                "fraction": count / samples,
+                "stack": [f"{module}:{function}:{line}" for module, function, line in stack],
+            }
+            for stack, count in self.stacks.most_common(limit)
+        ]
+
+    def collapsed(self) -> str:
+        """The stacks in the collapsed format read by flame graph tools, one 'frame;frame;frame count' line each."""
+        return "\n".join(
+            ";".join(f"{module}:{function}" for module, function, _ in stack) + f" {count}"
+            for stack, count in self.stacks.most_common()
+        )
+
+    def stats(self) -> Dict:
+        seconds = self.seconds + (time.perf_counter() - self.started_at if self.thread is not None else 0.0)
+        return {"running": self.running, "interval": self.interval, "samples": self.samples, "seconds": seconds, "stacks": len(self.stacks)}
+
+
+# Profiler shared by the process, started on demand
+PROFILER = SamplingProfiler()
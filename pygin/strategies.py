@@ -0,0 +1,107 @@
+"""
+Strategies and a game loop for playing GinRummyEngine games without a human.
+
+A strategy is a callable strategy(engine, decision, rng) that is asked for one decision of the
+current player's turn:
+
+- DRAW: return True to take the top card of the discard pile, False to draw from the deck.
+- DISCARD: return the card to discard from the current player's 11-card hand.
+- KNOCK: return True to knock. Only asked when the current player is allowed to knock.
+
+Strategies must be module-level callables so they can be sent to worker processes.
+"""
+
+import random
+from typing import Any, Callable, List, Optional, Sequence, Tuple
+from .card import Card
+from .engine import GinRummyEngine
+from .constants import MAX_SCORE, CARD_INDEX
+from .melds import solve_removals
+
+DRAW = "draw"
+DISCARD = "discard"
+KNOCK = "knock"
+MAX_TURNS_PER_ROUND = 200
+MAX_ROUNDS_PER_GAME = 100
+
+Strategy = Callable[[GinRummyEngine, str, random.Random], Any]
+
+
+def best_discard_deadwood(mask: int) -> int:
+    """Return the least deadwood left by discarding one card of the mask."""
+    return min(deadwood for deadwood, _ in solve_removals(mask=mask).values())
+
+
+def random_strategy(engine: GinRummyEngine, decision: str, rng: random.Random) -> Any:
+    """Draws from a random source, discards a random card and always knocks."""
+    if decision == DRAW: return rng.random() < 0.5
+    if decision == DISCARD: return rng.choice(list(engine.get_current_player().get_hand()))
+    return True
+
+
+def greedy_strategy(engine: GinRummyEngine, decision: str, rng: random.Random) -> Any:
+    """Takes the discard only if it lowers deadwood, discards to minimize deadwood and always knocks."""
+    hand = engine.get_current_player().get_hand()
+    if decision == DRAW:
+        if not engine.discard_stack: return False
+        return best_discard_deadwood(mask=hand.mask | 1 << CARD_INDEX[engine.discard_stack[-1]]) < hand.deadwood
+    if decision == DISCARD: return engine.suggest_discard()[0]["card"]
+    return True
+
+
+def play_turn(engine: GinRummyEngine, strategy: Strategy, rng: random.Random) -> bool:
+    """Play one turn for the current player. Returns True if the turn ended the round."""
+    engine.draw_card(from_discard_stack=bool(strategy(engine, DRAW, rng)))
+    if engine.get_current_player().get_hand().deadwood == 0:
+        engine.gin()
+        return True
+
+    card: Card = strategy(engine, DISCARD, rng)
+    engine.discard_card(card=card)
+    if engine.get_current_player().get_hand().deadwood == 0:
+        engine.gin()
+        return True
+    if engine.can_knock() and strategy(engine, KNOCK, rng):
+        engine.knock()
+        return True
+
+    engine.switch_turn()
+    return False
+
+
+def play_round(engine: GinRummyEngine, strategies: Sequence[Strategy], rng: random.Random, max_turns: int = MAX_TURNS_PER_ROUND) -> bool:
+    """Play a dealt round to the end. Returns False if nobody ended it within max_turns."""
+    for _ in range(max_turns):
+        if play_turn(engine=engine, strategy=strategies[engine.get_current_player_idx()], rng=rng): return True
+    return False
+
+
+def play_game(strategies: Sequence[Strategy], seed: Optional[int] = None, max_score: int = MAX_SCORE,
+              max_rounds: int = MAX_ROUNDS_PER_GAME, on_round: Optional[Callable[[int], None]] = None) -> Tuple[GinRummyEngine, bool]:
+    """
+    Play a game between two strategies until a player reaches max_score. Returns the engine and whether the game finished.
+
+    A game is abandoned unfinished if a round is not over within MAX_TURNS_PER_ROUND turns or nobody
+    reaches max_score within max_rounds rounds, so strategies that never knock cannot stall a worker.
+    on_round is called with the index of each round before it is played.
+    """
+    engine = GinRummyEngine(player1="player1", player2="player2", seed=seed)
+    rng = random.Random(None if seed is None else f"strategies:{seed}")
+    engine.deal_initial_hands()
+    finished = False
+    for round_idx in range(max_rounds):
+        if on_round is not None: on_round(round_idx)
+        if not play_round(engine=engine, strategies=strategies, rng=rng): break
+        if max(engine.scores) >= max_score:
+            finished = True
+            break
+        if round_idx + 1 < max_rounds: engine.reset_round()
+    engine.compute_final_scores()
+    return engine, finished
+
+
+def get_winner_idx(engine: GinRummyEngine) -> Optional[int]:
+    """Return the index of the player with the higher final score, or None on a tie."""
+    scores: List[int] = engine.scores
+    if scores[0] == scores[1]: return None
+    return 0 if scores[0] > scores[1] else 1
@@ -0,0 +1,162 @@
+"""
+Tournament runner that plays strategies against each other across all cores.
+
+Games are played in a process pool and their results are streamed back as they finish, so the
+standings are updated incrementally and never hold the individual games in memory. Each game's
+seed is derived from the tournament seed, the round, the pairing and the game number, so a
+tournament replays identically no matter how many workers run it.
+"""
+
+import math
+import random
+from dataclasses import dataclass, field
+from multiprocessing import Pool
+from typing import Dict, Iterator, List, Optional, Tuple
+from .strategies import Strategy, play_game, get_winner_idx
+
+ROUND_ROBIN = "round_robin"
+SWISS = "swiss"
+
+# Strategies of the running tournament, installed once per worker process.
+_worker_strategies: Dict[str, Strategy] = {}
+
+
+@dataclass
+class GameResult:
+    round_idx: int
+    players: Tuple[str, str]
+    seed: int
+    scores: Tuple[int, int]
+    winner: Optional[str]
+    finished: bool = True  # False if the game was abandoned, see play_game.
+
+
+@dataclass
+class StrategyStats:
+    """Running win rate and score margin of one strategy, updated one game at a time."""
+    games: int = 0
+    wins: float = 0.0
+    margin_mean: float = 0.0
+    margin_m2: float = 0.0
+    opponents: Dict[str, int] = field(default_factory=dict)
+
+    def add_game(self, opponent: str, win: float, margin: int):
+        """Add a game's result (win is 1, 0.5 for a tie or 0) using Welford's update for the margin."""
+        self.games += 1
+        self.wins += win
+        delta = margin - self.margin_mean
+        self.margin_mean += delta / self.games
+        self.margin_m2 += delta * (margin - self.margin_mean)
+        self.opponents[opponent] = self.opponents.get(opponent, 0) + 1
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.games if self.games else 0.0
+
+    def win_rate_interval(self, z: float = 1.96) -> Tuple[float, float]:
+        """Wilson score interval for the win rate."""
+        if not self.games: return 0.0, 1.0
+        p, n = self.win_rate, self.games
+        center = (p + z * z / (2 * n)) / (1 + z * z / n)
+        spread = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+        return max(center - spread, 0.0), min(center + spread, 1.0)
+
+    def margin_interval(self, z: float = 1.96) -> Tuple[float, float]:
+        """Normal-approximation confidence interval for the average score margin."""
+        if self.games < 2: return -math.inf, math.inf
+        spread = z * math.sqrt(self.margin_m2 / (self.games - 1) / self.games)
+        return self.margin_mean - spread, self.margin_mean + spread
+
+    def to_dict(self) -> dict:
+        return {
+            "games": self.games,
+            "win_rate": self.win_rate,
+            "win_rate_interval": self.win_rate_interval(),
+            "average_margin": self.margin_mean,
+            "margin_interval": self.margin_interval(),
+        }
+
+
+def _init_worker(strategies: Dict[str, Strategy]):
+    global _worker_strategies
+    _worker_strategies = strategies
+
+
+def _play(task: Tuple[int, Tuple[str, str], int]) -> GameResult:
+    round_idx, players, seed = task
+    engine, finished = play_game(strategies=[_worker_strategies[name] for name in players], seed=seed)
+    winner_idx = get_winner_idx(engine=engine)
+    return GameResult(
+        round_idx=round_idx,
+        players=players,
+        seed=seed,
+        scores=(engine.scores[0], engine.scores[1]),
+        winner=None if winner_idx is None else players[winner_idx],
+        finished=finished,
+    )
+
+
+class Tournament(object):
+    """Round-robin or Swiss tournament between named strategies."""
+
+    def __init__(self, strategies: Dict[str, Strategy], games_per_pairing: int, tournament_format: str = ROUND_ROBIN,
+                 rounds: int = 1, seed: int = 0, processes: Optional[int] = None):
+        if tournament_format not in (ROUND_ROBIN, SWISS): raise ValueError(f"Unknown tournament format: {tournament_format}")
+        if len(strategies) < 2: raise ValueError("A tournament needs at least two strategies.")
+        self.strategies = strategies
+        self.games_per_pairing = games_per_pairing
+        self.tournament_format = tournament_format
+        self.rounds = rounds
+        self.seed = seed
+        self.processes = processes
+        self.standings: Dict[str, StrategyStats] = {name: StrategyStats() for name in strategies}
+        self.unfinished = 0  # Abandoned games, left out of the standings.
+
+    def round_robin_pairings(self) -> List[Tuple[str, str]]:
+        """Every strategy plays every other strategy."""
+        names = sorted(self.strategies)
+        return [(a, b) for i, a in enumerate(names) for b in names[i + 1:]]
+
+    def swiss_pairings(self, round_idx: int) -> List[Tuple[str, str]]:
+        """Pair strategies with similar win counts, avoiding rematches where possible. Odd one out sits out."""
+        rng = random.Random(f"{self.seed}:swiss:{round_idx}")
+        names = sorted(self.strategies, key=lambda name: (-self.standings[name].wins, rng.random()))
+        pairings = []
+        while len(names) >= 2:
+            a = names.pop(0)
+            b = next((name for name in names if name not in self.standings[a].opponents), names[0])
+            names.remove(b)
+            pairings.append((a, b))
+        return pairings
+
+    def round_tasks(self, round_idx: int) -> Iterator[Tuple[int, Tuple[str, str], int]]:
+        """Games of one round, alternating seats so neither strategy always deals first."""
+        pairings = self.round_robin_pairings() if self.tournament_format == ROUND_ROBIN else self.swiss_pairings(round_idx)
+        for a, b in pairings:
+            for game_idx in range(self.games_per_pairing):
+                players = (a, b) if game_idx % 2 == 0 else (b, a)
+                yield round_idx, players, random.Random(f"{self.seed}:{round_idx}:{a}:{b}:{game_idx}").getrandbits(63)
+
+    def record(self, result: GameResult):
+        """Fold a finished game into the standings, or count it as abandoned."""
+        if not result.finished:
+            self.unfinished += 1
+            return
+        for seat, name in enumerate(result.players):
+            opponent = result.players[1 - seat]
+            win = 0.5 if result.winner is None else float(result.winner == name)
+            self.standings[name].add_game(opponent=opponent, win=win, margin=result.scores[seat] - result.scores[1 - seat])
+
+    def run(self, chunksize: int = 16) -> Iterator[GameResult]:
+        """Play the tournament, yielding each game result as it arrives after recording it in the standings."""
+        with Pool(processes=self.processes, initializer=_init_worker, initargs=(self.strategies,)) as pool:
+            for round_idx in range(self.rounds):
+                # Swiss pairings depend on the previous round, so rounds run one after another.
+                for result in pool.imap_unordered(_play, self.round_tasks(round_idx), chunksize=chunksize):
+                    self.record(result=result)
+                    yield result
+
+    def summary(self) -> Dict[str, dict]:
+        """Return the standings, best win rate first."""
+        ranked = sorted(self.standings.items(), key=lambda item: -item[1].win_rate)
+        return {name: stats.to_dict() for name, stats in ranked}
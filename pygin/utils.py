@@ -1,77 +1,116 @@
-from typing import List, Tuple
-from itertools import combinations, groupby
-from copy import deepcopy
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
 from .card import Card
 from .hand import Hand
-from .constants import RANKS
-
-
-def mark_deadwood(hand: Hand) -> Hand:
-    """Mark the deadwood cards in a given hand."""
-    hand_copy = deepcopy(hand)
-    arrangements = generate_arrangements(hand_copy)
-    min_deadwood_arrangement = min(arrangements, key=lambda x: len(x[2]))
-    for card in hand_copy: card.is_deadwood = card in min_deadwood_arrangement[2]
-    return hand_copy
-
-
-def generate_arrangements(hand: Hand) -> List[Tuple[List[Card], List[Card], List[Card]]]:
-    """Generate all possible arrangements of sets and runs for the given hand."""
-    arrangements = []
-    generate_arrangements_helper(hand, [], [], [], arrangements)
-    return arrangements
-
-
-def generate_arrangements_helper(hand: Hand, sets: List[Card], runs: List[Card], deadwood: List[Card], arrangements: List[Tuple[List[Card], List[Card], List[Card]]]):
-    """Recursive helper function to generate all possible arrangements."""
-    if not hand:
-        arrangements.append((sets[:], runs[:], deadwood[:]))
-        return
-
-    # Try adding the current card to existing sets
-    for i, set_cards in enumerate(sets):
-        if len(set_cards) < 4 and hand[0].rank == set_cards[0].rank:
-            sets[i].append(hand[0])
-            generate_arrangements_helper(hand[1:], sets, runs, deadwood, arrangements)
-            sets[i].pop()
-
-    # Try adding the current card to existing runs
-    for i, run_cards in enumerate(runs):
-        if can_extend_run(run_cards, hand[0]):
-            runs[i].append(hand[0])
-            generate_arrangements_helper(hand[1:], sets, runs, deadwood, arrangements)
-            runs[i].pop()
-
-    # Try creating a new set with the current card
-    for size in range(3, 5):
-        for new_set in combinations(hand, size):
-            if all(card.rank == new_set[0].rank for card in new_set):
-                sets.append(list(new_set))
-                generate_arrangements_helper(
-                    [card for card in hand if card not in new_set],
-                    sets, runs, deadwood, arrangements
-                )
-                sets.pop()
-
-    # Try creating a new run with the current card
-    sorted_hand = sorted(hand, key=lambda card: (card.suit, card.rank))
-    for _, group in groupby(sorted_hand, key=lambda card: card.suit):
-        group_list = list(group)
-        for start in range(len(group_list)):
-            for end in range(start + 2, len(group_list) + 1):
-                run = group_list[start:end]
-                if is_valid_run(run):
-                    runs.append(run)
-                    generate_arrangements_helper(
-                        [card for card in hand if card not in run],
-                        sets, runs, deadwood, arrangements
-                    )
-                    runs.pop()
-
-    # If the current card cannot be added to any set or run, add it to deadwood
-    deadwood.append(hand[0])
-    generate_arrangements_helper(hand[1:], sets, runs, deadwood, arrangements)
-    deadwood.pop()
+from .constants import RANKS, FULL_DECK, RANK_VALUES, RANK_INDEX, CARD_INDEX, CARD_VALUES, UNDERCUT_BONUS
+from .melds import SOLVER_STATS, solve_deadwood, solve_layoffs
+
+
+def card_to_index(card: Card) -> int:
+    """Convert a card to its compact index in 0..51."""
+    return CARD_INDEX[card]
+
+
+def index_to_card(card_idx: int) -> Card:
+    """Convert a compact card index back to the shared card instance."""
+    return FULL_DECK[card_idx]
+
+
+def cards_to_mask(cards: Iterable[Card]) -> int:
+    """Convert cards to a 52-bit mask with bit i set for card index i."""
+    mask = 0
+    for card in cards: mask |= 1 << CARD_INDEX[card]
+    return mask
+
+
+def mask_to_cards(mask: int) -> List[Card]:
+    """Convert a 52-bit mask to its cards, ordered by card index."""
+    return [FULL_DECK[card_idx] for card_idx in iter_mask(mask)]
+
+
+def iter_mask(mask: int) -> Iterator[int]:
+    """Iterate over the card indices set in a mask, lowest first."""
+    while mask:
+        lowest = mask & -mask
+        yield lowest.bit_length() - 1
+        mask ^= lowest
+
+
+def get_card_value(card: Card) -> int:
+    """Get the value of a card for scoring purposes."""
+    return RANK_VALUES[card.rank]
+
+
+def get_mask_value(mask: int) -> int:
+    """Get the total value of the cards in a mask."""
+    return sum(CARD_VALUES[card_idx] for card_idx in iter_mask(mask))
+
+
+def mark_deadwood(hand: Hand) -> int:
+    """Find the deadwood cards in a given hand, minimizing the deadwood points. Returns them as a card mask."""
+    SOLVER_STATS.record_mark_deadwood()
+    return hand.mask & ~sum(hand.melds)
+
+
+def get_deadwood_count(hand: Hand) -> int:
+    """Calculate the deadwood count (unmatched cards value) for a given hand."""
+    return hand.deadwood
+
+
+def settle_knock(knocker_mask: int, defender_mask: int, knocker_melds: Optional[Tuple[int, ...]] = None) -> Tuple[int, int, Tuple[int, ...], int, Tuple[int, ...], Tuple[int, ...]]:
+    """
+    Settle a knock between two hand masks.
+
+    The knocker's melds are solved unless given, e.g. by the incrementally tracked hand. The
+    defender then lays off onto them, unless the knocker has no deadwood. Returns the points
+    from the knocker's point of view, the knocker's deadwood and melds, the defender's deadwood
+    after layoffs and melds, and the cards laid off onto each knocker meld.
+    """
+    if knocker_melds is None: knocker_deadwood, knocker_melds = solve_deadwood(mask=knocker_mask)
+    else: knocker_deadwood = get_mask_value(knocker_mask & ~sum(knocker_melds))
+    if knocker_deadwood: defender_deadwood, defender_melds, layoffs = solve_layoffs(mask=defender_mask, knocker_melds=knocker_melds)
+    else: (defender_deadwood, defender_melds), layoffs = solve_deadwood(mask=defender_mask), (0,) * len(knocker_melds)
+    deadwood_difference = defender_deadwood - knocker_deadwood
+    points = deadwood_difference if deadwood_difference > 0 else deadwood_difference - UNDERCUT_BONUS
+    return points, knocker_deadwood, knocker_melds, defender_deadwood, defender_melds, layoffs
+
+
+def score_knock(knocker_mask: int, defender_mask: int, knocker_melds: Optional[Tuple[int, ...]] = None) -> int:
+    """
+    Score a knock between two hand masks from the knocker's point of view.
+
+    Positive values are won by the knocker; negative values are won by the defender, who
+    undercut the knocker and also receives the undercut bonus.
+    """
+    return settle_knock(knocker_mask=knocker_mask, defender_mask=defender_mask, knocker_melds=knocker_melds)[0]
+
+
+def knock_breakdown(knocker_mask: int, defender_mask: int, knocker_melds: Optional[Tuple[int, ...]] = None) -> Dict[str, Any]:
+    """Settle a knock and describe both hands, the layoffs and the result with cards, e.g. for display."""
+    points, knocker_deadwood, knocker_melds, defender_deadwood, defender_melds, layoffs = settle_knock(
+        knocker_mask=knocker_mask, defender_mask=defender_mask, knocker_melds=knocker_melds,
+    )
+    laid_off = sum(layoffs)
+    return {
+        "points": points,
+        "undercut": points < 0,
+        "knocker_deadwood": knocker_deadwood,
+        "knocker_melds": [mask_to_cards(meld) for meld in knocker_melds],
+        "knocker_unmatched": mask_to_cards(knocker_mask & ~sum(knocker_melds)),
+        "defender_deadwood": defender_deadwood,
+        "defender_deadwood_before_layoffs": defender_deadwood + get_mask_value(laid_off),
+        "defender_melds": [mask_to_cards(meld) for meld in defender_melds],
+        "defender_unmatched": mask_to_cards(defender_mask & ~sum(defender_melds) & ~laid_off),
+        "layoffs": [
+            {"meld": mask_to_cards(meld), "cards": mask_to_cards(cards)}
+            for meld, cards in zip(knocker_melds, layoffs) if cards
+        ],
+    }
+
+
+def find_optimal_melds(cards: List[Card]) -> List[List[Card]]:
+    """Find the sets and runs that leave the least deadwood points in the given cards."""
+    _, melds = solve_deadwood(mask=cards_to_mask(cards))
+    return [[card for card in cards if meld >> CARD_INDEX[card] & 1] for meld in melds]
 
 
 def can_extend_run(run: List[Card], card: Card) -> bool:
@@ -79,8 +118,8 @@ def can_extend_run(run: List[Card], card: Card) -> bool:
     if not run:
         return True
     prev_card = run[-1]
-    prev_rank_index = RANKS.index(prev_card.rank)
-    card_rank_index = RANKS.index(card.rank)
+    prev_rank_index = RANK_INDEX[prev_card.rank]
+    card_rank_index = RANK_INDEX[card.rank]
     return (
         card.suit == prev_card.suit
         and (
@@ -95,4 +134,5 @@ def is_valid_run(run: List[Card]) -> bool:
     """Check if a list of cards forms a valid run."""
     ranks = [card.rank for card in run]
     suits = [card.suit for card in run]
-    return len(set(suits)) == 1 and len(set(ranks)) == len(run) and ranks == list(RANKS[RANKS.index(ranks[0]):RANKS.index(ranks[0]) + len(run)])
+    start = RANK_INDEX[ranks[0]]
+    return len(set(suits)) == 1 and len(set(ranks)) == len(run) and ranks == RANKS[start:start + len(run)]
@@ -0,0 +1,60 @@
+"""Tests for the perfect-information endgame solver."""
+
+import random
+from typing import List
+from pygin import Card, GinRummyEngine
+from pygin.constants import GIN_BONUS, RANK_VALUES
+from pygin.endgame import ENDGAME_STOCK_SIZE, EndgameSolver, is_endgame
+from pygin.strategies import DRAW, KNOCK, greedy_strategy, play_turn
+
+
+def cards(*names: str) -> List[Card]:
+    suits = {"H": "Hearts", "D": "Diamonds", "C": "Clubs", "S": "Spades"}
+    return [Card(rank=name[:-1], suit=suits[name[-1]]) for name in names]
+
+
+def never_knock(engine: GinRummyEngine, decision: str, rng: random.Random):
+    return False if decision == KNOCK else greedy_strategy(engine, decision, rng)
+
+
+def endgame_positions(stock_size: int, count: int) -> List[GinRummyEngine]:
+    positions = []
+    for seed in range(10 * count * stock_size):
+        engine = GinRummyEngine(player1="player1", player2="player2", seed=seed)
+        engine.deal_initial_hands()
+        rng = random.Random(seed)
+        while not is_endgame(engine, stock_size=stock_size) and not engine.round_over: play_turn(engine=engine, strategy=never_knock, rng=rng)
+        if not engine.round_over: positions.append(engine)
+        if len(positions) == count: break
+    return positions
+
+
+def test_solver_finds_gin_from_the_discard_pile():
+    # Player 1 is one queen short of Gin, and the queen is on top of the discard pile. The last
+    # stock card does not help, so taking the queen and discarding the king is worth Gin.
+    engine = GinRummyEngine(player1="player1", player2="player2", seed=0)
+    engine.players[0].get_hand().set_cards(cards=cards("2H", "3H", "4H", "7C", "7D", "7S", "9D", "10D", "JD", "KS"))
+    opponent_cards = cards("AS", "3C", "5D", "8H", "10S", "JC", "QH", "KH", "4S", "6D")  # No melds.
+    engine.players[1].get_hand().set_cards(cards=opponent_cards)
+    engine.deck.cards = cards("6S")
+    engine.discard_stack = cards("2C", "QD")
+    engine.current_player_index = 0
+
+    result = EndgameSolver().solve(engine, phase=DRAW)
+    assert result.exact
+    assert result.best_action == (DRAW, 1)
+    assert result.value == sum(RANK_VALUES[card.rank] for card in opponent_cards) + GIN_BONUS == 92
+    assert result.action_values[(DRAW, 0)] < result.value
+
+
+def test_solver_is_exact_at_the_default_stock_size():
+    for engine in endgame_positions(stock_size=ENDGAME_STOCK_SIZE, count=3):
+        assert EndgameSolver().solve(engine, phase=DRAW).exact
+
+
+def test_transposition_table_does_not_change_values():
+    for engine in endgame_positions(stock_size=1, count=10):
+        with_table = EndgameSolver().solve(engine, phase=DRAW)
+        without_table = EndgameSolver(tt_size=0).solve(engine, phase=DRAW)
+        assert with_table.exact and without_table.exact
+        assert with_table.action_values == without_table.action_values
@@ -0,0 +1,88 @@
+"""Tests for engine snapshots, clones and determinization."""
+
+import random
+from pygin import GinRummyEngine
+from pygin.constants import FULL_DECK, HAND_SIZE
+from pygin.strategies import greedy_strategy, play_turn
+
+
+def play_turns(engine: GinRummyEngine, turns: int, rng: random.Random):
+    for _ in range(turns):
+        if engine.round_over: engine.reset_round()
+        play_turn(engine=engine, strategy=greedy_strategy, rng=rng)
+
+
+def dealt_engine(seed: int, turns: int = 0) -> GinRummyEngine:
+    engine = GinRummyEngine(player1="player1", player2="player2", seed=seed)
+    engine.deal_initial_hands()
+    play_turns(engine=engine, turns=turns, rng=random.Random(seed))
+    return engine
+
+
+def test_snapshot_restore_round_trip():
+    for seed in range(20):
+        engine = dealt_engine(seed=seed, turns=seed * 3)
+        snapshot = engine.snapshot()
+        play_turns(engine=engine, turns=40, rng=random.Random(seed))
+        after = engine.snapshot()
+
+        engine.restore(snapshot)
+        assert engine.snapshot() == snapshot
+        play_turns(engine=engine, turns=40, rng=random.Random(seed))
+        assert engine.snapshot() == after  # The restored random stream reshuffles and deals the same cards.
+
+        restored = GinRummyEngine(player1="player1", player2="player2")
+        restored.restore(snapshot)
+        assert restored.snapshot() == snapshot
+        play_turns(engine=restored, turns=40, rng=random.Random(seed))
+        assert restored.snapshot() == after
+
+
+def test_clone_is_independent_and_reproducible():
+    engine = dealt_engine(seed=1, turns=5)
+    snapshot = engine.snapshot()
+    first, second = engine.clone(), engine.clone()
+    play_turns(engine=first, turns=60, rng=random.Random(2))
+    play_turns(engine=second, turns=60, rng=random.Random(2))
+    assert first.snapshot(include_rng=False) == second.snapshot(include_rng=False)
+    assert engine.snapshot() == snapshot  # Neither the clones' moves nor their shuffles touch the original.
+
+    exact = engine.clone(include_rng=True)
+    play_turns(engine=exact, turns=60, rng=random.Random(2))
+    play_turns(engine=engine, turns=60, rng=random.Random(2))
+    assert exact.snapshot() == engine.snapshot()
+
+
+def test_determinize_keeps_what_the_player_can_see():
+    for seed in range(50):
+        engine = dealt_engine(seed=seed, turns=seed % 7 + 4)
+        if engine.round_over: continue
+        player_idx = engine.get_current_player_idx()
+        opponent_idx = 1 - player_idx
+        known_mask = engine.known_cards[opponent_idx]
+        determinized = engine.determinize(player_idx=player_idx, rng=random.Random(seed))
+
+        assert determinized.players[player_idx].get_hand().cards == engine.players[player_idx].get_hand().cards
+        assert determinized.discard_stack == engine.discard_stack
+        opponent_hand = determinized.players[opponent_idx].get_hand()
+        assert opponent_hand.mask & known_mask == known_mask
+        assert len(opponent_hand) == len(engine.players[opponent_idx].get_hand())
+        assert len(determinized.deck) == len(engine.deck)
+
+        cards = [*determinized.deck.cards, *determinized.discard_stack, *(card for player in determinized.players for card in player.get_hand())]
+        assert sorted(cards, key=FULL_DECK.index) == FULL_DECK
+        assert all(card is FULL_DECK[FULL_DECK.index(card)] for card in cards)
+        assert engine.determinize(player_idx=player_idx, rng=random.Random(seed)).snapshot() == determinized.snapshot()
+
+
+def test_known_cards_follow_discard_pickups():
+    engine = dealt_engine(seed=3)
+    engine.draw_card(from_discard_stack=False)
+    discarded = engine.get_current_player().get_hand().cards[0]
+    engine.discard_card(discarded)
+    engine.switch_turn()
+    engine.draw_card(from_discard_stack=True)
+    player_idx = engine.get_current_player_idx()
+    assert engine.get_current_player().get_hand().has_card(discarded)
+    assert engine.determinize(player_idx=1 - player_idx, rng=random.Random(0)).players[player_idx].get_hand().has_card(discarded)
+    assert len(engine.get_current_player().get_hand()) == HAND_SIZE + 1
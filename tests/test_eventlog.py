@@ -0,0 +1,102 @@
+"""Tests for logging hosted games and replaying them."""
+
+import gc
+import random
+from backend.sessions import Session, SessionManager
+from pygin import GinRummyEngine
+from pygin.eventlog import EventLogReader, EventLogWriter
+from pygin.strategies import greedy_strategy, play_turn
+
+
+def log_game_id(game_id: str) -> int:
+    return int(game_id[:16], 16)
+
+
+def logged_sessions(writer: EventLogWriter) -> SessionManager:
+    """A session manager wired to the event log the way the server wires it."""
+    return SessionManager(
+        max_sessions=10,
+        idle_timeout=60,
+        on_load=lambda session: writer.resume(engine=session.game, game_id=log_game_id(session.game_id)),
+        on_evict=lambda game_id, version: writer.end(game_id=log_game_id(game_id), version=version),
+    )
+
+
+def start_game(sessions: SessionManager, writer: EventLogWriter, seed: int, turns: int) -> Session:
+    session = sessions.create(game=GinRummyEngine(player1="player1", player2="player2", seed=seed))
+    rng = random.Random(seed)
+    with sessions.locked(session):
+        writer.attach(engine=session.game, game_id=log_game_id(session.game_id))
+        session.game.deal_initial_hands()
+        for _ in range(turns):
+            if session.game.round_over: break
+            play_turn(engine=session.game, strategy=greedy_strategy, rng=rng)
+    return session
+
+
+def test_evicted_games_end_their_log(tmp_path):
+    path = str(tmp_path / "games.log")
+    writer = EventLogWriter(path=path, batch_size=4)
+    sessions = logged_sessions(writer)
+    evicted = start_game(sessions=sessions, writer=writer, seed=1, turns=6)
+    kept = start_game(sessions=sessions, writer=writer, seed=2, turns=4)
+    expected = evicted.game.snapshot()
+
+    sessions.store.games[evicted.game_id] = sessions.store.games[evicted.game_id][:2] + (0.0,)  # Unused since the epoch.
+    with sessions.lock:
+        assert sessions.evict_idle() == 1
+    assert sessions.get(evicted.game_id) is None
+    assert list(writer.listeners) == [log_game_id(kept.game_id)]
+
+    version = evicted.game.version
+    evicted.game.switch_turn()  # A request still holding the evicted session is no longer logged.
+    writer.flush()
+    reader = EventLogReader(path)
+    events = reader.game_events(game_id=log_game_id(evicted.game_id))
+    assert events[-1].sequence == version + 1 and events[-2].sequence == version
+
+    # The evicted game ends the stream as soon as its END_GAME is read; the other game is still open.
+    games = reader.iter_games()
+    game_id, engine = next(games)
+    assert game_id == log_game_id(evicted.game_id)
+    assert engine.snapshot() == expected
+    assert [game_id for game_id, _ in games] == [log_game_id(kept.game_id)]
+    reader.close()
+    writer.close()
+
+
+def test_dropped_sessions_release_their_listener(tmp_path):
+    writer = EventLogWriter(path=str(tmp_path / "games.log"))
+    sessions = logged_sessions(writer)
+    session = start_game(sessions=sessions, writer=writer, seed=3, turns=2)
+    game_id = session.game_id
+
+    del sessions.sessions[game_id], session
+    gc.collect()
+    assert writer.listeners == {}
+
+    session = sessions.get(game_id)  # Loading the game again resumes its log.
+    assert list(writer.listeners) == [log_game_id(game_id)]
+    sessions.remove(game_id)
+    assert writer.listeners == {}
+    writer.close()
+
+
+def test_iter_games_yields_stale_games(tmp_path):
+    path = str(tmp_path / "games.log")
+    writer = EventLogWriter(path=path)
+    sessions = logged_sessions(writer)
+    abandoned = start_game(sessions=sessions, writer=writer, seed=4, turns=2)
+    expected = abandoned.game.snapshot()
+    busy = start_game(sessions=sessions, writer=writer, seed=5, turns=10)
+    sessions.remove(busy.game_id)
+    writer.flush()
+
+    reader = EventLogReader(path)
+    assert [game_id for game_id, _ in reader.iter_games()] == [log_game_id(busy.game_id), log_game_id(abandoned.game_id)]
+    busy_events = len(reader.game_events(game_id=log_game_id(busy.game_id)))
+    games = list(reader.iter_games(stale_after=busy_events // 2))
+    assert [game_id for game_id, _ in games] == [log_game_id(abandoned.game_id), log_game_id(busy.game_id)]
+    assert games[0][1].snapshot() == expected
+    reader.close()
+    writer.close()
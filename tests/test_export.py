@@ -0,0 +1,24 @@
+"""Tests for writing self-play decisions and loading them back."""
+
+import numpy as np
+import pytest
+from pygin.export import ARROW, NPY, export, load_decisions, play_recorded_game
+from pygin.strategies import greedy_strategy
+
+STRATEGIES = [greedy_strategy, greedy_strategy]
+
+
+@pytest.mark.parametrize("file_format", [NPY, ARROW])
+def test_exported_chunks_load_back(tmp_path, file_format):
+    if file_format == ARROW: pytest.importorskip("pyarrow")
+    directory = str(tmp_path)
+    shards = list(export(directory, STRATEGIES, seed_start=0, seed_end=4, shard_size=2, chunk_rows=100,
+                         file_format=file_format, processes=1, max_score=30))
+    assert len(shards) == 2 and not any(shard.skipped for shard in shards)
+
+    expected = np.concatenate([play_recorded_game(strategies=STRATEGIES, seed=seed, max_score=30) for seed in range(4)])
+    chunks = list(load_decisions(directory))
+    assert len(chunks) == sum(-(-shard.rows // 100) for shard in shards)
+    loaded = np.concatenate(chunks)
+    assert loaded.dtype == expected.dtype
+    assert loaded.tobytes() == expected.tobytes()
@@ -0,0 +1,150 @@
+"""
+Differential tests for the meld solver.
+
+The reference below enumerates every arrangement of disjoint sets and runs like the original
+generate_arrangements did, built from the card rules rather than the solver's candidate melds,
+but picks the arrangement with the fewest deadwood points instead of the fewest deadwood cards.
+Layoffs are checked the same way, against every group of defender cards that extends a knocker
+meld to a valid meld.
+"""
+
+import random
+from concurrent.futures import ThreadPoolExecutor
+from itertools import combinations, product
+from typing import List, Tuple
+from pygin import Card, Hand
+from pygin.constants import CARD_INDEX, FULL_DECK, HAND_SIZE, RANKS, RANK_VALUES, UNDERCUT_BONUS
+from pygin.melds import SOLVER_STATS
+from pygin.utils import cards_to_mask, get_deadwood_count, knock_breakdown, mark_deadwood, mask_to_cards, settle_knock
+
+
+def is_valid_meld(cards: List[Card]) -> bool:
+    if len(cards) < 3: return False
+    if len({card.rank for card in cards}) == 1: return len(cards) <= 4
+    if len({card.suit for card in cards}) != 1: return False
+    rank_indices = sorted(RANKS.index(card.rank) for card in cards)
+    return rank_indices == list(range(rank_indices[0], rank_indices[0] + len(cards)))
+
+
+def reference_deadwood(cards: List[Card]) -> int:
+    """The fewest deadwood points over all arrangements of the cards into disjoint melds."""
+    if not cards: return 0
+    first, rest = cards[0], cards[1:]
+    best = RANK_VALUES[first.rank] + reference_deadwood(rest)  # The first card is deadwood.
+    for size in range(2, len(rest) + 1):
+        for others in combinations(rest, size):
+            if is_valid_meld([first, *others]):
+                best = min(best, reference_deadwood([card for card in rest if card not in others]))
+    return best
+
+
+def make_hand(cards: List[Card]) -> Hand:
+    hand = Hand()
+    for card in cards: hand.add_card(card)
+    return hand
+
+
+def random_hands(count: int, sizes: range, seed: int) -> List[List[Card]]:
+    rng = random.Random(seed)
+    return [rng.sample(FULL_DECK, rng.choice(sizes)) for _ in range(count)]
+
+
+def dense_hands(count: int, seed: int) -> List[List[Card]]:
+    """Hands drawn from a few neighbouring ranks, so most cards belong to overlapping melds."""
+    rng = random.Random(seed)
+    hands = []
+    for _ in range(count):
+        start = rng.randrange(len(RANKS) - 3)
+        cards = [card for card in FULL_DECK if RANKS.index(card.rank) in range(start, start + 4)]
+        hands.append(rng.sample(cards, rng.choice(range(8, HAND_SIZE + 2))))
+    return hands
+
+
+def test_deadwood_matches_reference():
+    for cards in random_hands(count=1000, sizes=range(8, HAND_SIZE + 2), seed=1) + dense_hands(count=200, seed=2):
+        assert get_deadwood_count(make_hand(cards)) == reference_deadwood(cards), cards
+
+
+def test_marked_deadwood_matches_count():
+    for cards in random_hands(count=200, sizes=range(HAND_SIZE, HAND_SIZE + 2), seed=3) + dense_hands(count=50, seed=4):
+        hand = make_hand(cards)
+        deadwood_mask = mark_deadwood(hand)
+        assert sum(RANK_VALUES[card.rank] for card in cards if deadwood_mask >> CARD_INDEX[card] & 1) == get_deadwood_count(hand), cards
+
+
+def test_solver_stats_count_every_call_across_threads():
+    hands = [make_hand(cards) for cards in random_hands(count=8, sizes=range(HAND_SIZE, HAND_SIZE + 1), seed=10)]
+    before = SOLVER_STATS.stats()["mark_deadwood_calls"]
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda hand: [mark_deadwood(hand) for _ in range(20000)], hands))
+    assert SOLVER_STATS.stats()["mark_deadwood_calls"] - before == 8 * 20000
+
+
+def test_incremental_hand_matches_reference():
+    rng = random.Random(5)
+    for cards in random_hands(count=200, sizes=range(HAND_SIZE, HAND_SIZE + 2), seed=6) + dense_hands(count=50, seed=7):
+        hand = make_hand(cards)
+        remaining = list(cards)
+        for _ in range(4):
+            removed = rng.choice(remaining)
+            hand.remove_card(removed)
+            remaining.remove(removed)
+            assert get_deadwood_count(hand) == reference_deadwood(remaining), remaining
+            added = rng.choice([card for card in FULL_DECK if card not in remaining])
+            hand.add_card(added)
+            remaining.append(added)
+            assert get_deadwood_count(hand) == reference_deadwood(remaining), remaining
+
+
+def reference_layoff_deadwood(cards: List[Card], knocker_melds: List[List[Card]]) -> int:
+    """The defender's fewest deadwood points over every choice of disjoint layoffs onto the knocker's melds."""
+    options = [
+        [()] + [group for size in range(1, len(cards) + 1) for group in combinations(cards, size) if is_valid_meld([*meld, *group])]
+        for meld in knocker_melds
+    ]
+    best = reference_deadwood(cards)
+    for groups in product(*options):
+        laid_off = [card for group in groups for card in group]
+        if len(set(laid_off)) == len(laid_off):
+            best = min(best, reference_deadwood([card for card in cards if card not in laid_off]))
+    return best
+
+
+def knock_deals(count: int, seed: int) -> List[Tuple[List[Card], List[Card]]]:
+    """Knocker and defender hands dealt from a few neighbouring ranks, so the defender has cards to lay off."""
+    rng = random.Random(seed)
+    deals = []
+    for _ in range(count):
+        start = rng.randrange(len(RANKS) - 5)
+        cards = rng.sample([card for card in FULL_DECK if RANKS.index(card.rank) in range(start, start + 6)], 2 * HAND_SIZE)
+        deals.append((cards[:HAND_SIZE], cards[HAND_SIZE:]))
+    return deals
+
+
+def test_layoffs_match_reference():
+    for knocker, defender in knock_deals(count=150, seed=8):
+        points, knocker_deadwood, knocker_melds, defender_deadwood, _, _ = settle_knock(
+            knocker_mask=cards_to_mask(knocker), defender_mask=cards_to_mask(defender),
+        )
+        assert knocker_deadwood == reference_deadwood(knocker), knocker
+        if knocker_deadwood: expected = reference_layoff_deadwood(defender, [mask_to_cards(meld) for meld in knocker_melds])
+        else: expected = reference_deadwood(defender)  # Nothing can be laid off onto a gin hand.
+        assert defender_deadwood == expected, (knocker, defender)
+        difference = expected - knocker_deadwood
+        assert points == (difference if difference > 0 else difference - UNDERCUT_BONUS)
+
+
+def test_knock_breakdown_accounts_for_every_card():
+    for knocker, defender in knock_deals(count=100, seed=9):
+        breakdown = knock_breakdown(knocker_mask=cards_to_mask(knocker), defender_mask=cards_to_mask(defender))
+        assert all(is_valid_meld(meld) for meld in breakdown["knocker_melds"] + breakdown["defender_melds"])
+        assert all(is_valid_meld(layoff["meld"] + layoff["cards"]) for layoff in breakdown["layoffs"])
+        knocker_groups = [card for meld in breakdown["knocker_melds"] for card in meld] + breakdown["knocker_unmatched"]
+        assert sorted(knocker_groups, key=CARD_INDEX.get) == sorted(knocker, key=CARD_INDEX.get)
+
+        laid_off = [card for layoff in breakdown["layoffs"] for card in layoff["cards"]]
+        defender_groups = [card for meld in breakdown["defender_melds"] for card in meld] + laid_off + breakdown["defender_unmatched"]
+        assert sorted(defender_groups, key=CARD_INDEX.get) == sorted(defender, key=CARD_INDEX.get)
+        assert breakdown["defender_deadwood"] == sum(RANK_VALUES[card.rank] for card in breakdown["defender_unmatched"])
+        assert breakdown["defender_deadwood_before_layoffs"] == breakdown["defender_deadwood"] + sum(RANK_VALUES[card.rank] for card in laid_off)
+        assert breakdown["undercut"] == (breakdown["points"] < 0)
@@ -0,0 +1,77 @@
+"""Tests for sessions served by several workers sharing one SQLite game store."""
+
+import pytest
+from backend.sessions import SessionManager
+from backend.store import SQLiteStore, StoreConflictError
+from pygin import GinRummyEngine
+
+
+@pytest.fixture
+def workers(tmp_path):
+    """Two session managers, as in two server processes, on the same database."""
+    store = SQLiteStore(path=str(tmp_path / "games.db"))
+    worker_a = SessionManager(max_sessions=10, idle_timeout=60, store=store)
+    worker_b = SessionManager(max_sessions=10, idle_timeout=60, store=store)
+    yield worker_a, worker_b
+    store.pool.close()
+
+
+def dealt_session(worker: SessionManager):
+    session = worker.create(game=GinRummyEngine(player1="player1", player2="player2", seed=7))
+    with worker.locked(session):
+        session.game.deal_initial_hands()
+    return session
+
+
+def test_workers_see_each_others_moves(workers):
+    worker_a, worker_b = workers
+    session_a = dealt_session(worker_a)
+    session_b = worker_b.get(session_a.game_id)
+    assert session_b.game.snapshot() == session_a.game.snapshot()
+
+    with worker_a.locked(session_a):
+        session_a.game.draw_card(from_discard_stack=False)
+    with worker_b.locked(session_b):
+        assert session_b.game.snapshot() == session_a.game.snapshot()
+        session_b.game.discard_card(card=session_b.game.get_current_player().get_hand()[0])
+    with worker_a.locked(session_a):
+        assert session_a.game.snapshot() == session_b.game.snapshot()
+    assert worker_a.conflicts == worker_b.conflicts == 0
+
+
+def test_conflicting_move_reloads_and_reraises(workers):
+    worker_a, worker_b = workers
+    session_a = dealt_session(worker_a)
+    session_b = worker_b.get(session_a.game_id)
+
+    with pytest.raises(StoreConflictError):
+        with worker_b.locked(session_b):
+            with worker_a.locked(session_a):  # Worker A saves a move while worker B is making one.
+                session_a.game.draw_card(from_discard_stack=False)
+            session_b.game.draw_card(from_discard_stack=True)
+    assert worker_b.conflicts == 1
+    assert session_b.game.snapshot() == session_a.game.snapshot()  # B's move was dropped for A's.
+    assert session_b.stored_version == session_a.game.version
+
+    # The retried request applies to the current state and saves.
+    with worker_b.locked(session_b):
+        session_b.game.discard_card(card=session_b.game.get_current_player().get_hand()[0])
+    with worker_a.locked(session_a):
+        assert session_a.game.snapshot() == session_b.game.snapshot()
+
+
+def test_idle_games_are_evicted_for_every_worker(workers):
+    worker_a, worker_b = workers
+    idle = dealt_session(worker_a)
+    active = dealt_session(worker_a)
+    assert worker_b.get(idle.game_id) is not None
+
+    with worker_a.store.pool.connection() as connection:
+        connection.execute("UPDATE games SET saved_at = 0 WHERE game_id = ?", (idle.game_id,))
+    with worker_a.lock:
+        assert worker_a.evict_idle() == 1
+    assert worker_a.get(idle.game_id) is None
+    assert worker_b.get(idle.game_id) is None  # The server answers 404.
+    assert idle.game_id not in worker_b.sessions
+    assert worker_b.get(active.game_id) is not None
+    assert worker_a.stats()["evicted_sessions"] == 1